@@ -0,0 +1,179 @@
+from collections import OrderedDict, deque
+from datetime import datetime
+import math
+import threading
+import time
+
+class BatchSignal:
+    """Test state for one production batch: the latest outcome per vehicle."""
+    __slots__ = ('outcomes', 'observations', 'failures', 'level', 'component', 'last_seen')
+
+    def __init__(self):
+        self.outcomes = {}
+        self.observations = 0
+        self.failures = 0
+        self.level = 0  # 0 normal, 1 quality alert raised, 2 recall alert raised
+        self.component = None
+        self.last_seen = 0.0
+
+class BatchAnomalyDetector:
+    """Streaming detector for batches failing more often than the rest of the fleet.
+
+    Each vehicle counts once per batch, with the outcome (failed or not) of
+    its latest diagnosis, so viewing a vehicle again only matters when its
+    outcome changes. A batch is tested against the failure rate p0 of all
+    other batches: the log-likelihood ratio of its counts under `shift * p0`
+    versus p0. When that ratio reaches `threshold`, with at least
+    `min_observations` vehicles in the batch and `min_baseline_batches`
+    other batches behind p0, a quality alert is raised, escalated to a
+    recall alert if the batch's own failure rate reaches `recall_rate`; the
+    batch re-arms once the ratio falls back to zero. Counts are kept
+    incrementally, so each observation is O(1) and alerts fire on the
+    diagnosis that tips the evidence.
+    """
+    def __init__(self, shift=2.0, threshold=5.0, min_observations=5, min_baseline_batches=3, recall_rate=0.7, max_batches=200000, max_alerts=1000):
+        self.shift = shift
+        self.threshold = threshold
+        self.min_observations = min_observations
+        self.min_baseline_batches = min_baseline_batches
+        self.recall_rate = recall_rate
+        self.max_batches = max_batches
+        self._lock = threading.Lock()
+        self._batches = OrderedDict()
+        self._observations = 0
+        self._failures = 0
+        self._flagged = 0
+        self._recent = deque(maxlen=max_alerts)
+        self._pending = deque(maxlen=max_alerts)
+        # Bumped whenever a batch's counts change
+        self.version = 0
+
+    @staticmethod
+    def _rate(failures, observations):
+        # Laplace-smoothed, so a baseline from few vehicles is never exactly 0 or 1
+        return (failures + 1) / (observations + 2)
+
+    def baseline(self):
+        """Failure rate over every vehicle currently counted."""
+        return self._rate(self._failures, self._observations)
+
+    def _baseline_for(self, signal):
+        # The batch under test is left out of its own baseline
+        return self._rate(self._failures - signal.failures, self._observations - signal.observations)
+
+    def _llr(self, signal, p0):
+        p1 = min(self.shift * p0, 0.99)
+        if p1 <= p0:
+            return 0.0
+        passed = signal.observations - signal.failures
+        return signal.failures * math.log(p1 / p0) + passed * math.log((1 - p1) / (1 - p0))
+
+    def _z_score(self, signal, p0):
+        if not signal.observations:
+            return 0.0
+        rate = signal.failures / signal.observations
+        return (rate - p0) / math.sqrt(p0 * (1 - p0) / signal.observations)
+
+    def observe(self, batch_id, vehicle_id, failed, component=None, now=None):
+        """Record a vehicle's latest diagnosis for its batch; returns the alert it raised, if any."""
+        now = time.time() if now is None else now
+        failed = bool(failed)
+        with self._lock:
+            signal = self._batches.get(batch_id)
+            if signal is None:
+                signal = self._batches[batch_id] = BatchSignal()
+                while len(self._batches) > self.max_batches:
+                    _, dropped = self._batches.popitem(last=False)
+                    self._observations -= dropped.observations
+                    self._failures -= dropped.failures
+                    self._flagged -= dropped.level > 0
+            else:
+                self._batches.move_to_end(batch_id)
+            signal.last_seen = now
+            if component is not None:
+                signal.component = component
+
+            previous = signal.outcomes.get(vehicle_id)
+            if previous == failed:
+                return None
+            signal.outcomes[vehicle_id] = failed
+            if previous is None:
+                signal.observations += 1
+                self._observations += 1
+            change = int(failed) - int(bool(previous))
+            signal.failures += change
+            self._failures += change
+            self.version += 1
+
+            p0 = self._baseline_for(signal)
+            llr = self._llr(signal, p0)
+            if llr <= 0.0:
+                if signal.level:
+                    signal.level = 0
+                    self._flagged -= 1
+                return None
+
+            baseline_batches = len(self._batches) - 1
+            if llr < self.threshold or signal.observations < self.min_observations or baseline_batches < self.min_baseline_batches:
+                return None
+            rate = signal.failures / signal.observations
+            level = 2 if rate >= self.recall_rate else 1
+            if level <= signal.level:
+                return None
+            self._flagged += signal.level == 0
+            signal.level = level
+            alert = {
+                'type': 'recall_alert' if level == 2 else 'quality_alert',
+                'priority': 'critical' if level == 2 else 'high',
+                'batch_id': batch_id,
+                'failure_rate': rate,
+                'baseline_rate': p0,
+                'baseline_batches': baseline_batches,
+                'z_score': self._z_score(signal, p0),
+                'llr': llr,
+                'observations': signal.observations,
+                'failures': signal.failures,
+                'component': signal.component,
+                'timestamp': datetime.fromtimestamp(now).isoformat()
+            }
+            self._recent.append(alert)
+            self._pending.append(alert)
+            return alert
+
+    def status(self, batch_id):
+        """Current test statistics for a batch (None if never observed)."""
+        with self._lock:
+            signal = self._batches.get(batch_id)
+            if signal is None:
+                return None
+            p0 = self._baseline_for(signal)
+            return {
+                'observations': signal.observations,
+                'failure_rate': signal.failures / signal.observations,
+                'baseline_rate': p0,
+                'z_score': self._z_score(signal, p0),
+                'llr': self._llr(signal, p0),
+                'state': ('normal', 'quality_alert', 'recall_alert')[signal.level]
+            }
+
+    def drain(self):
+        """Alerts raised since the previous drain, oldest first (for publishers)."""
+        with self._lock:
+            alerts = list(self._pending)
+            self._pending.clear()
+        return alerts
+
+    def recent_alerts(self, limit=50):
+        with self._lock:
+            alerts = list(self._recent)[-limit:]
+        return alerts[::-1]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'batches': len(self._batches),
+                'observations': self._observations,
+                'baseline_rate': self.baseline(),
+                'alerts': len(self._recent),
+                'flagged': self._flagged
+            }
@@ -1,7 +1,10 @@
 import random
 from typing import Dict, Any
+from .ueba_agent import monitored, vehicle_resource
 
 class CustomerAgent:
+    ueba = None
+
     def __init__(self):
         self.conversation_flows = {
             'brake_system': {
@@ -101,6 +104,7 @@ class CustomerAgent:
             "emotion": "professional"
         }
     
+    @monitored('engage_customer', vehicle_resource)
     def engage_customer(self, vehicle_id: str, diagnosis: Dict[str, Any]) -> Dict[str, Any]:
         component = diagnosis.get('component', '').lower().replace(' ', '_')
         flow = self.conversation_flows.get(component, self._default_flow())
@@ -190,6 +194,18 @@ class CustomerAgent:
         
         return messages
     
+    def format_manufacturer_alert(self, alert):
+        """Manufacturer message for one BatchAnomalyDetector alert."""
+        if alert['type'] == 'recall_alert':
+            message = self.manufacturer_templates['recall_recommendation'].format(count=alert['failures'], batch_id=alert['batch_id'])
+        else:
+            message = self.manufacturer_templates['quality_alert'].format(
+                batch_id=alert['batch_id'],
+                failure_rate=int(alert['failure_rate'] * 100),
+                component=alert.get('component') or 'multiple components'
+            )
+        return {**alert, 'message': message}
+    
     def generate_manufacturer_voice_alert(self, alert_data):
         """Generate voice message for manufacturer alerts"""
         if alert_data['type'] == 'recall_alert':
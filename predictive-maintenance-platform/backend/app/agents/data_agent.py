@@ -1,68 +1,144 @@
-import pandas as pd
 import numpy as np
-import os
+from .fleet_store import get_fleet_store
+from .fleet_listing import FleetListing
+from .fleet_aggregates import FleetAggregates, get_fleet_aggregates
+from .ueba_agent import monitored, vehicle_resource
+from .telemetry_window import get_telemetry_windows
+from .risk_engine import score_reading, score_vehicles, score_telemetry, factors_from_mask, to_records, trend_mask, apply_trends, window_trend_masks
 
 class DataAgent:
-    def __init__(self):
-        # Assuming data is in backend/data relative to where app runs or absolute path
-        # Adjust path as necessary. Using a relative path that works when running from backend root.
-        self.data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'vehicle_data.csv')
+    # Set by MasterAgent; calls to @monitored methods are logged there
+    ueba = None
+
+    def __init__(self, fleet_store=None, telemetry_windows=None, aggregates=None):
+        self.fleet_store = fleet_store or get_fleet_store()
+        self.aggregates = aggregates or (FleetAggregates(fleet_store) if fleet_store else get_fleet_aggregates())
+        self.telemetry_windows = telemetry_windows or get_telemetry_windows()
+        # (store version, scored frame), replaced as one tuple
+        self._scored = None
+        self.listing = FleetListing(self.fleet_store, self._scored_fleet)
         
+    @monitored('read_sensor_data', vehicle_resource)
     def analyze_risk(self, vehicle_id):
         try:
-            if not os.path.exists(self.data_path):
+            if not self.fleet_store.exists():
                 return {'level': 'UNKNOWN', 'score': 0.0, 'factors': ['Data source missing']}
 
-            df = pd.read_csv(self.data_path)
-            vehicle_data_rows = df[df['vehicle_id'] == vehicle_id]
+            vehicle_data = self.fleet_store.get_vehicle(vehicle_id)
             
-            if vehicle_data_rows.empty:
+            if vehicle_data is None:
                 return {'level': 'UNKNOWN', 'score': 0.0, 'factors': ['Vehicle not found']}
-
-            vehicle_data = vehicle_data_rows.iloc[0]
             
-            # Risk calculation based on sensor thresholds
-            risk_factors = []
+            # Trend features from the rolling telemetry window, if the vehicle is streaming
+            trends = self.telemetry_windows.features(vehicle_id)
             
-            if vehicle_data['engine_temp'] > 100:
-                risk_factors.append('High Engine Temperature')
-            if vehicle_data['vibration'] > 1.0:
-                risk_factors.append('Excessive Vibration')
-            if vehicle_data['battery_voltage'] < 11.5:
-                risk_factors.append('Low Battery')
-            if vehicle_data['failure_risk'] > 0.7:
-                risk_factors.append('Component Degradation')
-                
-            # Determine risk level
-            if len(risk_factors) >= 2 or vehicle_data['failure_risk'] > 0.8:
-                level = 'HIGH'
-            elif len(risk_factors) == 1 or vehicle_data['failure_risk'] > 0.5:
-                level = 'MEDIUM'
-            else:
-                level = 'LOW'
+            # Risk calculation based on sensor thresholds
+            level, factor_mask = score_reading(
+                vehicle_data['engine_temp'],
+                vehicle_data['vibration'],
+                vehicle_data['battery_voltage'],
+                vehicle_data['failure_risk'],
+                trends=trend_mask(trends)
+            )
+            risk_factors = factors_from_mask(factor_mask)
                 
-            return {
+            failure_risk = float(vehicle_data['failure_risk'])
+            result = {
                 'level': level,
-                'score': float(vehicle_data['failure_risk']),
+                # None rather than NaN when the risk is missing, matching score_fleet
+                'score': None if np.isnan(failure_risk) else failure_risk,
                 'factors': risk_factors,
                 'engine_temp': float(vehicle_data['engine_temp']),
                 'vibration': float(vehicle_data['vibration']),
                 'battery': float(vehicle_data['battery_voltage'])
             }
+            if trends:
+                result['trends'] = trends
+            return result
         except Exception as e:
             print(f"DataAgent Error: {e}")
             return {'level': 'LOW', 'score': 0.1, 'factors': []}
     
+    def _scored_fleet(self):
+        # Scores for the whole fleet, recomputed only when the store reloads.
+        # Returns (snapshot, scored) so frame, positions and scores all come from one load.
+        snapshot = self.fleet_store.snapshot()
+        if snapshot.df is None:
+            return None, None
+        cached = self._scored
+        if cached is None or cached[0] != snapshot.version:
+            cached = self._scored = (snapshot.version, score_vehicles(snapshot.df))
+        return snapshot, cached[1]
+
+    @monitored('read_sensor_data', 'fleet_batch')
+    def score_fleet(self, vehicle_ids=None):
+        """Score many vehicles in one vectorized pass (all vehicles if no ids given)."""
+        try:
+            snapshot, scored = self._scored_fleet()
+            if snapshot is None:
+                return [{'vehicle_id': vehicle_id, 'level': 'UNKNOWN', 'score': 0.0, 'factors': ['Data source missing'], 'factor_mask': 0} for vehicle_id in vehicle_ids or []]
+
+            if vehicle_ids is None:
+                ids = snapshot.df['vehicle_id'].to_numpy(dtype=object)
+                rows = scored
+            else:
+                positions = np.asarray(snapshot.locate(vehicle_ids), dtype=np.int64)
+                found = positions >= 0
+                ids = np.asarray(vehicle_ids, dtype=object)[found]
+                rows = scored.iloc[positions[found]]
+
+            # Only vehicles with live telemetry windows can carry trend factors
+            rows = apply_trends(rows, window_trend_masks(self.telemetry_windows, ids))
+
+            records = to_records(ids, rows)
+            if vehicle_ids is None:
+                return records
+            if found.all():
+                return records
+
+            # Re-insert unknown vehicles in request order
+            results = []
+            found_records = iter(records)
+            for vehicle_id, is_found in zip(vehicle_ids, found):
+                if is_found:
+                    results.append(next(found_records))
+                else:
+                    results.append({'vehicle_id': vehicle_id, 'level': 'UNKNOWN', 'score': 0.0, 'factors': ['Vehicle not found'], 'factor_mask': 0})
+            return results
+        except Exception as e:
+            print(f"DataAgent Error (Batch): {e}")
+            return []
+
+    @monitored('read_sensor_data', 'fleet_batch')
+    def score_readings(self, readings, source='fleet'):
+        """Score caller-supplied rows: vehicle_data.csv columns, or telemetry columns when source='telemetry'."""
+        try:
+            import pandas as pd
+            frame = pd.DataFrame.from_records(readings)
+            if 'vehicle_id' in frame:
+                ids = frame['vehicle_id'].astype(object).where(frame['vehicle_id'].notna(), None)
+            else:
+                ids = [None] * len(frame)
+            if source == 'telemetry':
+                return to_records(ids, score_telemetry(frame))
+            # Pure scoring: caller-supplied rows never change the fleet aggregates
+            return to_records(ids, score_vehicles(frame))
+        except Exception as e:
+            print(f"DataAgent Error (Readings): {e}")
+            return []
+
+    @monitored('read_sensor_data', 'fleet_listing')
+    def list_vehicles(self, **query):
+        """One page of the fleet listing; see FleetListing.page for the query options."""
+        return self.listing.page(**query)
+
     def get_fleet_overview(self):
         try:
-            if not os.path.exists(self.data_path):
+            if not self.fleet_store.exists():
                  return {'total_vehicles': 0, 'high_risk': 0, 'medium_risk': 0, 'low_risk': 0}
-
-            df = pd.read_csv(self.data_path)
             
-            high_risk = len(df[df['failure_risk'] > 0.7])
-            medium_risk = len(df[(df['failure_risk'] > 0.4) & (df['failure_risk'] <= 0.7)])
-            low_risk = len(df[df['failure_risk'] <= 0.4])
+            # Counters are maintained incrementally; no pass over the fleet here
+            summary = self.aggregates.fleet_summary()
             
             # Helper to handle NaN/Inf for JSON serialization
             def clean_float(val):
@@ -70,16 +146,15 @@ class DataAgent:
                     return 0.0
                 return float(val)
 
-            avg_health = 1 - df['failure_risk'].mean()
+            avg_health = 1 - summary['mean_failure_risk']
 
             return {
-                'total_vehicles': len(df),
-                'high_risk': high_risk,
-                'medium_risk': medium_risk,
-                'low_risk': low_risk,
-                'avg_health_score': clean_float(avg_health),
-                # Converting to dict records for frontend
-                'vehicles': df.fillna(0).to_dict('records') 
+                'total_vehicles': summary['total_vehicles'],
+                'high_risk': summary['high_risk'],
+                'medium_risk': summary['medium_risk'],
+                'low_risk': summary['low_risk'],
+                'avg_health_score': clean_float(avg_health)
+                # Per-vehicle rows are served paginated by GET /api/vehicles
             }
         except Exception as e:
             print(f"DataAgent Error (Fleet): {e}")
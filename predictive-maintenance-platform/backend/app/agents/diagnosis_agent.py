@@ -1,112 +1,68 @@
-import pandas as pd
-import numpy as np
-import os
+from app.config import settings
+from .fleet_store import get_fleet_store
+from .ueba_agent import monitored, vehicle_resource
+from .recommendation_cache import RecommendationCache, recommendation_key
+from .enrichment_providers import build_providers
+
+# Columns that describe the vehicle's condition; ids are excluded so identical
+# conditions share one cached recommendation
+TELEMETRY_COLUMNS = ('engine_temp', 'vibration', 'battery_voltage')
 
 class DiagnosisAgent:
-    def __init__(self):
-        self.data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'vehicle_data.csv')
+    ueba = None
+
+    def __init__(self, fleet_store=None, llm_provider=None, video_provider=None):
+        self.fleet_store = fleet_store or get_fleet_store()
+        self.recommendation_cache = RecommendationCache(
+            ttl=settings.RECOMMENDATION_CACHE_TTL,
+            max_entries=settings.RECOMMENDATION_CACHE_SIZE,
+            db_path=settings.RECOMMENDATION_CACHE_DB or None,
+            wait_timeout=settings.RECOMMENDATION_CACHE_WAIT
+        )
         self.model = self._load_or_train_model()
-        self._setup_gemini()
+        if llm_provider is None or video_provider is None:
+            default_llm, default_video = build_providers()
+            llm_provider = llm_provider or default_llm
+            video_provider = video_provider or default_video
+        self.llm_provider = llm_provider
+        self.video_provider = video_provider
         
-    def _setup_gemini(self):
-        try:
-            import google.generativeai as genai
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if api_key:
-                genai.configure(api_key=api_key)
-                self.gemini_model = genai.GenerativeModel('gemini-pro')
-                print("DiagnosisAgent: Gemini API Configured Successfully")
-            else:
-                self.gemini_model = None
-                print("DiagnosisAgent: No Google API Key found. Using fallback.")
-        except ImportError:
-            self.gemini_model = None
-            print("DiagnosisAgent: google-generativeai not installed. Using fallback.")
-        except Exception as e:
-            self.gemini_model = None
-            print(f"DiagnosisAgent: Gemini Setup Error: {e}")
-
     def _load_or_train_model(self):
         # Simple rule-based prediction for demo
         return None
     
-    def predict_failure(self, vehicle_id):
-        try:
-            if not os.path.exists(self.data_path):
-                return self._default_response()
+    @monitored('predict_failure', vehicle_resource)
+    def predict_failure(self, vehicle_id, enrich=True):
+        """Rule-based diagnosis, optionally enriched inline with an LLM recommendation and a video tutorial.
 
-            df = pd.read_csv(self.data_path)
-            vehicle_data_rows = df[df['vehicle_id'] == vehicle_id]
-            
-            if vehicle_data_rows.empty:
+        With enrich=False only the rule-based result is returned (fast path);
+        callers can run enrich_recommendation/find_video_tutorial separately
+        using `enrichment_context(vehicle_id)`.
+        """
+        try:
+            context = self.enrichment_context(vehicle_id)
+            if context is None:
                 return self._default_response()
-
-            vehicle_data = vehicle_data_rows.iloc[0]
-            
-            # Rule-based failure prediction (Fallback & Context)
-            component = str(vehicle_data['component_health'])
-            probability = float(vehicle_data['failure_risk'])
-            
-            # Determine urgency
-            if probability > 0.8:
-                urgency = 'Critical'
-            elif probability > 0.6:
-                urgency = 'High'
-            elif probability > 0.4:
-                urgency = 'Medium'
-            else:
-                urgency = 'Low'
-                
-            # Component-specific recommendations (Fallback)
-            recommendations = {
-                'brake_system': 'Replace brake pads and check fluid levels',
-                'engine': 'Engine diagnostic and oil change required',
-                'suspension': 'Inspect shock absorbers and springs',
-                'transmission': 'Transmission fluid check and service'
-            }
-            comp_key = component.lower().replace(' ', '_')
-            base_recommendation = recommendations.get(comp_key, 'General inspection required')
             
-            # GEMINI ENHANCEMENT
-            ai_recommendation = base_recommendation
-            if self.gemini_model:
+            ai_recommendation = context['base_recommendation']
+            video_url = None
+            if enrich:
+                # LLM ENHANCEMENT (Gemini by default)
                 try:
-                    prompt = f"""
-                    Act as an expert vehicle mechanic and data analyst.
-                    A vehicle (ID: {vehicle_id}) shows signs of potential failure.
-                    
-                    Data:
-                    - Component: {component}
-                    - Failure Risk Probability: {probability:.2f}
-                    - Urgency: {urgency}
-                    - Recent Telemetry: {vehicle_data.to_dict()}
-                    
-                    Explain why this failure might be happening based on these values and provide a specific technical recommendation. 
-                    Keep the recommendation concise (under 2 sentences).
-                    Do not start with "Based on..." or "The data suggests...". Just give the insight.
-                    """
-                    response = self.gemini_model.generate_content(prompt)
-                    if response.text:
-                        ai_recommendation = response.text.strip()
+                    ai_recommendation = self.enrich_recommendation(context) or ai_recommendation
                 except Exception as g_err:
-                    print(f"DiagnosisAgent: Gemini Generation Error: {g_err}")
+                    print(f"DiagnosisAgent: {self.llm_provider.name} Generation Error: {g_err}")
 
-            # VIDEO TUTORIAL ENHANCEMENT
-            video_url = None
-            try:
-                from youtubesearchpython import VideosSearch
-                search_query = f"How to fix {component} {vehicle_data['vehicle_model'] if 'vehicle_model' in vehicle_data else 'car'}"
-                videosSearch = VideosSearch(search_query, limit = 1)
-                results = videosSearch.result()
-                if results and 'result' in results and len(results['result']) > 0:
-                    video_url = results['result'][0]['link']
-                    print(f"DiagnosisAgent: Found tutorial: {video_url}")
-            except Exception as y_err:
-                print(f"DiagnosisAgent: YouTube Search Error: {y_err}")
+                # VIDEO TUTORIAL ENHANCEMENT
+                try:
+                    video_url = self.find_video_tutorial(context)
+                except Exception as y_err:
+                    print(f"DiagnosisAgent: {self.video_provider.name} Search Error: {y_err}")
 
+            urgency = context['urgency']
             return {
-                'component': component.replace('_', ' ').title(),
-                'probability': probability,
+                'component': context['component'].replace('_', ' ').title(),
+                'probability': context['probability'],
                 'urgency': urgency,
                 'recommendation': ai_recommendation,
                 'video_tutorial': video_url,
@@ -116,6 +72,89 @@ class DiagnosisAgent:
             print(f"DiagnosisAgent Error: {e}")
             return self._default_response(error=True)
 
+    def enrichment_context(self, vehicle_id):
+        """Rule-based inputs shared by the diagnosis and its enrichments (None if unknown)."""
+        if not self.fleet_store.exists():
+            return None
+
+        vehicle_data = self.fleet_store.get_vehicle(vehicle_id)
+        
+        if vehicle_data is None:
+            return None
+        
+        # Rule-based failure prediction (Fallback & Context)
+        component = str(vehicle_data['component_health'])
+        probability = float(vehicle_data['failure_risk'])
+        
+        # Determine urgency
+        if probability > 0.8:
+            urgency = 'Critical'
+        elif probability > 0.6:
+            urgency = 'High'
+        elif probability > 0.4:
+            urgency = 'Medium'
+        else:
+            urgency = 'Low'
+            
+        # Component-specific recommendations (Fallback)
+        recommendations = {
+            'brake_system': 'Replace brake pads and check fluid levels',
+            'engine': 'Engine diagnostic and oil change required',
+            'suspension': 'Inspect shock absorbers and springs',
+            'transmission': 'Transmission fluid check and service'
+        }
+        comp_key = component.lower().replace(' ', '_')
+        
+        return {
+            'vehicle_id': vehicle_id,
+            'component': component,
+            'probability': probability,
+            'urgency': urgency,
+            'base_recommendation': recommendations.get(comp_key, 'General inspection required'),
+            'telemetry': {col: float(vehicle_data[col]) for col in TELEMETRY_COLUMNS if col in vehicle_data},
+            'vehicle_model': vehicle_data['vehicle_model'] if 'vehicle_model' in vehicle_data else 'car'
+        }
+
+    def enrich_recommendation(self, context):
+        """LLM recommendation for a context (cached); None when no provider is available."""
+        if not self.llm_provider.available:
+            return None
+        component, probability, urgency, telemetry = context['component'], context['probability'], context['urgency'], context['telemetry']
+        cache_key = recommendation_key(component, probability, urgency, telemetry)
+        return self.recommendation_cache.get_or_compute(
+            cache_key,
+            lambda: self._generate_recommendation(component, probability, urgency, telemetry)
+        )
+
+    def find_video_tutorial(self, context):
+        if not self.video_provider.available:
+            return None
+        search_query = f"How to fix {context['component']} {context['vehicle_model']}"
+        video_url = self.video_provider.search(search_query)
+        if video_url:
+            print(f"DiagnosisAgent: Found tutorial: {video_url}")
+        return video_url
+
+    def _generate_recommendation(self, component, probability, urgency, telemetry):
+        prompt = f"""
+        Act as an expert vehicle mechanic and data analyst.
+        A vehicle shows signs of potential failure.
+        
+        Data:
+        - Component: {component}
+        - Failure Risk Probability: {probability:.2f}
+        - Urgency: {urgency}
+        - Recent Telemetry: {telemetry}
+        
+        Explain why this failure might be happening based on these values and provide a specific technical recommendation. 
+        Keep the recommendation concise (under 2 sentences).
+        Do not start with "Based on..." or "The data suggests...". Just give the insight.
+        """
+        return self.llm_provider.generate(prompt)
+
+    def get_cache_stats(self):
+        return self.recommendation_cache.get_stats()
+
     def _default_response(self, error=False):
         return {
             'component': 'Unknown',
@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+
+class EnrichmentService:
+    """Runs Gemini and video-search lookups off the request path.
+
+    Each enrichment runs both lookups concurrently in a bounded thread pool
+    with a per-call timeout. Results are kept per vehicle (LRU-bounded) for
+    follow-up fetches and pushed to any registered listeners, such as the
+    websocket broadcaster. A lookup that times out keeps its thread until
+    the third-party call returns, but the pool size caps how many can pile up.
+    The local context lookup runs on its own pool so stuck provider calls
+    can't starve it. `timeout` counts from when a provider call starts;
+    time spent waiting for a free thread is bounded by `queue_timeout`.
+    """
+    def __init__(self, diagnosis_agent, max_workers=4, timeout=8.0, queue_timeout=30.0, max_pending=64, max_results=1000, result_ttl=300):
+        self.diagnosis_agent = diagnosis_agent
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.result_ttl = result_ttl
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.max_workers = max_workers
+        self._executor = None
+        self._context_executor = None
+        self._results = OrderedDict()
+        self._tasks = {}
+        self.listeners = []
+        self.stats = {'scheduled': 0, 'completed': 0, 'timeouts': 0, 'queue_timeouts': 0, 'errors': 0, 'failed': 0, 'rejected': 0}
+
+    def _store(self, vehicle_id, result):
+        self._results[vehicle_id] = result
+        self._results.move_to_end(vehicle_id)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def get_result(self, vehicle_id):
+        return self._results.get(vehicle_id)
+
+    def schedule(self, vehicle_id):
+        """Start enrichment for a vehicle on the running event loop.
+
+        Returns the current status entry. Requests for a vehicle that is already
+        being enriched share the in-flight task, and a result younger than
+        `result_ttl` seconds is returned as-is.
+        """
+        existing = self._results.get(vehicle_id)
+        if vehicle_id in self._tasks and existing is not None:
+            return existing
+        if existing is not None and existing['status'] == 'ready':
+            age = (datetime.now() - datetime.fromisoformat(existing['completed_at'])).total_seconds()
+            if age < self.result_ttl:
+                return existing
+        if len(self._tasks) >= self.max_pending:
+            self.stats['rejected'] += 1
+            return {'vehicle_id': vehicle_id, 'status': 'unavailable', 'reason': 'Enrichment queue full'}
+
+        status = {'vehicle_id': vehicle_id, 'status': 'pending', 'requested_at': datetime.now().isoformat()}
+        self._store(vehicle_id, status)
+        task = asyncio.get_running_loop().create_task(self.enrich(vehicle_id))
+        self._tasks[vehicle_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(vehicle_id, None))
+        self.stats['scheduled'] += 1
+        return status
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def mark_started():
+            if not started.done():
+                started.set_result(None)
+
+        def run():
+            loop.call_soon_threadsafe(mark_started)
+            return fn(*args)
+
+        future = self._pool().submit(run)
+        try:
+            try:
+                await asyncio.wait_for(asyncio.shield(started), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if future.cancel():
+                    self.stats['queue_timeouts'] += 1
+                    print(f"EnrichmentService: {fn.__name__} waited {self.queue_timeout}s for a free worker")
+                    return None
+            # The provider timeout starts once the call is actually running
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            print(f"EnrichmentService: {fn.__name__} timed out after {self.timeout}s")
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"EnrichmentService: {fn.__name__} failed: {e}")
+        return None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='enrichment')
+        return self._executor
+
+    def _context_pool(self):
+        # Local fleet lookups only; kept apart from the provider pool
+        if self._context_executor is None:
+            self._context_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='enrichment-context')
+        return self._context_executor
+
+    async def enrich(self, vehicle_id):
+        result = None
+        try:
+            context = await asyncio.get_running_loop().run_in_executor(self._context_pool(), self.diagnosis_agent.enrichment_context, vehicle_id)
+            if context is None:
+                result = {'vehicle_id': vehicle_id, 'status': 'failed', 'reason': 'Vehicle not found'}
+            else:
+                recommendation, video_url = await asyncio.gather(
+                    self._call(self.diagnosis_agent.enrich_recommendation, context),
+                    self._call(self.diagnosis_agent.find_video_tutorial, context)
+                )
+                result = {
+                    'vehicle_id': vehicle_id,
+                    'status': 'ready',
+                    'recommendation': recommendation or context['base_recommendation'],
+                    'ai_generated': recommendation is not None,
+                    'video_tutorial': video_url,
+                    'completed_at': datetime.now().isoformat()
+                }
+                self.stats['completed'] += 1
+        except Exception as e:
+            print(f"EnrichmentService: enrichment for {vehicle_id} failed: {e}")
+            result = {'vehicle_id': vehicle_id, 'status': 'failed', 'reason': str(e)}
+        finally:
+            if result is None:
+                # Cancelled (shutdown): never leave the entry 'pending'
+                self._store(vehicle_id, {'vehicle_id': vehicle_id, 'status': 'failed', 'reason': 'Enrichment cancelled'})
+                self.stats['failed'] += 1
+        if result['status'] == 'failed':
+            self.stats['failed'] += 1
+        self._store(vehicle_id, result)
+
+        for listener in list(self.listeners):
+            try:
+                await listener({'type': 'enrichment', 'data': result})
+            except Exception as e:
+                print(f"EnrichmentService: listener error: {e}")
+        return result
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'in_flight': len(self._tasks),
+            'providers': {
+                'recommendation': self.diagnosis_agent.llm_provider.name,
+                'video': self.diagnosis_agent.video_provider.name
+            }
+        }
+
+    def shutdown(self):
+        executors = (self._executor, self._context_executor)
+        self._executor = self._context_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
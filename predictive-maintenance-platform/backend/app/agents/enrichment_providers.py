@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+import os
+import random
+import threading
+import time
+
+class ProviderError(RuntimeError):
+    pass
+
+class LatencyModel:
+    """Latency distribution for fake providers, in milliseconds.
+
+    Spec strings: "fixed:200", "uniform:100:400" or "lognormal:800:0.6"
+    (median ms, sigma of the underlying normal).
+    """
+    def __init__(self, kind='fixed', a=0.0, b=0.0, seed=None):
+        self.kind = kind
+        self.a = float(a)
+        self.b = float(b)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        kind, *params = str(spec).split(':')
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            # A bare number means a fixed latency
+            return cls('fixed', float(kind), seed=seed)
+        return cls(kind, *params, seed=seed)
+
+    def sample_ms(self):
+        with self._lock:
+            if self.kind == 'uniform':
+                return self._rng.uniform(self.a, self.b)
+            if self.kind == 'lognormal':
+                return self._rng.lognormvariate(0.0, self.b) * self.a
+            return self.a
+
+class RecommendationProvider(ABC):
+    """Turns a diagnosis prompt into a short recommendation (None if it has nothing to say)."""
+    name = 'none'
+    available = False
+
+    @abstractmethod
+    def generate(self, prompt):
+        ...
+
+class VideoSearchProvider(ABC):
+    """Finds a tutorial video URL for a search query (None if nothing found)."""
+    name = 'none'
+    available = False
+
+    @abstractmethod
+    def search(self, query):
+        ...
+
+class GeminiProvider(RecommendationProvider):
+    """Gemini via google.generativeai, imported and configured on first use."""
+    name = 'gemini'
+
+    def __init__(self, api_key=None, model_name='gemini-pro'):
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self.model_name = model_name
+        self.model = None
+        self._setup_done = False
+        self._setup_lock = threading.Lock()
+        if not self.api_key:
+            print("DiagnosisAgent: No Google API Key found. Using fallback.")
+
+    def _setup(self):
+        with self._setup_lock:
+            if self._setup_done:
+                return
+            self._setup_done = True
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self.model = genai.GenerativeModel(self.model_name)
+                print("DiagnosisAgent: Gemini API Configured Successfully")
+            except ImportError:
+                print("DiagnosisAgent: google-generativeai not installed. Using fallback.")
+            except Exception as e:
+                print(f"DiagnosisAgent: Gemini Setup Error: {e}")
+
+    @property
+    def available(self):
+        if not self.api_key:
+            return False
+        if not self._setup_done:
+            self._setup()
+        return self.model is not None
+
+    def generate(self, prompt):
+        if not self.available:
+            return None
+        response = self.model.generate_content(prompt)
+        return response.text.strip() if response.text else None
+
+class YouTubeSearchProvider(VideoSearchProvider):
+    name = 'youtube'
+    available = True
+
+    def search(self, query):
+        from youtubesearchpython import VideosSearch
+        results = VideosSearch(query, limit = 1).result()
+        if results and 'result' in results and len(results['result']) > 0:
+            return results['result'][0]['link']
+        return None
+
+class _SimulatedCall:
+    def __init__(self, latency, failure_rate, seed):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.failure_rate
+        time.sleep(self.latency.sample_ms() / 1000.0)
+        if failed:
+            raise ProviderError("simulated provider failure")
+
+class FakeRecommendationProvider(RecommendationProvider):
+    """Offline stand-in for Gemini with configurable latency and failure rate."""
+    name = 'fake'
+    available = True
+
+    def __init__(self, latency=None, failure_rate=0.0, seed=None):
+        self._simulate = _SimulatedCall(latency or LatencyModel('fixed', 0), failure_rate, seed)
+
+    @property
+    def calls(self):
+        return self._simulate.calls
+
+    def generate(self, prompt):
+        self._simulate()
+        return "Simulated recommendation: inspect the flagged component and replace worn parts."
+
+class FakeVideoSearchProvider(VideoSearchProvider):
+    """Offline stand-in for YouTube search with configurable latency and failure rate."""
+    name = 'fake'
+    available = True
+
+    def __init__(self, latency=None, failure_rate=0.0, seed=None):
+        self._simulate = _SimulatedCall(latency or LatencyModel('fixed', 0), failure_rate, seed)
+
+    @property
+    def calls(self):
+        return self._simulate.calls
+
+    def search(self, query):
+        self._simulate()
+        return f"https://www.youtube.com/results?search_query={query.replace(' ', '+')}"
+
+def build_providers():
+    """Pick providers from the environment.
+
+    ENRICHMENT_PROVIDER=real (default) uses Gemini and YouTube; =fake uses the
+    offline stand-ins, tuned by FAKE_LLM_LATENCY, FAKE_VIDEO_LATENCY (LatencyModel
+    specs, ms), FAKE_PROVIDER_FAILURE_RATE and FAKE_PROVIDER_SEED. The seed
+    is expanded into independent sub-seeds, so the two fakes (and each one's
+    latency and failure draws) don't replay the same random sequence.
+    """
+    if os.getenv("ENRICHMENT_PROVIDER", "real").lower() == "fake":
+        seed = os.getenv("FAKE_PROVIDER_SEED")
+        seeds = random.Random(int(seed)) if seed else None
+
+        def sub_seed():
+            return seeds.getrandbits(32) if seeds else None
+
+        failure_rate = float(os.getenv("FAKE_PROVIDER_FAILURE_RATE", "0"))
+        return (
+            FakeRecommendationProvider(LatencyModel.parse(os.getenv("FAKE_LLM_LATENCY", "lognormal:800:0.5"), sub_seed()), failure_rate, sub_seed()),
+            FakeVideoSearchProvider(LatencyModel.parse(os.getenv("FAKE_VIDEO_LATENCY", "lognormal:400:0.5"), sub_seed()), failure_rate, sub_seed())
+        )
+    return GeminiProvider(), YouTubeSearchProvider()
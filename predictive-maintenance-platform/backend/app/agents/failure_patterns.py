@@ -0,0 +1,162 @@
+from collections import Counter, OrderedDict
+from datetime import datetime
+import threading
+import time
+
+# Same cut-off as the batch quality check
+HIGH_RISK_PROBABILITY = 0.7
+
+class PatternStats:
+    """Running totals over the failure patterns currently held for one batch.
+
+    The most frequent component is tracked on every add, so reading it is
+    O(1); only removing an occurrence of the current leader rescans the
+    (few) components of the batch.
+    """
+    __slots__ = ('count', 'risk_sum', 'high', 'components', 'top', 'top_count')
+
+    def __init__(self):
+        self.count = 0
+        self.risk_sum = 0.0
+        self.high = 0
+        self.components = Counter()
+        self.top = None
+        self.top_count = 0
+
+    def _better(self, component, count):
+        # Highest count wins, ties broken by name (like FleetAggregates)
+        return count > self.top_count or (count == self.top_count and self.top is not None and component < self.top)
+
+    def add(self, component, probability):
+        self.count += 1
+        self.risk_sum += probability
+        if probability > HIGH_RISK_PROBABILITY:
+            self.high += 1
+        count = self.components[component] = self.components[component] + 1
+        if self.top is None or self._better(component, count):
+            self.top, self.top_count = component, count
+
+    def remove(self, component, probability):
+        self.count -= 1
+        # Reset when empty so float residue does not accumulate
+        self.risk_sum = self.risk_sum - probability if self.count else 0.0
+        if probability > HIGH_RISK_PROBABILITY:
+            self.high -= 1
+        count = self.components[component] - 1
+        if count > 0:
+            self.components[component] = count
+        else:
+            del self.components[component]
+        if component == self.top:
+            if self.components:
+                self.top, self.top_count = min(self.components.items(), key=lambda kv: (-kv[1], kv[0]))
+            else:
+                self.top, self.top_count = None, 0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_probability': self.risk_sum / self.count if self.count else 0.0,
+            'high_risk': self.high,
+            'common_component': self.top or 'Unknown'
+        }
+
+class FailurePatternStore:
+    """Failure patterns per production batch, bounded in size and age.
+
+    A batch holds one pattern per (vehicle, component): diagnosing the same
+    vehicle again replaces its earlier probability rather than counting it
+    twice. Each batch keeps at most `max_per_batch` patterns updated in the
+    last `window_seconds`, and at most `max_batches` batches are tracked
+    (the least recently updated one is dropped first). PatternStats always
+    describe exactly the patterns still held, so memory stays bounded under
+    a continuous stream of diagnoses and every read is O(1).
+    """
+    def __init__(self, max_per_batch=500, window_seconds=7 * 24 * 3600, max_batches=10000):
+        self.max_per_batch = max_per_batch
+        self.window_seconds = window_seconds
+        self.max_batches = max_batches
+        self._lock = threading.Lock()
+        self._batches = OrderedDict()
+        self.total_logged = 0
+        self.total_evicted = 0
+        self._held = 0
+        # Bumped on every change to the held patterns, for cache version tokens
+        self.version = 0
+
+    def _expire(self, history, stats, now):
+        cutoff = now - self.window_seconds
+        # history is ordered by last update, so expired patterns are at the front
+        while history:
+            key, (ts, probability) = next(iter(history.items()))
+            if len(history) <= self.max_per_batch and ts >= cutoff:
+                break
+            del history[key]
+            stats.remove(key[1], probability)
+            self.total_evicted += 1
+            self._held -= 1
+            self.version += 1
+
+    def add(self, batch_id, vehicle_id, component, probability, now=None):
+        """Record (or update) a vehicle's pattern; returns the batch's stats as a dict."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._batches.get(batch_id)
+            if entry is None:
+                entry = self._batches[batch_id] = (OrderedDict(), PatternStats())
+                while len(self._batches) > self.max_batches:
+                    _, (dropped, _) = self._batches.popitem(last=False)
+                    self.total_evicted += len(dropped)
+                    self._held -= len(dropped)
+            else:
+                self._batches.move_to_end(batch_id)
+            history, stats = entry
+            key = (vehicle_id, component)
+            previous = history.pop(key, None)
+            if previous is not None:
+                stats.remove(component, previous[1])
+                self._held -= 1
+            history[key] = (now, probability)
+            stats.add(component, probability)
+            self.total_logged += 1
+            self._held += 1
+            self.version += 1
+            self._expire(history, stats, now)
+            return stats.to_dict()
+
+    def stats(self, batch_id, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._batches.get(batch_id)
+            if entry is None:
+                return None
+            history, stats = entry
+            self._expire(history, stats, now)
+            return stats.to_dict()
+
+    def history(self, batch_id):
+        """Patterns still held for a batch, least recently updated first."""
+        with self._lock:
+            entry = self._batches.get(batch_id)
+            records = list(entry[0].items()) if entry is not None else []
+        return [
+            {'vehicle_id': vehicle_id, 'component': component, 'probability': probability, 'timestamp': datetime.fromtimestamp(ts).isoformat()}
+            for (vehicle_id, component), (ts, probability) in records
+        ]
+
+    def batch_ids(self):
+        with self._lock:
+            return list(self._batches)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'batches': len(self._batches),
+                'patterns': self._held,
+                'total_logged': self.total_logged,
+                'total_evicted': self.total_evicted
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._batches)
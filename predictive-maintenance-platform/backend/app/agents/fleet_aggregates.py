@@ -0,0 +1,242 @@
+from collections import Counter
+import math
+import threading
+from .fleet_store import get_fleet_store
+from .fleet_frame import widen
+
+# Same buckets as the fleet overview
+HIGH_RISK = 0.7
+MEDIUM_RISK = 0.4
+
+# Above this share of changed vehicles a full rebuild beats per-vehicle updates
+REBUILD_RATIO = 0.25
+
+def _bucket(risk):
+    if risk is None:
+        return None
+    if risk > HIGH_RISK:
+        return 'high'
+    if risk > MEDIUM_RISK:
+        return 'medium'
+    return 'low'
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+class BatchStats:
+    __slots__ = ('count', 'risk_count', 'risk_sum', 'high', 'components')
+
+    def __init__(self):
+        self.count = 0
+        self.risk_count = 0
+        self.risk_sum = 0.0
+        self.high = 0
+        self.components = Counter()
+
+    def mode_component(self):
+        if not self.components:
+            return 'Unknown'
+        # Highest count, ties broken by name like pandas' Series.mode()
+        return min(self.components.items(), key=lambda kv: (-kv[1], kv[0]))[0]
+
+class FleetAggregates:
+    """Fleet- and batch-level aggregates kept up to date per vehicle.
+
+    `upsert`/`remove` adjust counters in O(1), so reading the summaries costs
+    O(#batches) instead of a pass over every vehicle. `sync()` follows the
+    shared FleetStore, the only source of these values: on reload it applies
+    only the vehicles that changed, falling back to a vectorized rebuild when
+    most of the fleet changed (both end in the same state). `changes` counts
+    every update, for cache version tokens.
+
+    Counts are per unique vehicle_id (first row wins, like FleetStore
+    lookups), so `total_vehicles` no longer counts duplicate CSV rows the
+    way `len(df)` did. Rows without a batch_id count towards the fleet
+    totals but belong to no batch summary.
+    """
+    def __init__(self, fleet_store=None):
+        self.fleet_store = fleet_store or get_fleet_store()
+        self.version = None
+        self.changes = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.changes += 1
+        self._vehicles = {}
+        self._batches = {}
+        self._levels = Counter()
+        self._risk_count = 0
+        self._risk_sum = 0.0
+        self._snapshot = None
+
+    def _apply(self, state, sign):
+        batch_id, risk, component = state
+        bucket = _bucket(risk)
+        if bucket:
+            self._levels[bucket] += sign
+        if risk is not None:
+            self._risk_count += sign
+            self._risk_sum += sign * risk
+        if batch_id is None:
+            return
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            batch = self._batches[batch_id] = BatchStats()
+        batch.count += sign
+        if risk is not None:
+            batch.risk_count += sign
+            batch.risk_sum += sign * risk
+        if bucket == 'high':
+            batch.high += sign
+        if component is not None:
+            batch.components[component] += sign
+            if batch.components[component] <= 0:
+                del batch.components[component]
+        if batch.count <= 0:
+            del self._batches[batch_id]
+
+    def upsert(self, vehicle_id, batch_id, failure_risk, component):
+        """Add a vehicle or replace its previous contribution (rescoring)."""
+        state = (_clean(batch_id), _clean(failure_risk), _clean(component))
+        with self._lock:
+            previous = self._vehicles.get(vehicle_id)
+            if previous == state:
+                return
+            if previous is not None:
+                self._apply(previous, -1)
+            self._vehicles[vehicle_id] = state
+            self._apply(state, 1)
+            self.changes += 1
+
+    def remove(self, vehicle_id):
+        with self._lock:
+            previous = self._vehicles.pop(vehicle_id, None)
+            if previous is not None:
+                self._apply(previous, -1)
+                self.changes += 1
+
+    def _rebuild(self, frame):
+        # Vectorized bulk load: one groupby instead of N upserts
+        self._reset()
+        self._vehicles = {
+            vehicle_id: (_clean(batch_id), _clean(risk), _clean(component))
+            for vehicle_id, batch_id, risk, component in zip(frame.index, frame['batch_id'], frame['failure_risk'], frame['component_health'])
+        }
+        risks = frame['failure_risk']
+        self._levels = Counter({
+            'high': int((risks > HIGH_RISK).sum()),
+            'medium': int(((risks > MEDIUM_RISK) & (risks <= HIGH_RISK)).sum()),
+            'low': int((risks <= MEDIUM_RISK).sum())
+        })
+        self._risk_count = int(risks.count())
+        self._risk_sum = float(risks.sum())
+        # observed=True: categories with no vehicle left must not become empty batches
+        grouped = frame.groupby('batch_id', sort=False, observed=True)
+        stats = grouped['failure_risk'].agg(['size', 'count', 'sum'])
+        high = (risks > HIGH_RISK).groupby(frame['batch_id'], sort=False, observed=True).sum()
+        components = frame.groupby(['batch_id', 'component_health'], sort=False, observed=True).size()
+        for batch_id, row in stats.iterrows():
+            batch = self._batches[batch_id] = BatchStats()
+            batch.count = int(row['size'])
+            batch.risk_count = int(row['count'])
+            batch.risk_sum = float(row['sum'])
+            batch.high = int(high[batch_id])
+        for (batch_id, component), count in components.items():
+            self._batches[batch_id].components[component] = int(count)
+
+    def sync(self):
+        """Catch up with the fleet store; cheap no-op when nothing was reloaded."""
+        snapshot = self.fleet_store.snapshot()
+        if self.version == snapshot.version:
+            return
+        with self._lock:
+            # Frame and version from the same snapshot, so a concurrent reload can't pair them wrongly
+            df, version = snapshot.df, snapshot.version
+            if version == self.version:
+                return
+            if df is None:
+                self._reset()
+                self.version = version
+                return
+            # One row per vehicle; first occurrence wins like FleetStore lookups
+            frame = df.drop_duplicates('vehicle_id').set_index('vehicle_id')[['batch_id', 'failure_risk', 'component_health']]
+            frame = frame.assign(failure_risk=widen(frame['failure_risk'].to_numpy()))
+            old = self._snapshot
+            if old is None:
+                self._rebuild(frame)
+            else:
+                changed, removed = self._diff(old, frame)
+                if len(changed) + len(removed) > REBUILD_RATIO * max(len(frame), 1):
+                    self._rebuild(frame)
+                else:
+                    for vehicle_id in removed:
+                        self.remove(vehicle_id)
+                    for vehicle_id, row in frame.loc[changed].iterrows():
+                        self.upsert(vehicle_id, row['batch_id'], row['failure_risk'], row['component_health'])
+            self._snapshot = frame
+            self.version = version
+
+    @staticmethod
+    def _diff(old, new):
+        removed = old.index.difference(new.index)
+        common = new.index.intersection(old.index)
+        added = new.index.difference(old.index)
+        # Categoricals from different loads may not share categories, so compare values
+        a = old.loc[common].astype(object)
+        b = new.loc[common].astype(object)
+        differs = ((a != b) & ~(a.isna() & b.isna())).any(axis=1)
+        return list(added) + list(common[differs.to_numpy()]), list(removed)
+
+    def fleet_summary(self):
+        self.sync()
+        with self._lock:
+            mean_risk = self._risk_sum / self._risk_count if self._risk_count else float('nan')
+            return {
+                'total_vehicles': len(self._vehicles),
+                'high_risk': self._levels['high'],
+                'medium_risk': self._levels['medium'],
+                'low_risk': self._levels['low'],
+                'mean_failure_risk': mean_risk
+            }
+
+    def batch_summary(self):
+        self.sync()
+        with self._lock:
+            return {
+                batch_id: {
+                    'avg_failure_risk': batch.risk_sum / batch.risk_count if batch.risk_count else 0.0,
+                    'count': batch.count,
+                    'high_risk_count': batch.high,
+                    'common_component': batch.mode_component()
+                }
+                for batch_id, batch in self._batches.items()
+            }
+
+    def batch(self, batch_id):
+        self.sync()
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            return {
+                'count': batch.count,
+                'avg_failure_risk': batch.risk_sum / batch.risk_count if batch.risk_count else float('nan'),
+                'high_risk_count': batch.high,
+                'components': dict(batch.components),
+                'common_component': batch.mode_component()
+            }
+
+_default_aggregates = None
+_default_aggregates_lock = threading.Lock()
+
+def get_fleet_aggregates():
+    """Process-wide FleetAggregates over the shared FleetStore."""
+    global _default_aggregates
+    if _default_aggregates is None:
+        with _default_aggregates_lock:
+            if _default_aggregates is None:
+                _default_aggregates = FleetAggregates()
+    return _default_aggregates
@@ -0,0 +1,136 @@
+"""Columnar on-disk fleet format.
+
+A fleet directory holds one `.npy` file per numeric column, and for string
+columns (vehicle_id, component_health, batch_id) an `.codes.npy` file of
+integer codes plus a `.dict.json` list of the distinct values. Every
+conversion writes a new generation of files (`<column>.g<N>.*`) and then
+switches to it by renaming `manifest.json`, which names the files of its
+generation. A reader opens only the files its manifest names, so it never
+mixes codes, dictionaries or row counts from two conversions. The previous
+generation is kept for readers that are mid-load; older ones are removed.
+
+Columns are opened with `np.load(mmap_mode='r')`: loading costs a few page
+faults instead of a CSV parse, and every uvicorn/Celery worker mapping the
+same files shares one copy of the column data in the OS page cache.
+
+Convert a CSV with:
+    python -m app.agents.fleet_columns data/vehicle_data.csv data/vehicle_data.cols
+"""
+import json
+import os
+import re
+import numpy as np
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 2
+# Format 1 directories (unversioned file names) are still readable
+READABLE_FORMATS = (1, 2)
+_GENERATION_FILE = re.compile(r'.+\.g(\d+)\.(npy|codes\.npy|dict\.json)$')
+
+def is_columnar(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+def manifest_path(path):
+    return os.path.join(path, MANIFEST)
+
+def _replace(path, write):
+    # Write next to the target and rename over it: workers that still map the
+    # old file keep a valid mapping of the old inode
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+def _save_array(path, array):
+    def write(tmp):
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+    _replace(path, write)
+
+def _save_json(path, value):
+    def write(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+    _replace(path, write)
+
+def _current_generation(directory):
+    try:
+        with open(manifest_path(directory), encoding='utf-8') as f:
+            return int(json.load(f).get('generation', 0))
+    except (OSError, ValueError):
+        return 0
+
+def _remove_old_generations(directory, keep):
+    for entry in os.listdir(directory):
+        match = _GENERATION_FILE.fullmatch(entry)
+        if match and int(match.group(1)) < keep:
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+
+def write_columns(df, directory):
+    """Store a fleet DataFrame as a columnar directory, switching readers over atomically."""
+    import pandas as pd
+    os.makedirs(directory, exist_ok=True)
+    generation = _current_generation(directory) + 1
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        prefix = f"{name}.g{generation}"
+        if pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+            _save_array(os.path.join(directory, f"{prefix}.npy"), series.to_numpy())
+            columns.append({'name': name, 'kind': 'numeric', 'dtype': str(series.dtype), 'data': f"{prefix}.npy"})
+        else:
+            # Codes use the width pandas picks for this many categories, so loading is zero-copy
+            categorical = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+            categories = [str(value) for value in categorical.cat.categories]
+            _save_array(os.path.join(directory, f"{prefix}.codes.npy"), categorical.cat.codes.to_numpy())
+            _save_json(os.path.join(directory, f"{prefix}.dict.json"), categories)
+            columns.append({'name': name, 'kind': 'dictionary', 'categories': len(categories), 'codes': f"{prefix}.codes.npy", 'dictionary': f"{prefix}.dict.json"})
+    # The single switch-over point: readers see the old generation or the new one
+    _save_json(manifest_path(directory), {'format': FORMAT_VERSION, 'generation': generation, 'rows': len(df), 'columns': columns})
+    _remove_old_generations(directory, keep=generation - 1)
+
+def convert_csv(csv_path, directory):
+    import pandas as pd
+    from .fleet_frame import compact_frame
+    df = pd.read_csv(csv_path)
+    # Stored already compact (float32 sensors), so loading never converts
+    write_columns(compact_frame(df), directory)
+    return len(df)
+
+def read_columns(directory):
+    """Open a columnar directory as a DataFrame backed by read-only memory maps."""
+    import pandas as pd
+    with open(manifest_path(directory), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') not in READABLE_FORMATS:
+        raise ValueError(f"Unsupported fleet format: {manifest.get('format')}")
+    rows = manifest['rows']
+    data = {}
+    for column in manifest['columns']:
+        name = column['name']
+        if column['kind'] == 'numeric':
+            values = np.load(os.path.join(directory, column.get('data', f"{name}.npy")), mmap_mode='r')
+        else:
+            codes = np.load(os.path.join(directory, column.get('codes', f"{name}.codes.npy")), mmap_mode='r')
+            with open(os.path.join(directory, column.get('dictionary', f"{name}.dict.json")), encoding='utf-8') as f:
+                categories = json.load(f)
+            if len(categories) != column['categories']:
+                raise ValueError(f"Fleet column {name}: dictionary does not match the manifest")
+            # validate=False: range-checking the codes would touch every page; the
+            # manifest pins codes and dictionary to the same conversion instead
+            values = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories), validate=False)
+        if len(values) != rows:
+            raise ValueError(f"Fleet column {name}: {len(values)} rows, manifest says {rows}")
+        data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert the fleet CSV to the columnar format")
+    parser.add_argument("csv", help="source CSV (vehicle_data.csv layout)")
+    parser.add_argument("directory", help="output directory")
+    args = parser.parse_args()
+    rows = convert_csv(args.csv, args.directory)
+    print(f"Wrote {rows} vehicles to {args.directory}")
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+import base64
+import json
+import threading
+import numpy as np
+from .fleet_frame import widen, widen_frame
+
+RISK_LEVEL_RANK = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
+SORT_KEYS = ('risk_level', 'failure_risk', 'batch_id', 'vehicle_id')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        int(state['p'])
+        return state
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+class FleetListing:
+    """Paged, filtered and sorted views over the fleet for GET /api/vehicles.
+
+    The fleet frame plus its agent risk level is materialized once per store
+    version, and the row order for each (sort, filter) combination is cached
+    (LRU), so a page costs O(limit) after the first request. Cursors carry the
+    page offset and the last vehicle id; if the store reloads between pages
+    the listing resumes after that vehicle in the new ordering.
+    """
+    def __init__(self, fleet_store, scorer, max_views=32):
+        self.fleet_store = fleet_store
+        # scorer() -> (snapshot, scored) as returned by DataAgent._scored_fleet
+        self.scorer = scorer
+        self.max_views = max_views
+        self._lock = threading.Lock()
+        self._version = None
+        self._frame = None
+        self._views = OrderedDict()
+
+    def _materialize(self):
+        snapshot, scored = self.scorer()
+        if snapshot is None:
+            return None
+        version = snapshot.version
+        with self._lock:
+            if self._version != version:
+                self._frame = snapshot.df.assign(risk_level=scored['level'].to_numpy())
+                self._views.clear()
+                self._version = version
+            return self._frame
+
+    def columns(self):
+        frame = self._materialize()
+        return [] if frame is None else list(frame.columns)
+
+    def _order(self, frame, sort, descending, risk_levels, batch_id):
+        key = (sort, descending, risk_levels, batch_id)
+        with self._lock:
+            order = self._views.get(key)
+            if order is not None:
+                self._views.move_to_end(key)
+                return order
+
+        mask = np.ones(len(frame), dtype=bool)
+        if risk_levels:
+            mask &= frame['risk_level'].isin(risk_levels).to_numpy()
+        if batch_id is not None:
+            mask &= (frame['batch_id'] == batch_id).to_numpy()
+        positions = np.flatnonzero(mask)
+
+        if sort == 'risk_level':
+            # Agent level first, raw failure risk breaks ties within a level
+            keys = [frame['risk_level'].map(RISK_LEVEL_RANK).to_numpy()[positions], widen(frame['failure_risk'].to_numpy()[positions])]
+        else:
+            keys = [frame[sort].to_numpy()[positions]]
+        import pandas as pd
+        sorter = pd.DataFrame({f'k{i}': k for i, k in enumerate(keys)})
+        sorter['pos'] = positions
+        # Missing values sort last either way; row position keeps pages stable
+        sorter = sorter.sort_values([*sorter.columns[:-1], 'pos'], ascending=[not descending] * len(keys) + [True], na_position='last', kind='stable')
+        order = sorter['pos'].to_numpy()
+
+        with self._lock:
+            self._views[key] = order
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return order
+
+    def page(self, columns=None, risk_levels=None, batch_id=None, sort='vehicle_id', order='asc', cursor=None, limit=DEFAULT_PAGE_SIZE):
+        frame = self._materialize()
+        if frame is None:
+            return {'items': [], 'total': 0, 'next_cursor': None}
+
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unsupported sort '{sort}', expected one of {', '.join(SORT_KEYS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        columns = list(columns) if columns else list(frame.columns)
+        unknown = [c for c in columns if c not in frame.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        if 'vehicle_id' not in columns:
+            columns.insert(0, 'vehicle_id')
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        risk_levels = tuple(sorted({level.upper() for level in risk_levels})) if risk_levels else None
+
+        rows = self._order(frame, sort, order == 'desc', risk_levels, batch_id)
+        query = [sort, order, risk_levels and list(risk_levels), batch_id]
+        start = 0
+        if cursor:
+            state = decode_cursor(cursor)
+            if state.get('q') != query:
+                raise ValueError("Cursor does not match this query")
+            start = int(state['p'])
+            if state.get('v') != self._version:
+                # Store reloaded since the previous page: resume after the last vehicle seen
+                ids = frame['vehicle_id'].to_numpy()[rows]
+                hits = np.flatnonzero(ids == state.get('id'))
+                start = int(hits[0]) + 1 if len(hits) else min(start, len(rows))
+
+        page_rows = rows[start:start + limit]
+        items = widen_frame(frame.iloc[page_rows][columns])
+        items = items.astype(object).where(items.notna(), None).to_dict('records')
+        end = start + len(page_rows)
+        next_cursor = None
+        if end < len(rows):
+            next_cursor = encode_cursor({'p': end, 'v': self._version, 'id': items[-1]['vehicle_id'], 'q': query})
+        return {'items': items, 'total': int(len(rows)), 'next_cursor': next_cursor}
@@ -0,0 +1,144 @@
+import os
+import threading
+from .fleet_columns import is_columnar, manifest_path, read_columns
+from .fleet_frame import FleetColumns, VehicleRow, compact_frame
+
+# A CSV file or a columnar directory written by fleet_columns
+DEFAULT_DATA_PATH = os.getenv("FLEET_DATA_PATH") or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'vehicle_data.csv')
+
+class FleetSnapshot:
+    """One immutable load of the fleet: frame, column views, indexes and version.
+
+    The store swaps whole snapshots, so positions from `locate` always refer
+    to the `df` of the same snapshot, even if the file reloads meanwhile.
+    """
+    __slots__ = ('df', 'columns', 'vehicle_index', 'batch_index', 'version')
+
+    def __init__(self, df=None, columns=None, vehicle_index=None, batch_index=None, version=0):
+        self.df = df
+        self.columns = columns
+        self.vehicle_index = vehicle_index or {}
+        self.batch_index = batch_index or {}
+        self.version = version
+
+    def get_vehicle(self, vehicle_id):
+        pos = self.vehicle_index.get(vehicle_id)
+        if pos is None:
+            return None
+        return VehicleRow(self.columns, pos)
+
+    def locate(self, vehicle_ids):
+        index = self.vehicle_index
+        return [index.get(vehicle_id, -1) for vehicle_id in vehicle_ids]
+
+    def get_batch(self, batch_id):
+        if self.df is None:
+            return None
+        positions = self.batch_index.get(batch_id)
+        if positions is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[positions]
+
+class FleetStore:
+    """Loads the fleet dataset once and keeps it indexed by vehicle_id and batch_id.
+
+    The file is re-read only when its mtime or size changes, so agents can
+    call into the store on every request without paying for a CSV parse.
+    `data_path` may also be a columnar directory (see fleet_columns), which
+    is memory-mapped instead of parsed; its manifest is what gets stat'ed.
+    The frame is kept compact (see fleet_frame.compact_frame) and single
+    vehicles are served as VehicleRow views over its column arrays.
+    Each load is published as one FleetSnapshot; callers that need several
+    reads to agree (a frame and positions into it) should take `snapshot()`
+    once and read through it.
+    """
+    def __init__(self, data_path=DEFAULT_DATA_PATH):
+        self.data_path = data_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._snapshot = FleetSnapshot()
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def _file_signature(self):
+        path = manifest_path(self.data_path) if os.path.isdir(self.data_path) else self.data_path
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, version):
+        if is_columnar(self.data_path):
+            df = read_columns(self.data_path)
+        else:
+            import pandas as pd  # deferred: keeps app startup free of pandas
+            df = pd.read_csv(self.data_path)
+        df = compact_frame(df)
+        # First occurrence wins, matching the old `rows.iloc[0]` lookups
+        vehicle_index = {}
+        for pos, vehicle_id in enumerate(df['vehicle_id']):
+            vehicle_index.setdefault(vehicle_id, pos)
+        batch_index = {batch_id: positions for batch_id, positions in df.groupby('batch_id', sort=False).indices.items()}
+        return FleetSnapshot(df, FleetColumns(df), vehicle_index, batch_index, version)
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            version = self._snapshot.version + 1
+            # Single assignment: readers see either the old or the new snapshot, never a mix
+            self._snapshot = FleetSnapshot(version=version) if signature is None else self._load(version)
+            self._signature = signature
+
+    def snapshot(self):
+        """Current FleetSnapshot, reloading first if the file changed."""
+        self._refresh()
+        return self._snapshot
+
+    def signature(self):
+        """Cheap change token for the data file (one stat, no parse); None if missing."""
+        return self._file_signature()
+
+    def exists(self):
+        return self.snapshot().df is not None
+
+    def frame(self):
+        """Full fleet DataFrame, or None when the data source is missing."""
+        return self.snapshot().df
+
+    def get_vehicle(self, vehicle_id):
+        """Read-only VehicleRow for a single vehicle, or None if unknown."""
+        return self.snapshot().get_vehicle(vehicle_id)
+
+    def locate(self, vehicle_ids):
+        """Row positions for the given ids; -1 marks unknown vehicles.
+
+        Positions are only valid against the frame of the same snapshot; use
+        `snapshot().locate` together with `snapshot().df` when both are needed.
+        """
+        return self.snapshot().locate(vehicle_ids)
+
+    def get_batch(self, batch_id):
+        """All rows of a production batch (empty DataFrame if unknown)."""
+        return self.snapshot().get_batch(batch_id)
+
+    def batch_ids(self):
+        return list(self.snapshot().batch_index.keys())
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_fleet_store():
+    """Process-wide FleetStore shared by all agents."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = FleetStore()
+    return _default_store
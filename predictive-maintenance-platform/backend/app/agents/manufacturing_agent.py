@@ -1,35 +1,44 @@
-import pandas as pd
-from collections import defaultdict
-import os
-import datetime
+from app.config import settings
+from .fleet_store import get_fleet_store
+from .fleet_aggregates import FleetAggregates, get_fleet_aggregates
+from .failure_patterns import FailurePatternStore, HIGH_RISK_PROBABILITY
+from .batch_anomaly import BatchAnomalyDetector
+from .ueba_agent import monitored, vehicle_resource
 
 class ManufacturingAgent:
-    def __init__(self):
-        self.failure_patterns = defaultdict(list)
-        self.data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'vehicle_data.csv')
+    ueba = None
+
+    def __init__(self, fleet_store=None, aggregates=None):
+        # Bounded per-batch history of logged diagnoses with running stats
+        self.failure_patterns = FailurePatternStore(
+            max_per_batch=settings.FAILURE_PATTERNS_PER_BATCH,
+            window_seconds=settings.FAILURE_PATTERNS_WINDOW_HOURS * 3600,
+            max_batches=settings.FAILURE_PATTERNS_MAX_BATCHES
+        )
+        # Test of each batch's failure rate against the other batches, fed per diagnosis
+        self.anomaly_detector = BatchAnomalyDetector(
+            shift=settings.BATCH_ANOMALY_SHIFT,
+            threshold=settings.BATCH_ANOMALY_THRESHOLD,
+            min_baseline_batches=settings.BATCH_ANOMALY_MIN_BASELINE_BATCHES
+        )
+        self.fleet_store = fleet_store or get_fleet_store()
+        self.aggregates = aggregates or (FleetAggregates(fleet_store) if fleet_store else get_fleet_aggregates())
         
+    @monitored('log_failure_pattern', vehicle_resource)
     def log_failure_pattern(self, vehicle_id, diagnosis):
         try:
-            if not os.path.exists(self.data_path):
+            if not self.fleet_store.exists():
                 return {'status': 'error', 'message': 'Data file missing'}
 
-            df = pd.read_csv(self.data_path)
-            vehicle_data_rows = df[df['vehicle_id'] == vehicle_id]
+            vehicle_data = self.fleet_store.get_vehicle(vehicle_id)
             
-            if vehicle_data_rows.empty:
+            if vehicle_data is None:
                  return {'status': 'error', 'message': 'Vehicle not found'}
-                 
-            vehicle_data = vehicle_data_rows.iloc[0]
             
             batch_id = vehicle_data['batch_id']
-            component = diagnosis['component']
-            
-            self.failure_patterns[batch_id].append({
-                'vehicle_id': vehicle_id,
-                'component': component,
-                'probability': diagnosis['probability'],
-                'timestamp': datetime.datetime.now().isoformat()
-            })
+            probability = float(diagnosis['probability'])
+            logged = self.failure_patterns.add(batch_id, vehicle_id, diagnosis['component'], probability)
+            self.anomaly_detector.observe(batch_id, vehicle_id, probability > HIGH_RISK_PROBABILITY, component=logged['common_component'])
             
             return self.analyze_batch_quality(batch_id)
         except Exception as e:
@@ -38,22 +47,18 @@ class ManufacturingAgent:
     
     def analyze_batch_quality(self, batch_id):
         try:
-            if not os.path.exists(self.data_path):
-                 return {}
-
-            df = pd.read_csv(self.data_path)
-            batch_vehicles = df[df['batch_id'] == batch_id]
-            
-            if batch_vehicles.empty:
+            # Fleet-side counters are maintained by FleetAggregates, logged
+            # diagnoses by the pattern store: no pass over the batch here
+            batch = self.aggregates.batch(batch_id)
+            if batch is None:
+                if not self.fleet_store.exists():
+                    return {}
                 return {'batch_id': batch_id, 'message': 'No data for batch'}
 
-            # Calculate batch statistics
-            avg_failure_risk = batch_vehicles['failure_risk'].mean()
-            high_risk_count = len(batch_vehicles[batch_vehicles['failure_risk'] > 0.7])
-            total_count = len(batch_vehicles)
-            
-            # Identify common failure components
-            component_failures = batch_vehicles['component_health'].value_counts()
+            avg_failure_risk = batch['avg_failure_risk']
+            high_risk_count = batch['high_risk_count']
+            total_count = batch['count']
+            most_common_issue = batch['common_component']
             
             # Generate insights
             insights = []
@@ -63,8 +68,11 @@ class ManufacturingAgent:
             if high_risk_count > total_count * 0.3:
                 insights.append(f"30%+ vehicles in batch {batch_id} are high-risk")
             
-            most_common_issue = component_failures.index[0] if len(component_failures) > 0 else 'Unknown'
             insights.append(f"Primary concern: {str(most_common_issue).replace('_', ' ').title()}")
+
+            anomaly = self.anomaly_detector.status(batch_id)
+            if anomaly and anomaly['state'] != 'normal':
+                insights.append(f"Failure rate {anomaly['failure_rate']:.0%} vs fleet {anomaly['baseline_rate']:.0%} across {anomaly['observations']} vehicles")
             
             return {
                 'batch_id': batch_id,
@@ -72,63 +80,45 @@ class ManufacturingAgent:
                 'high_risk_vehicles': high_risk_count,
                 'avg_failure_risk': float(avg_failure_risk),
                 'primary_issue': str(most_common_issue),
+                'logged_failures': self.failure_patterns.stats(batch_id),
+                'anomaly': anomaly,
                 'insights': insights,
-                'recommendation': self._generate_recommendation(avg_failure_risk, str(most_common_issue))
+                'recommendation': self._generate_recommendation(avg_failure_risk, str(most_common_issue), anomaly)
             }
         except Exception as e:
             print(f"ManufacturingAgent Error (Analyze): {e}")
             return {'status': 'error', 'message': 'Unable to analyze batch quality'}
     
-    def _generate_recommendation(self, avg_risk, primary_issue):
-        if avg_risk > 0.8:
+    def _generate_recommendation(self, avg_risk, primary_issue, anomaly=None):
+        state = anomaly['state'] if anomaly else 'normal'
+        if avg_risk > 0.8 or state == 'recall_alert':
             return f"URGENT: Investigate {primary_issue} supplier quality. Consider batch recall."
-        elif avg_risk > 0.6:
+        elif avg_risk > 0.6 or state == 'quality_alert':
             return f"Review {primary_issue} manufacturing process and supplier standards."
         else:
             return "Continue monitoring. No immediate action required."
     
     def get_quality_insights(self):
         try:
-            if not os.path.exists(self.data_path):
+            if not self.fleet_store.exists():
                 return {'batch_summary': {}, 'total_batches': 0, 'quality_trend': 'Unknown'}
-
-            df = pd.read_csv(self.data_path)
             
-            # Batch analysis - simplified for pandas compat without complex lambdas in agg if possible
-            # But the user code used lambda, so we'll try to keep it safe
-            
-            def get_mode(x):
-                m = x.mode()
-                return m[0] if not m.empty else 'Unknown'
-
-            batch_analysis = df.groupby('batch_id').agg({
-                'failure_risk': ['mean', 'count'],
-                'component_health': get_mode
-            }).round(3)
-            
-            # Flatten columns for easier JSON
-            # But specific aggregation structure might be expected. 
-            # We will convert to a straightforward dict structure.
-            
-            # Note: The original code returned `batch_analysis.to_dict()` which results in nested dicts with tuple keys or similar depending on pandas version.
-            # Let's make it a bit safer for JSON serialization if needed, but for now stick to close-to-original.
-            
-            # To avoid tuple keys in JSON (which fails), we might need to stringify keys or restructure.
-            # However, standard pandas to_dict default is usually okay-ish or needs 'records'. 
-            # Let's use a custom transform to be safe for API.
-            
-            summary = {}
-            for batch_id, group in df.groupby('batch_id'):
-                summary[batch_id] = {
-                    'avg_failure_risk': float(group['failure_risk'].mean()),
-                    'count': int(len(group)),
-                    'common_component': get_mode(group['component_health'])
+            # Per-batch counters are maintained incrementally, so this is O(#batches)
+            batches = self.aggregates.batch_summary()
+            summary = {
+                batch_id: {
+                    'avg_failure_risk': stats['avg_failure_risk'],
+                    'count': stats['count'],
+                    'common_component': stats['common_component']
                 }
+                for batch_id, stats in sorted(batches.items(), key=lambda item: str(item[0]))
+            }
+            mean_risk = self.aggregates.fleet_summary()['mean_failure_risk']
 
             return {
                 'batch_summary': summary,
-                'total_batches': len(df['batch_id'].unique()),
-                'quality_trend': 'Declining' if df['failure_risk'].mean() > 0.5 else 'Stable'
+                'total_batches': len(summary),
+                'quality_trend': 'Declining' if mean_risk > 0.5 else 'Stable'
             }
         except Exception as e:
             print(f"ManufacturingAgent Error (Insights): {e}")
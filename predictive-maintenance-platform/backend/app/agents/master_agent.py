@@ -1,16 +1,15 @@
 from typing import Dict, Any, Optional
 import threading
-try:
-    import pyttsx3
-except ImportError:
-    pyttsx3 = None
+import time
 
+from app.config import settings
 from .data_agent import DataAgent
 from .diagnosis_agent import DiagnosisAgent
 from .customer_agent import CustomerAgent
 from .scheduling_agent import SchedulingAgent
 from .manufacturing_agent import ManufacturingAgent
-from .ueba_agent import UEBAAgent
+from .ueba_agent import UEBAAgent, monitored, vehicle_resource
+from .enrichment import EnrichmentService
 
 import queue
 
@@ -18,10 +17,11 @@ class RoadIQVoiceAPI:
     def __init__(self):
         self.message_queue = queue.Queue()
         self.available = True
-        self._start_worker()
+        self.worker_thread = None
+        self._worker_lock = threading.Lock()
     
     def _start_worker(self):
-        """Start the dedicated voice worker thread"""
+        """Start the dedicated voice worker thread (on first use, so gTTS loads lazily)"""
         def worker():
             import os
             import time
@@ -72,8 +72,16 @@ class RoadIQVoiceAPI:
         pass
     
     def speak_async(self, text, emotion="professional"):
+        if self.worker_thread is None:
+            with self._worker_lock:
+                if self.worker_thread is None:
+                    self._start_worker()
         self.message_queue.put((text, emotion))
 
+    def stop(self):
+        if self.worker_thread is not None:
+            self.message_queue.put(None)
+
 class MasterAgent:
     def __init__(self):
         self.data_agent = DataAgent()
@@ -83,13 +91,23 @@ class MasterAgent:
         self.manufacturing_agent = ManufacturingAgent()
         self.ueba_agent = UEBAAgent()
         self.voice_assistant = RoadIQVoiceAPI()
+        self.enrichment_service = EnrichmentService(
+            self.diagnosis_agent,
+            max_workers=settings.ENRICHMENT_WORKERS,
+            timeout=settings.ENRICHMENT_TIMEOUT,
+            queue_timeout=settings.ENRICHMENT_QUEUE_TIMEOUT
+        )
+        # UEBA hook: every @monitored agent method is logged before it runs
+        self.ueba = self.ueba_agent
+        for agent in (self.data_agent, self.diagnosis_agent, self.customer_agent, self.scheduling_agent, self.manufacturing_agent):
+            agent.ueba = self.ueba_agent
         
-    def analyze_vehicle(self, vehicle_id: str):
-        # UEBA Check
-        self.ueba_agent.monitor_agent_action('MasterAgent', 'analyze_vehicle', f'vehicle_{vehicle_id}')
+    @monitored('analyze_vehicle', vehicle_resource)
+    def analyze_vehicle(self, vehicle_id: str, enrich: bool = True):
+        # enrich=False skips Gemini/YouTube so the caller can run them via enrichment_service
+        # UEBA checks run through the @monitored hooks on each agent call
         
         # 1. Gather Data
-        self.ueba_agent.monitor_agent_action('DataAgent', 'read_sensor_data', f'vehicle_{vehicle_id}')
         risk_data = self.data_agent.analyze_risk(vehicle_id)
         
         # 2. Diagnose if risk is present
@@ -97,15 +115,12 @@ class MasterAgent:
         customer_engagement = None
         
         if risk_data['level'] in ['HIGH', 'MEDIUM']:
-            self.ueba_agent.monitor_agent_action('DiagnosisAgent', 'predict_failure', f'vehicle_{vehicle_id}')
-            diagnosis = self.diagnosis_agent.predict_failure(vehicle_id)
+            diagnosis = self.diagnosis_agent.predict_failure(vehicle_id, enrich=enrich)
             
             # 3. Log pattern for manufacturing
-            self.ueba_agent.monitor_agent_action('ManufacturingAgent', 'log_failure_pattern', f'vehicle_{vehicle_id}')
             self.manufacturing_agent.log_failure_pattern(vehicle_id, diagnosis)
             
             # 4. Generate Customer Engagement
-            self.ueba_agent.monitor_agent_action('CustomerAgent', 'engage_customer', f'vehicle_{vehicle_id}')
             customer_engagement = self.customer_agent.engage_customer(vehicle_id, diagnosis)
             
             # TRIGGER VOICE ASSISTANT (Google Voice)
@@ -121,9 +136,27 @@ class MasterAgent:
             'timestamp': risk_data.get('timestamp') # Assuming timestamp might be added later or generated now
         }
 
+    def score_vehicles_batch(self, vehicle_ids=None, readings=None, source='fleet'):
+        if readings is not None:
+            results = self.data_agent.score_readings(readings, source=source)
+        else:
+            results = self.data_agent.score_fleet(vehicle_ids)
+            
+        summary = {'HIGH': 0, 'MEDIUM': 0, 'LOW': 0, 'UNKNOWN': 0}
+        for result in results:
+            summary[result['level']] += 1
+            
+        return {
+            'count': len(results),
+            'summary': summary,
+            'results': results
+        }
+
+    def list_vehicles(self, **query):
+        return self.data_agent.list_vehicles(**query)
+
+    @monitored('get_dashboard_data', 'dashboard')
     def get_dashboard_data(self):
-        self.ueba_agent.monitor_agent_action('MasterAgent', 'get_dashboard_data', 'dashboard')
-        
         fleet = self.data_agent.get_fleet_overview()
         quality = self.manufacturing_agent.get_quality_insights()
         
@@ -135,11 +168,55 @@ class MasterAgent:
         }
         
     def schedule_service(self, data: Dict[str, Any]):
-        self.ueba_agent.monitor_agent_action('SchedulingAgent', 'book_service', f"vehicle_{data.get('vehicle_id')}")
         return self.scheduling_agent.book_service(data.get('vehicle_id'), data.get('urgency'))
 
+    def schedule_service_bulk(self, data: Dict[str, Any]):
+        requests = [(vehicle.get('vehicle_id'), vehicle.get('urgency')) for vehicle in data.get('vehicles', [])]
+        return self.scheduling_agent.schedule_bulk(requests, max_days=data.get('max_days'))
+
+    def dashboard_version(self):
+        # One counter per state source behind the dashboard and batch views, so an
+        # in-memory change can't be served as a 304 of the previous payload
+        manufacturing = self.manufacturing_agent
+        return (
+            self.data_agent.fleet_store.signature(),
+            self.data_agent.aggregates.changes,
+            manufacturing.aggregates.changes,
+            manufacturing.failure_patterns.version,
+            manufacturing.anomaly_detector.version,
+            self.scheduling_agent.inventory.version
+        )
+
+    def security_version(self):
+        # New events, or a coarse clock tick so sliding-window rates can decay in cached views
+        return (self.ueba_agent.version, int(time.time()) // 15)
+
+    def drain_batch_alerts(self):
+        # New recall/quality alerts from the streaming batch detector, with manufacturer messages
+        return [self.customer_agent.format_manufacturer_alert(alert) for alert in self.manufacturing_agent.anomaly_detector.drain()]
+
+    def get_batch_alerts(self, limit=50):
+        detector = self.manufacturing_agent.anomaly_detector
+        return {
+            'alerts': [self.customer_agent.format_manufacturer_alert(alert) for alert in detector.recent_alerts(limit)],
+            'stats': detector.get_stats()
+        }
+
     def get_security_alerts(self):
         return self.ueba_agent.get_alerts()
     
+    @monitored('access_ml_model', vehicle_resource, agent_name='DiagnosisAgent')
+    def request_enrichment(self, vehicle_id: str):
+        return self.enrichment_service.schedule(vehicle_id)
+    
+    def get_enrichment(self, vehicle_id: str):
+        return self.enrichment_service.get_result(vehicle_id)
+    
+    def get_recommendation_cache_stats(self):
+        return self.diagnosis_agent.get_cache_stats()
+    
+    def get_enrichment_stats(self):
+        return self.enrichment_service.get_stats()
+    
     def get_voice_assistant(self):
         return self.voice_assistant
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as WaitTimeout
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+
+PROBABILITY_BUCKET = 0.05
+# Expired SQLite rows are deleted at most this often (seconds)
+PURGE_INTERVAL = 300
+
+def recommendation_key(component, probability, urgency, telemetry):
+    """Cache key: component, bucketed probability, urgency and a hash of the rounded telemetry."""
+    # Round before flooring so float error (0.35 / 0.05 = 6.999...) can't drop a value into the bucket below
+    bucket = round(math.floor(round(probability / PROBABILITY_BUCKET, 9)) * PROBABILITY_BUCKET, 2)
+    rounded = {k: round(v, 1) if isinstance(v, float) else v for k, v in sorted(telemetry.items())}
+    digest = hashlib.sha1(json.dumps(rounded, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{component}|{bucket:.2f}|{urgency}|{digest}"
+
+class RecommendationCache:
+    """TTL + LRU cache for LLM recommendations, with optional SQLite persistence.
+
+    Concurrent misses on the same key are coalesced: the first caller runs
+    `compute`, the others wait (up to `wait_timeout` seconds) for its result
+    instead of calling the model. SQLite reads and writes go through their own
+    lock, so a slow disk never blocks in-memory hits.
+    """
+    def __init__(self, ttl=3600, max_entries=1024, db_path=None, wait_timeout=30.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._next_purge = 0.0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS recommendations (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._db.commit()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'errors': 0, 'wait_timeouts': 0, 'purged': 0}
+        self._purge_expired(time.time())
+
+    def _lookup(self, key, now):
+        # In-memory only; callers hold self._lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return value
+            del self._entries[key]
+        return None
+
+    def _load(self, key, now):
+        # Disk lookup outside self._lock; a hit is promoted into memory
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT value, expires_at FROM recommendations WHERE key = ?", (key,)).fetchone()
+        if not row or row[1] <= now:
+            return None
+        with self._lock:
+            self._remember(key, row[0], row[1])
+            self.stats['disk_hits'] += 1
+        return row[0]
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _purge_expired(self, now):
+        if self._db is None or now < self._next_purge:
+            return
+        self._next_purge = now + min(self.ttl, PURGE_INTERVAL)
+        with self._db_lock:
+            deleted = self._db.execute("DELETE FROM recommendations WHERE expires_at <= ?", (now,)).rowcount
+            self._db.commit()
+        with self._lock:
+            self.stats['purged'] += max(deleted, 0)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            value = self._lookup(key, now)
+        if value is None:
+            value = self._load(key, now)
+        if value is None:
+            with self._lock:
+                self.stats['misses'] += 1
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("INSERT OR REPLACE INTO recommendations VALUES (?, ?, ?)", (key, value, expires_at))
+                self._db.commit()
+            self._purge_expired(now)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, calling `compute()` at most once per miss.
+
+        Exceptions from `compute` propagate to every coalesced caller and
+        nothing is cached. A coalesced caller that waits longer than
+        `wait_timeout` gets concurrent.futures.TimeoutError.
+        """
+        now = time.time()
+        with self._lock:
+            value = self._lookup(key, now)
+            if value is not None:
+                return value
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            try:
+                return future.result(timeout=self.wait_timeout)
+            except WaitTimeout:
+                with self._lock:
+                    self.stats['wait_timeouts'] += 1
+                raise
+
+        try:
+            value = self._load(key, now)
+            if value is None:
+                with self._lock:
+                    self.stats['misses'] += 1
+                value = compute()
+                if value is not None:
+                    self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['disk_hits'] + self.stats['misses'] + self.stats['coalesced']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'in_flight': len(self._in_flight),
+                'hit_ratio': (lookups - self.stats['misses']) / lookups if lookups else 0.0,
+                'persistent': self._db is not None
+            }
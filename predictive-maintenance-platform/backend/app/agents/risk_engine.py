@@ -0,0 +1,204 @@
+import numpy as np
+
+# Risk factor bits. Order matters: factors are reported in bit order.
+RISK_HIGH_TEMP = 1
+RISK_VIBRATION = 2
+RISK_LOW_BATTERY = 4
+RISK_DEGRADATION = 8
+# Trend bits, derived from rolling telemetry windows
+RISK_TEMP_RISING = 16
+RISK_VIBRATION_RISING = 32
+RISK_BATTERY_DRAINING = 64
+
+RISK_FACTORS = [
+    (RISK_HIGH_TEMP, 'High Engine Temperature'),
+    (RISK_VIBRATION, 'Excessive Vibration'),
+    (RISK_LOW_BATTERY, 'Low Battery'),
+    (RISK_DEGRADATION, 'Component Degradation'),
+    (RISK_TEMP_RISING, 'Engine Temperature Rising'),
+    (RISK_VIBRATION_RISING, 'Vibration Increasing'),
+    (RISK_BATTERY_DRAINING, 'Battery Voltage Dropping'),
+]
+
+# Fleet snapshot thresholds (vehicle_data.csv columns)
+ENGINE_TEMP_LIMIT = 100
+VIBRATION_LIMIT = 1.0
+BATTERY_VOLTAGE_MIN = 11.5
+DEGRADATION_LIMIT = 0.7
+HIGH_RISK_SCORE = 0.8
+MEDIUM_RISK_SCORE = 0.5
+
+# Trend thresholds (per hour, over the rolling telemetry window)
+TREND_MIN_SAMPLES = 5
+TEMP_RISE_PER_HOUR = 5.0
+VIBRATION_RISE_PER_HOUR = 0.2
+BATTERY_DROP_PER_HOUR = -0.5
+
+# Live telemetry thresholds (telemetry table columns)
+TELEMETRY_VIBRATION_LIMIT = 0.5
+TELEMETRY_BASE_RISK = 0.1
+TELEMETRY_MAX_RISK = 0.99
+CRITICAL_RISK = 0.7
+ELEVATED_RISK = 0.4
+# Added to the live telemetry risk per trend factor (see trend_mask)
+TELEMETRY_TREND_RISK = 0.15
+
+LEVELS = np.array(['LOW', 'MEDIUM', 'HIGH'], dtype=object)
+
+# Precomputed label lists for every possible mask, so results never loop over bits
+_FACTOR_LABELS = [[label for bit, label in RISK_FACTORS if mask & bit] for mask in range(1 << len(RISK_FACTORS))]
+_FACTOR_COUNTS = np.array([len(labels) for labels in _FACTOR_LABELS], dtype=np.int8)
+
+def factors_from_mask(mask):
+    return list(_FACTOR_LABELS[int(mask)])
+
+def trend_mask(features):
+    """Trend factor bits from TelemetryWindowStore.features() output (0 if too few samples)."""
+    if not features or features['samples'] < TREND_MIN_SAMPLES:
+        return 0
+    signals = features['signals']
+
+    def slope(name):
+        value = signals.get(name, {}).get('slope_per_hour')
+        return 0.0 if value is None else value
+
+    mask = 0
+    if slope('engine_temp') > TEMP_RISE_PER_HOUR:
+        mask |= RISK_TEMP_RISING
+    if slope('vibration_level') > VIBRATION_RISE_PER_HOUR:
+        mask |= RISK_VIBRATION_RISING
+    if slope('battery_voltage') < BATTERY_DROP_PER_HOUR:
+        mask |= RISK_BATTERY_DRAINING
+    return mask
+
+def window_trend_masks(windows, ids):
+    """Trend bits for each id from a TelemetryWindowStore (0 where there is no window).
+
+    Only ids that actually have a window are looked up, so scoring the whole
+    fleet costs one hash-based membership pass plus one features() call per
+    streaming vehicle, not per fleet vehicle.
+    """
+    import pandas as pd
+    masks = np.zeros(len(ids), dtype=np.int16)
+    streaming = windows.vehicle_ids()
+    if not streaming:
+        return masks
+    ids = pd.Series(np.asarray(ids, dtype=object), dtype=object)
+    cache = {}
+    for pos in np.flatnonzero(ids.isin(streaming).to_numpy()):
+        vehicle_id = ids.iat[pos]
+        if vehicle_id not in cache:
+            cache[vehicle_id] = trend_mask(windows.features(vehicle_id))
+        masks[pos] = cache[vehicle_id]
+    return masks
+
+def apply_trends(scored, trend_masks):
+    """OR trend bits into a scored frame and recompute levels, vectorized."""
+    trend_masks = np.asarray(trend_masks, dtype=np.int16)
+    if not trend_masks.any():
+        return scored
+    mask = scored['factor_mask'].to_numpy(dtype=np.int16) | trend_masks
+    level_index = _level_index(_FACTOR_COUNTS[mask], scored['score'].to_numpy())
+    return scored.assign(level=LEVELS[level_index], factor_mask=mask)
+
+def _level_index(factor_count, failure_risk):
+    high = (factor_count >= 2) | (failure_risk > HIGH_RISK_SCORE)
+    medium = (factor_count == 1) | (failure_risk > MEDIUM_RISK_SCORE)
+    return np.where(high, 2, np.where(medium, 1, 0))
+
+def score_reading(engine_temp, vibration, battery_voltage, failure_risk, trends=0):
+    """Scalar scoring of one fleet row. Returns (level, factor_mask)."""
+    mask = trends
+    if engine_temp > ENGINE_TEMP_LIMIT:
+        mask |= RISK_HIGH_TEMP
+    if vibration > VIBRATION_LIMIT:
+        mask |= RISK_VIBRATION
+    if battery_voltage < BATTERY_VOLTAGE_MIN:
+        mask |= RISK_LOW_BATTERY
+    if failure_risk > DEGRADATION_LIMIT:
+        mask |= RISK_DEGRADATION
+    count = _FACTOR_COUNTS[mask]
+    if count >= 2 or failure_risk > HIGH_RISK_SCORE:
+        level = 'HIGH'
+    elif count == 1 or failure_risk > MEDIUM_RISK_SCORE:
+        level = 'MEDIUM'
+    else:
+        level = 'LOW'
+    return level, mask
+
+def _column(frame, name, default):
+    import pandas as pd
+    from .fleet_frame import widen
+    if name in frame:
+        # float32 fleet columns are widened so thresholds see the recorded values
+        return widen(pd.to_numeric(frame[name], errors='coerce').to_numpy())
+    return np.full(len(frame), default, dtype=np.float64)
+
+def score_vehicles(frame):
+    """Vectorized equivalent of score_reading over N fleet rows.
+
+    Returns a DataFrame aligned with `frame` holding `level`, `score` and
+    `factor_mask` columns. Missing or non-numeric values never trip a factor,
+    and a missing failure_risk stays NaN in `score` (None once serialized),
+    as in the single-vehicle path.
+    """
+    import pandas as pd
+    temp = _column(frame, 'engine_temp', np.nan)
+    vibration = _column(frame, 'vibration', np.nan)
+    battery = _column(frame, 'battery_voltage', np.nan)
+    failure_risk = _column(frame, 'failure_risk', np.nan)
+
+    hot = temp > ENGINE_TEMP_LIMIT
+    shaking = vibration > VIBRATION_LIMIT
+    low_battery = battery < BATTERY_VOLTAGE_MIN
+    degraded = failure_risk > DEGRADATION_LIMIT
+
+    mask = (hot * RISK_HIGH_TEMP) | (shaking * RISK_VIBRATION) | (low_battery * RISK_LOW_BATTERY) | (degraded * RISK_DEGRADATION)
+    count = hot.astype(np.int8) + shaking + low_battery + degraded
+
+    return pd.DataFrame({
+        'level': LEVELS[_level_index(count, failure_risk)],
+        'score': failure_risk,
+        'factor_mask': mask.astype(np.int16),
+    }, index=frame.index)
+
+def telemetry_risk(telemetry_data, trends=0):
+    """Scalar risk for one telemetry dict (the worker's stub model)."""
+    risk = TELEMETRY_BASE_RISK
+    if telemetry_data.get('engine_temp', 90) > ENGINE_TEMP_LIMIT:
+        risk += 0.4
+    if telemetry_data.get('vibration_level', 0) > TELEMETRY_VIBRATION_LIMIT:
+        risk += 0.3
+    risk += TELEMETRY_TREND_RISK * _FACTOR_COUNTS[trends]
+    return min(risk, TELEMETRY_MAX_RISK)
+
+def score_telemetry(frame, trend_masks=None):
+    """Vectorized equivalent of telemetry_risk over N telemetry rows.
+
+    `trend_masks` (one value per row, e.g. from window_trend_masks) adds the
+    rolling-window trend factors to the mask and raises the risk per trend.
+    Returns a DataFrame with `level`, `score` and `factor_mask` columns.
+    """
+    import pandas as pd
+    temp = _column(frame, 'engine_temp', 90)
+    vibration = _column(frame, 'vibration_level', 0)
+    trends = np.zeros(len(frame), dtype=np.int16) if trend_masks is None else np.asarray(trend_masks, dtype=np.int16)
+
+    hot = temp > ENGINE_TEMP_LIMIT
+    shaking = vibration > TELEMETRY_VIBRATION_LIMIT
+    risk = TELEMETRY_BASE_RISK + 0.4 * hot + 0.3 * shaking + TELEMETRY_TREND_RISK * _FACTOR_COUNTS[trends]
+    risk = np.minimum(risk, TELEMETRY_MAX_RISK)
+    level_index = np.where(risk > CRITICAL_RISK, 2, np.where(risk > ELEVATED_RISK, 1, 0))
+
+    return pd.DataFrame({
+        'level': LEVELS[level_index],
+        'score': risk,
+        'factor_mask': ((hot * RISK_HIGH_TEMP) | (shaking * RISK_VIBRATION) | trends).astype(np.int16),
+    }, index=frame.index)
+
+def to_records(ids, scored):
+    """Serialize a scored frame into JSON-ready dicts (a NaN score becomes None)."""
+    return [
+        {'vehicle_id': vehicle_id, 'level': level, 'score': None if score != score else float(score), 'factors': factors_from_mask(mask), 'factor_mask': int(mask)}
+        for vehicle_id, level, score, mask in zip(ids, scored['level'], scored['score'], scored['factor_mask'])
+    ]
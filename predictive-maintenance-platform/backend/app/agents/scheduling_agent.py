@@ -1,63 +1,72 @@
-from datetime import datetime, timedelta
-import random
+from collections import defaultdict
+from datetime import date
+import time
+from app.config import settings
+from .slot_inventory import SlotInventory, urgency_window
+from .ueba_agent import monitored, vehicle_resource
 
 class SchedulingAgent:
+    ueba = None
+
     def __init__(self):
         self.service_centers = [
             {'id': 'SC001', 'name': 'Downtown Service Center', 'capacity': 8},
             {'id': 'SC002', 'name': 'North Side Auto Care', 'capacity': 6},
             {'id': 'SC003', 'name': 'Express Service Hub', 'capacity': 10}
         ]
-    
+        # Real bookings per center/day/time slot (capacity = vehicles per slot)
+        self.inventory = SlotInventory(
+            self.service_centers,
+            horizon_days=settings.SCHEDULING_HORIZON_DAYS
+        )
+
+    @monitored('book_service', vehicle_resource)
     def book_service(self, vehicle_id, urgency):
-        # Determine booking priority based on urgency
-        if urgency == 'Critical':
-            days_ahead = 1
-            priority = 'Emergency'
-        elif urgency == 'High':
-            days_ahead = 2
-            priority = 'High Priority'
-        elif urgency == 'Medium':
-            days_ahead = 7
-            priority = 'Standard'
-        else:
-            days_ahead = 14
-            priority = 'Routine'
-        
-        # Select service center based on capacity and urgency
-        selected_center = self.service_centers[0] if urgency == 'Critical' else random.choice(self.service_centers)
-        
-        # Generate appointment time
-        appointment_date = datetime.now() + timedelta(days=days_ahead)
-        time_slots = ['09:00 AM', '11:00 AM', '02:00 PM', '04:00 PM']
-        selected_time = random.choice(time_slots)
-        
-        booking_id = f"BK{random.randint(1000, 9999)}"
-        
+        # Earliest free slot from the urgency's first day (Critical: tomorrow, Low: in two weeks);
+        # status is 'Unavailable' when nothing is free within the horizon
+        return self.inventory.book(vehicle_id, urgency)
+
+    @monitored('book_service', 'fleet')
+    def schedule_bulk(self, requests, max_days=None):
+        # Recall campaigns: plan every vehicle in one greedy pass over all centers and days
+        started = time.perf_counter()
+        plan = self.inventory.book_many(requests, max_days=max_days)
+        elapsed = time.perf_counter() - started
+
+        today = self.inventory.today().toordinal()
+        by_urgency = defaultdict(lambda: {'requested': 0, 'confirmed': 0, 'within_window': 0, 'wait_days': 0})
+        last_day = today + 1
+        for (_, urgency), booking in zip(requests, plan):
+            stats = by_urgency[urgency]
+            stats['requested'] += 1
+            if booking['status'] != 'Confirmed':
+                continue
+            day = date.fromisoformat(booking['appointment_date']).toordinal()
+            last_day = max(last_day, day)
+            stats['confirmed'] += 1
+            stats['within_window'] += booking.get('within_window', True)
+            stats['wait_days'] += day - today
+        for stats in by_urgency.values():
+            wait_days = stats.pop('wait_days')
+            stats['mean_wait_days'] = round(wait_days / stats['confirmed'], 2) if stats['confirmed'] else None
+
+        confirmed = sum(stats['confirmed'] for stats in by_urgency.values())
         return {
-            'booking_id': booking_id,
-            'vehicle_id': vehicle_id,
-            'service_center': selected_center['name'],
-            'appointment_date': appointment_date.strftime('%Y-%m-%d'),
-            'appointment_time': selected_time,
-            'priority': priority,
-            'estimated_duration': '2 hours',
-            'status': 'Confirmed'
+            'plan': plan,
+            'stats': {
+                'requested': len(plan),
+                'confirmed': confirmed,
+                'unavailable': len(plan) - confirmed,
+                'by_urgency': dict(by_urgency),
+                'utilization': self.inventory.utilization(today + 1, last_day),
+                'elapsed_ms': round(elapsed * 1000, 2)
+            }
         }
-    
-    def get_available_slots(self, urgency):
-        # Mock available slots based on urgency
-        base_date = datetime.now()
-        slots = []
-        
-        for i in range(1, 8):
-            date = base_date + timedelta(days=i)
-            # Simplified mock logic
-            for time in ['09:00 AM', '11:00 AM', '02:00 PM', '04:00 PM']:
-                slots.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'time': time,
-                    'available': random.choice([True, False])
-                })
-        
-        return slots
+
+    def cancel_booking(self, booking_id):
+        return self.inventory.cancel(booking_id)
+
+    def get_available_slots(self, urgency, days=7):
+        _, first_offset, _ = urgency_window(urgency)
+        first_day = self.inventory.today().toordinal() + first_offset
+        return self.inventory.availability(first_day, days)
@@ -0,0 +1,198 @@
+from collections import OrderedDict, deque, Counter
+from datetime import datetime
+import threading
+import time
+
+class SecurityEvent:
+    """One UEBA event. Numeric timestamp; ISO formatting happens in to_dict()."""
+    __slots__ = ('ts', 'agent', 'action', 'resource', 'status', 'risk_level', 'alert')
+
+    def __init__(self, ts, agent, action, resource, status, risk_level, alert=None):
+        self.ts = ts
+        self.agent = agent
+        self.action = action
+        self.resource = resource
+        self.status = status
+        self.risk_level = risk_level
+        self.alert = alert
+
+    def to_dict(self):
+        entry = {
+            'timestamp': datetime.fromtimestamp(self.ts).isoformat(),
+            'agent': self.agent,
+            'action': self.action,
+            'resource': self.resource,
+            'status': self.status,
+            'risk_level': self.risk_level
+        }
+        if self.alert is not None:
+            entry['alert'] = self.alert
+        return entry
+
+    def to_audit_record(self):
+        """Row in the agent_logs layout used by the worker.
+
+        agent_logs.vehicle_id is a UUID foreign key, which fleet ids ('V001')
+        and resources like 'fleet_batch' are not, so it is left empty; the
+        resource is kept in details.
+        """
+        return {
+            'agent_name': self.agent,
+            'action_type': self.action,
+            'vehicle_id': None,
+            'details': self.to_dict(),
+            'decision_confidence': 1.0
+        }
+
+class RateWindow:
+    """Events and blocked events over the last `seconds`, in one-second buckets.
+
+    Adding and reading are O(1) amortized: only buckets that went stale since
+    the previous call are cleared, at most `seconds` of them.
+    """
+    __slots__ = ('seconds', '_counts', '_blocked', '_total', '_total_blocked', '_last')
+
+    def __init__(self, seconds=60):
+        self.seconds = seconds
+        self._counts = [0] * seconds
+        self._blocked = [0] * seconds
+        self._total = 0
+        self._total_blocked = 0
+        self._last = None
+
+    def _advance(self, second):
+        if self._last is None:
+            self._last = second
+            return
+        gap = second - self._last
+        if gap <= 0:
+            return
+        for step in range(1, min(gap, self.seconds) + 1):
+            slot = (self._last + step) % self.seconds
+            self._total -= self._counts[slot]
+            self._total_blocked -= self._blocked[slot]
+            self._counts[slot] = 0
+            self._blocked[slot] = 0
+        self._last = second
+
+    def add(self, now, blocked):
+        second = int(now)
+        if second != self._last:
+            self._advance(second)
+        slot = second % self.seconds
+        self._counts[slot] += 1
+        self._total += 1
+        if blocked:
+            self._blocked[slot] += 1
+            self._total_blocked += 1
+
+    def totals(self, now):
+        self._advance(int(now))
+        return self._total, self._total_blocked
+
+class SecurityEventStore:
+    """Bounded store of UEBA events with incrementally maintained statistics.
+
+    Keeps the last `capacity` events in a ring buffer, counters per agent and
+    per status (lifetime and in-buffer), a sliding-window rate per agent, and
+    one entry per distinct alert (agent + description) with its occurrence
+    count, so reads never scan the event history.
+    """
+    def __init__(self, capacity=10000, window_seconds=60, max_alerts=500):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.max_alerts = max_alerts
+        self._events = deque()
+        self._lock = threading.Lock()
+        self.total_events = 0
+        self.total_by_status = Counter()
+        self.buffered_by_agent = Counter()
+        self.buffered_by_status = Counter()
+        self._rates = {}
+        self._alerts = OrderedDict()
+        self._alert_seq = 0
+
+    def add(self, event):
+        agent, status = event.agent, event.status
+        with self._lock:
+            events = self._events
+            if len(events) >= self.capacity:
+                evicted = events.popleft()
+                self.buffered_by_agent[evicted.agent] -= 1
+                self.buffered_by_status[evicted.status] -= 1
+            events.append(event)
+            self.total_events += 1
+            self.total_by_status[status] += 1
+            self.buffered_by_agent[agent] += 1
+            self.buffered_by_status[status] += 1
+
+            rate = self._rates.get(agent)
+            if rate is None:
+                rate = self._rates[agent] = RateWindow(self.window_seconds)
+            rate.add(event.ts, status == 'blocked')
+
+            if event.alert is not None:
+                self._record_alert(event, event.ts)
+
+    def _record_alert(self, event, now):
+        key = (event.agent, event.alert)
+        alert = self._alerts.get(key)
+        if alert is None:
+            self._alert_seq += 1
+            alert = {
+                'id': f"ALERT{self._alert_seq:03d}",
+                'severity': event.risk_level.title(),
+                'agent': event.agent,
+                'description': event.alert,
+                'status': 'Blocked' if event.status == 'blocked' else 'Monitoring',
+                'action_taken': 'Access denied' if event.status == 'blocked' else 'Increased logging enabled',
+                'first_seen': now,
+                'count': 0
+            }
+            self._alerts[key] = alert
+        alert['count'] += 1
+        alert['last_seen'] = now
+        self._alerts.move_to_end(key)
+        while len(self._alerts) > self.max_alerts:
+            self._alerts.popitem(last=False)
+
+    def rate(self, agent, now=None):
+        """Window stats for one agent: events per minute and blocked ratio."""
+        now = time.time() if now is None else now
+        with self._lock:
+            window = self._rates.get(agent)
+            count, blocked = window.totals(now) if window is not None else (0, 0)
+        return {
+            'events': count,
+            'blocked': blocked,
+            'events_per_minute': count * 60.0 / self.window_seconds,
+            'blocked_ratio': blocked / count if count else 0.0
+        }
+
+    def agents(self):
+        with self._lock:
+            return list(self._rates)
+
+    def recent_alerts(self, limit=20):
+        """Most recently seen distinct alerts, newest first, with ISO timestamps."""
+        with self._lock:
+            alerts = list(self._alerts.values())[-limit:]
+        return [
+            {
+                **alert,
+                'timestamp': datetime.fromtimestamp(alert['last_seen']).isoformat(),
+                'first_seen': datetime.fromtimestamp(alert['first_seen']).isoformat(),
+                'last_seen': datetime.fromtimestamp(alert['last_seen']).isoformat()
+            }
+            for alert in reversed(alerts)
+        ]
+
+    def events(self, agent=None):
+        """Buffered SecurityEvents, oldest first (a copy; O(capacity))."""
+        with self._lock:
+            if agent is None:
+                return list(self._events)
+            return [event for event in self._events if event.agent == agent]
+
+    def __len__(self):
+        return len(self._events)
@@ -0,0 +1,238 @@
+from bisect import bisect_left, insort
+from datetime import date
+import heapq
+import threading
+
+TIME_SLOTS = ['09:00 AM', '11:00 AM', '02:00 PM', '04:00 PM']
+
+# urgency -> (priority label, first day offered, days in the preferred window)
+URGENCY_WINDOWS = {
+    'Critical': ('Emergency', 1, 2),
+    'High': ('High Priority', 2, 3),
+    'Medium': ('Standard', 7, 7),
+    'Low': ('Routine', 14, 14),
+}
+URGENCY_RANK = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+
+def urgency_window(urgency):
+    return URGENCY_WINDOWS.get(urgency, URGENCY_WINDOWS['Low'])
+
+class SlotInventory:
+    """Per-center, per-day, per-time-slot booking capacity.
+
+    A center's `capacity` is the number of vehicles it can take in each time
+    slot. Slots are numbered `day_ordinal * len(TIME_SLOTS) + slot` and the
+    ones with any free place are kept in a sorted list, so the earliest
+    available slot from a given day is a bisect. All reads and reservations
+    happen under one lock, which makes concurrent bookings (threads, or
+    coroutines handing work to the executor) safe against overbooking.
+    Days before `today()` are dropped on the next operation, together with
+    their bookings, so a vehicle's past appointment no longer blocks a new one.
+    """
+    def __init__(self, service_centers, horizon_days=60, today=None):
+        self.centers = service_centers
+        self.horizon_days = horizon_days
+        self._today = today
+        self._lock = threading.Lock()
+        self._remaining = {}
+        self._open = []
+        self._first_day = None
+        self._last_day = None
+        self._bookings = {}
+        self._by_vehicle = {}
+        self._sequence = 0
+        # Bumped whenever a booking is made, released or expired, for cache version tokens
+        self.version = 0
+
+    def today(self):
+        return self._today or date.today()
+
+    def _expire(self):
+        # Drop days (and their bookings) that are now in the past; runs once per day change
+        today = self.today().toordinal()
+        if self._first_day is None or self._first_day >= today:
+            return
+        cutoff = today * len(TIME_SLOTS)
+        last = self._last_day if self._last_day is not None else self._first_day - 1
+        for day in range(self._first_day, min(today, last + 1)):
+            for slot in range(len(TIME_SLOTS)):
+                self._remaining.pop(day * len(TIME_SLOTS) + slot, None)
+        del self._open[:bisect_left(self._open, cutoff)]
+        for booking_id in [b for b, booking in self._bookings.items() if booking[0] < cutoff]:
+            _, _, vehicle_id, _ = self._bookings.pop(booking_id)
+            if self._by_vehicle.get(vehicle_id) == booking_id:
+                del self._by_vehicle[vehicle_id]
+        self._first_day = today
+        if last < today:
+            self._last_day = None
+        self.version += 1
+
+    def _extend(self, last_day):
+        # Materialize days lazily up to `last_day` (an ordinal)
+        first = self._last_day + 1 if self._last_day is not None else self.today().toordinal()
+        if self._first_day is None or self._last_day is None:
+            self._first_day = first
+        capacities = [center['capacity'] for center in self.centers]
+        total = sum(capacities)
+        for day in range(first, last_day + 1):
+            for slot in range(len(TIME_SLOTS)):
+                key = day * len(TIME_SLOTS) + slot
+                self._remaining[key] = list(capacities)
+                if total:
+                    self._open.append(key)
+        if last_day >= first:
+            self._last_day = last_day
+
+    def _earliest(self, first_day, last_day):
+        if self._last_day is None or self._last_day < last_day:
+            self._extend(last_day)
+        start = first_day * len(TIME_SLOTS)
+        i = bisect_left(self._open, start)
+        if i < len(self._open) and self._open[i] < (last_day + 1) * len(TIME_SLOTS):
+            return self._open[i]
+        return None
+
+    def _reserve(self, key, vehicle_id, urgency):
+        remaining = self._remaining[key]
+        # Spread load: the center with the most free places in this slot
+        center = max(range(len(remaining)), key=lambda c: remaining[c])
+        remaining[center] -= 1
+        if not any(remaining):
+            self._open.pop(bisect_left(self._open, key))
+        self._sequence += 1
+        booking_id = f"BK{self._sequence:05d}"
+        self._bookings[booking_id] = (key, center, vehicle_id, urgency)
+        self._by_vehicle[vehicle_id] = booking_id
+        self.version += 1
+        return booking_id
+
+    def _describe(self, booking_id, window_end=None):
+        key, center, vehicle_id, urgency = self._bookings[booking_id]
+        day, slot = divmod(key, len(TIME_SLOTS))
+        booking = {
+            'booking_id': booking_id,
+            'vehicle_id': vehicle_id,
+            'service_center': self.centers[center]['name'],
+            'service_center_id': self.centers[center]['id'],
+            'appointment_date': date.fromordinal(day).strftime('%Y-%m-%d'),
+            'appointment_time': TIME_SLOTS[slot],
+            'priority': urgency_window(urgency)[0],
+            'estimated_duration': '2 hours',
+            'status': 'Confirmed'
+        }
+        if window_end is not None:
+            booking['within_window'] = day <= window_end
+        return booking
+
+    def _release(self, booking_id):
+        key, center, vehicle_id, _ = self._bookings.pop(booking_id)
+        remaining = self._remaining[key]
+        if not any(remaining):
+            insort(self._open, key)
+        remaining[center] += 1
+        if self._by_vehicle.get(vehicle_id) == booking_id:
+            del self._by_vehicle[vehicle_id]
+        self.version += 1
+
+    def _book(self, vehicle_id, urgency, max_days):
+        self._expire()
+        _, first_offset, window_days = urgency_window(urgency)
+        today = self.today().toordinal()
+        first_day = today + first_offset
+        window_end = first_day + window_days - 1
+        # The urgency's own window is always searchable, whatever the horizon
+        last_day = today + max(max_days, first_offset + window_days - 1)
+
+        existing = self._by_vehicle.get(vehicle_id)
+        if existing is not None:
+            # One active booking per vehicle; repeating the request returns it,
+            # unless a more urgent request can be seen earlier than booked
+            booked_key, _, _, booked_urgency = self._bookings[existing]
+            if urgency_window(booked_urgency)[1] <= first_offset:
+                return self._describe(existing, window_end=window_end)
+            key = self._earliest(first_day, last_day)
+            if key is None or key >= booked_key:
+                return self._describe(existing, window_end=window_end)
+            self._release(existing)
+            return self._describe(self._reserve(key, vehicle_id, urgency), window_end=window_end)
+
+        key = self._earliest(first_day, last_day)
+        if key is None:
+            # Report the days actually searched, which can exceed max_days
+            return {'vehicle_id': vehicle_id, 'priority': urgency_window(urgency)[0], 'status': 'Unavailable', 'reason': f'No capacity in the next {last_day - today} days'}
+        return self._describe(self._reserve(key, vehicle_id, urgency), window_end=window_end)
+
+    def book(self, vehicle_id, urgency, max_days=None):
+        """Atomically reserve the earliest free slot in or after the urgency window."""
+        with self._lock:
+            return self._book(vehicle_id, urgency, max_days or self.horizon_days)
+
+    def book_many(self, requests, max_days=None):
+        """Book (vehicle_id, urgency) pairs in one pass, most urgent first.
+
+        Requests are drawn from a priority queue keyed by urgency rank and
+        arrival order, so critical vehicles get the earliest capacity before
+        routine ones. Results come back in request order.
+        """
+        max_days = max_days or self.horizon_days
+        queue = [(URGENCY_RANK.get(urgency, len(URGENCY_RANK)), i, vehicle_id, urgency) for i, (vehicle_id, urgency) in enumerate(requests)]
+        heapq.heapify(queue)
+        results = [None] * len(queue)
+        with self._lock:
+            while queue:
+                _, i, vehicle_id, urgency = heapq.heappop(queue)
+                results[i] = self._book(vehicle_id, urgency, max_days)
+        return results
+
+    def cancel(self, booking_id):
+        with self._lock:
+            self._expire()
+            if booking_id not in self._bookings:
+                return False
+            self._release(booking_id)
+            return True
+
+    def utilization(self, first_day, last_day):
+        """Booked places vs capacity per center between two day ordinals (inclusive)."""
+        with self._lock:
+            self._expire()
+            first_day = max(first_day, self.today().toordinal())
+            self._earliest(first_day, last_day)
+            booked = [0] * len(self.centers)
+            for day in range(first_day, last_day + 1):
+                for slot in range(len(TIME_SLOTS)):
+                    remaining = self._remaining[day * len(TIME_SLOTS) + slot]
+                    for center, free in enumerate(remaining):
+                        booked[center] += self.centers[center]['capacity'] - free
+        slots = (last_day - first_day + 1) * len(TIME_SLOTS)
+        centers = {}
+        for center, count in zip(self.centers, booked):
+            capacity = center['capacity'] * slots
+            centers[center['id']] = {'booked': count, 'capacity': capacity, 'utilization': round(count / capacity, 4) if capacity else 0.0}
+        total_booked = sum(booked)
+        total_capacity = sum(c['capacity'] for c in centers.values())
+        return {
+            'from': date.fromordinal(first_day).strftime('%Y-%m-%d'),
+            'to': date.fromordinal(last_day).strftime('%Y-%m-%d'),
+            'booked': total_booked,
+            'capacity': total_capacity,
+            'utilization': round(total_booked / total_capacity, 4) if total_capacity else 0.0,
+            'centers': centers
+        }
+
+    def availability(self, first_day, days):
+        """Free places per (date, time) for `days` days from the `first_day` ordinal."""
+        with self._lock:
+            self._expire()
+            self._earliest(first_day, first_day + days - 1)
+            slots = []
+            for day in range(first_day, first_day + days):
+                for slot, label in enumerate(TIME_SLOTS):
+                    free = sum(self._remaining[day * len(TIME_SLOTS) + slot])
+                    slots.append({
+                        'date': date.fromordinal(day).strftime('%Y-%m-%d'),
+                        'time': label,
+                        'available': free > 0,
+                        'remaining': free
+                    })
+            return slots
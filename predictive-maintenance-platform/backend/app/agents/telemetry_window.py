@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import time
+import numpy as np
+
+# Numeric columns of the `telemetry` table
+SIGNALS = ('speed', 'engine_rpm', 'engine_temp', 'battery_voltage', 'tire_pressure', 'vibration_level')
+
+SECONDS_PER_HOUR = 3600.0
+
+def _to_epoch(value):
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+class VehicleWindow:
+    """Last `capacity` readings of one vehicle, stored in preallocated arrays.
+
+    Running sums are updated on every push and eviction, so mean, variance,
+    slope (per hour) and EWMA are O(1) per reading. Missing values are kept
+    as NaN and excluded from that signal's sums.
+    """
+    def __init__(self, capacity, n_signals, alpha):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.values = np.full((capacity, n_signals), np.nan)
+        self.hours = np.zeros(capacity)
+        self.head = 0
+        self.size = 0
+        self.t0 = None
+        self.last_timestamp = None
+        self._pushes_since_resync = 0
+        self._reset_sums(n_signals)
+        self.ewma = np.full(n_signals, np.nan)
+
+    def _reset_sums(self, n_signals):
+        self.n = np.zeros(n_signals)
+        self.sum_y = np.zeros(n_signals)
+        self.sum_yy = np.zeros(n_signals)
+        self.sum_t = np.zeros(n_signals)
+        self.sum_tt = np.zeros(n_signals)
+        self.sum_ty = np.zeros(n_signals)
+
+    def _accumulate(self, t, y, sign):
+        valid = ~np.isnan(y)
+        y0 = np.where(valid, y, 0.0)
+        self.n += sign * valid
+        self.sum_y += sign * y0
+        self.sum_yy += sign * y0 * y0
+        self.sum_t += sign * t * valid
+        self.sum_tt += sign * t * t * valid
+        self.sum_ty += sign * t * y0
+
+    def push(self, timestamp, y):
+        if self.t0 is None:
+            self.t0 = timestamp
+        t = (timestamp - self.t0) / SECONDS_PER_HOUR
+
+        if self.size == self.capacity:
+            self._accumulate(self.hours[self.head], self.values[self.head], -1)
+        else:
+            self.size += 1
+        self.values[self.head] = y
+        self.hours[self.head] = t
+        self.head = (self.head + 1) % self.capacity
+        self._accumulate(t, y, 1)
+        self.last_timestamp = timestamp
+
+        valid = ~np.isnan(y)
+        fresh = valid & np.isnan(self.ewma)
+        self.ewma = np.where(fresh, y, self.ewma)
+        self.ewma = np.where(valid & ~fresh, self.alpha * y + (1 - self.alpha) * self.ewma, self.ewma)
+
+        # Rebase time and rebuild sums once per full turn to stop float drift (amortized O(1))
+        self._pushes_since_resync += 1
+        if self._pushes_since_resync >= self.capacity:
+            self._resync()
+
+    def _resync(self):
+        self._pushes_since_resync = 0
+        order = np.arange(self.head - self.size, self.head) % self.capacity
+        oldest = self.hours[order[0]]
+        self.t0 += oldest * SECONDS_PER_HOUR
+        self.hours[order] -= oldest
+        y = self.values[order]
+        t = self.hours[order][:, None]
+        valid = ~np.isnan(y)
+        y0 = np.where(valid, y, 0.0)
+        self.n = valid.sum(axis=0).astype(np.float64)
+        self.sum_y = y0.sum(axis=0)
+        self.sum_yy = (y0 * y0).sum(axis=0)
+        self.sum_t = (t * valid).sum(axis=0)
+        self.sum_tt = (t * t * valid).sum(axis=0)
+        self.sum_ty = (t * y0).sum(axis=0)
+
+    def stats(self):
+        n = self.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.sum_y / n
+            var = (self.sum_yy - self.sum_y * mean) / (n - 1)
+            denom = n * self.sum_tt - self.sum_t * self.sum_t
+            slope = (n * self.sum_ty - self.sum_t * self.sum_y) / denom
+        var = np.where(n > 1, np.maximum(var, 0.0), np.nan)
+        slope = np.where((n > 1) & (denom > 1e-12), slope, np.nan)
+        return n, mean, var, slope, self.ewma
+
+class TelemetryWindowStore:
+    """Rolling telemetry windows for recently active vehicles (LRU-bounded)."""
+    def __init__(self, capacity=120, alpha=0.2, max_vehicles=100000, signals=SIGNALS):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.max_vehicles = max_vehicles
+        self.signals = signals
+        self._signal_index = {name: i for i, name in enumerate(signals)}
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _row(self, data):
+        return np.array([np.nan if data.get(name) is None else float(data[name]) for name in self.signals])
+
+    def push(self, vehicle_id, data):
+        self.push_many([(vehicle_id, data)])
+
+    def push_many(self, readings):
+        with self._lock:
+            for vehicle_id, data in readings:
+                try:
+                    timestamp = _to_epoch(data.get('timestamp'))
+                    row = self._row(data)
+                except (TypeError, ValueError):
+                    continue
+                window = self._windows.get(vehicle_id)
+                if window is None:
+                    window = VehicleWindow(self.capacity, len(self.signals), self.alpha)
+                    self._windows[vehicle_id] = window
+                    if len(self._windows) > self.max_vehicles:
+                        self._windows.popitem(last=False)
+                else:
+                    self._windows.move_to_end(vehicle_id)
+                window.push(timestamp, row)
+
+    def features(self, vehicle_id):
+        """Per-signal rolling stats for a vehicle, or None if it has no readings."""
+        with self._lock:
+            window = self._windows.get(vehicle_id)
+            if window is None:
+                return None
+            n, mean, var, slope, ewma = window.stats()
+            samples = window.size
+            last_timestamp = window.last_timestamp
+
+        def clean(value):
+            return None if np.isnan(value) else float(value)
+
+        return {
+            'samples': samples,
+            'last_timestamp': datetime.fromtimestamp(last_timestamp).isoformat(),
+            'signals': {
+                name: {
+                    'count': int(n[i]),
+                    'mean': clean(mean[i]),
+                    'variance': clean(var[i]),
+                    'slope_per_hour': clean(slope[i]),
+                    'ewma': clean(ewma[i])
+                }
+                for name, i in self._signal_index.items()
+            }
+        }
+
+    def vehicle_ids(self):
+        with self._lock:
+            return list(self._windows.keys())
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_telemetry_windows():
+    """Process-wide TelemetryWindowStore fed by telemetry ingestion."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = TelemetryWindowStore()
+    return _default_store
@@ -1,8 +1,46 @@
 from datetime import datetime
-import random
+import functools
+import time
+from app.config import settings
+from .security_events import SecurityEventStore, SecurityEvent
+
+# Behaviour baselines, over the sliding window
+MAX_ACTIONS_PER_MINUTE = 100
+MAX_BLOCKED_PER_WINDOW = 5
+
+ALLOWED = 'allowed'
+BLOCKED = 'blocked'
+
+# Resource patterns that are blocked for an agent regardless of its permissions:
+# agent -> [(substring, risk_level, alert)]
+RESOURCE_RULES = {
+    'SchedulingAgent': [('sensor_data', 'medium', "Scheduling agent accessing sensor data - potential privilege escalation")],
+    'CustomerAgent': [('manufacturing', 'high', "Customer agent accessing manufacturing data - data breach attempt")],
+}
+
+def vehicle_resource(vehicle_id=None, *args, **kwargs):
+    return f"vehicle_{vehicle_id}"
+
+def monitored(action, resource=None, agent_name=None):
+    """Log every call of an agent method through the instance's `ueba` hook.
+
+    `resource` is a string or a callable receiving the method's arguments.
+    Agents without a hook (`ueba = None`, e.g. in scripts and tests) run
+    unmonitored at the cost of one attribute check.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            ueba = self.ueba
+            if ueba is not None:
+                target = resource(*args, **kwargs) if callable(resource) else resource or fn.__name__
+                ueba.monitor_agent_action(agent_name or type(self).__name__, action, target)
+            return fn(self, *args, **kwargs)
+        return wrapper
+    return decorate
 
 class UEBAAgent:
-    def __init__(self):
+    def __init__(self, audit_sink=None):
         self.agent_permissions = {
             'DataAgent': ['read_sensor_data', 'analyze_trends'],
             'DiagnosisAgent': ['read_sensor_data', 'access_ml_model'],
@@ -11,83 +49,102 @@ class UEBAAgent:
             'ManufacturingAgent': ['read_batch_data', 'generate_reports'],
             'MasterAgent': ['*'] # Master Agent has all permissions
         }
-        self.security_logs = []
+        self.compile_permissions()
+        # Ring buffer with incremental counters; no read scans the history
+        self.events = SecurityEventStore(
+            capacity=settings.UEBA_EVENT_CAPACITY,
+            window_seconds=settings.UEBA_WINDOW_SECONDS
+        )
+        # Bumped on every logged event, lets callers cache views of the log
+        self.version = 0
+        # Optional persistent, batched sink (app/audit.py); emit never blocks
+        self.audit_sink = audit_sink
+    
+    def compile_permissions(self):
+        """Freeze agent_permissions into lookup tables; call again after editing it."""
+        self._permissions = {agent: frozenset(actions) for agent, actions in self.agent_permissions.items()}
+        self._unrestricted = frozenset(agent for agent, actions in self._permissions.items() if '*' in actions)
+        # (agent, action) -> (status, risk_level, alert), filled on first use
+        self._decisions = {}
+    
+    def _decide(self, agent_name, action):
+        if agent_name in self._unrestricted or action in self._permissions.get(agent_name, ()):
+            decision = (ALLOWED, 'low', None)
+        else:
+            decision = (BLOCKED, 'high', f"Unauthorized action: {agent_name} attempted {action}")
+        if len(self._decisions) < 4096:
+            self._decisions[(agent_name, action)] = decision
+        return decision
         
     def monitor_agent_action(self, agent_name, action, resource):
-        # Check if action is permitted for this agent
-        permitted_actions = self.agent_permissions.get(agent_name, [])
-        is_allowed = '*' in permitted_actions or action in permitted_actions
+        # Permission decision is precomputed per (agent, action)
+        decision = self._decisions.get((agent_name, action)) or self._decide(agent_name, action)
+        status, risk_level, alert = decision
         
-        log_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'agent': agent_name,
-            'action': action,
-            'resource': resource,
-            'status': 'allowed' if is_allowed else 'blocked',
-            'risk_level': 'low'
-        }
-        
-        # Detect anomalies
-        if not is_allowed:
-            log_entry['risk_level'] = 'high'
-            log_entry['alert'] = f"Unauthorized action: {agent_name} attempted {action}"
-            
-        # Specific anomaly patterns
-        if agent_name == 'SchedulingAgent' and 'sensor_data' in resource:
-            log_entry['status'] = 'blocked'
-            log_entry['risk_level'] = 'medium'
-            log_entry['alert'] = "Scheduling agent accessing sensor data - potential privilege escalation"
-            
-        if agent_name == 'CustomerAgent' and 'manufacturing' in resource:
-            log_entry['status'] = 'blocked'
-            log_entry['risk_level'] = 'high'
-            log_entry['alert'] = "Customer agent accessing manufacturing data - data breach attempt"
+        # Specific anomaly patterns (only agents with resource rules pay for the scan)
+        rules = RESOURCE_RULES.get(agent_name)
+        if rules:
+            for pattern, rule_risk, rule_alert in rules:
+                if pattern in resource:
+                    status, risk_level, alert = BLOCKED, rule_risk, rule_alert
         
-        self.security_logs.append(log_entry)
-        return log_entry
+        event = SecurityEvent(time.time(), agent_name, action, resource, status, risk_level, alert)
+        self.events.add(event)
+        self.version += 1
+        if self.audit_sink is not None:
+            self.audit_sink.emit(event)
+        return event
+    
+    @property
+    def security_logs(self):
+        # Recent events only (bounded by the ring buffer), formatted on read
+        return [event.to_dict() for event in self.events.events()]
+    
+    def _behavior_alert(self, agent_name, stats):
+        if stats['events_per_minute'] > MAX_ACTIONS_PER_MINUTE:
+            return 'anomaly', 'Excessive activity detected'
+        if stats['blocked'] > MAX_BLOCKED_PER_WINDOW:
+            return 'suspicious', 'Multiple unauthorized attempts'
+        return None, None
     
     def get_alerts(self):
-        # Generate some sample security alerts for demo if logs are empty, 
-        # otherwise use real logs.
-        # For the sake of the demo script, we can mix them.
+        # Distinct alerts from logged events, plus live behaviour anomalies per agent
+        active_alerts = self.events.recent_alerts()
+        now = datetime.now().isoformat()
+        blocked_ratio = 0.0
+        window_events = 0
+        for agent_name in self.events.agents():
+            stats = self.events.rate(agent_name)
+            window_events += stats['events']
+            blocked_ratio += stats['blocked']
+            status, reason = self._behavior_alert(agent_name, stats)
+            if status:
+                active_alerts.insert(0, {
+                    'id': f"BEHAVIOR-{agent_name}",
+                    'timestamp': now,
+                    'severity': 'High' if status == 'suspicious' else 'Medium',
+                    'agent': agent_name,
+                    'description': f"{reason}: {stats['events_per_minute']:.0f} actions/min, {stats['blocked']} blocked",
+                    'status': 'Monitoring',
+                    'action_taken': 'Agent behaviour flagged for review'
+                })
+        blocked_ratio = blocked_ratio / window_events if window_events else 0.0
         
-        sample_alerts = [
-            {
-                'id': 'ALERT001',
-                'timestamp': datetime.now().isoformat(),
-                'severity': 'Medium',
-                'agent': 'SchedulingAgent',
-                'description': 'Attempted unauthorized sensor data access',
-                'status': 'Blocked',
-                'action_taken': 'Access denied, agent permissions reviewed'
-            },
-            {
-                'id': 'ALERT002', 
-                'timestamp': datetime.now().isoformat(),
-                'severity': 'Low',
-                'agent': 'DataAgent',
-                'description': 'Unusual data access pattern detected',
-                'status': 'Monitoring',
-                'action_taken': 'Increased logging enabled'
-            }
-        ]
+        # Score drops with the share of blocked actions in the window and with open high-severity alerts
+        high_alerts = sum(1 for alert in active_alerts if alert['severity'] == 'High')
+        security_score = max(0, round(100 - 50 * blocked_ratio - 5 * high_alerts))
         
         return {
-            'active_alerts': sample_alerts,
-            'total_events': len(self.security_logs),
-            'blocked_actions': len([log for log in self.security_logs if log.get('status') == 'blocked']),
-            'security_score': 85  # Mock security score
+            'active_alerts': active_alerts,
+            'total_events': self.events.total_events,
+            'blocked_actions': self.events.total_by_status['blocked'],
+            'security_score': security_score
         }
     
     def validate_agent_behavior(self, agent_name):
-        # Baseline behavior validation
-        recent_actions = [log for log in self.security_logs if log['agent'] == agent_name]
-        
-        if len(recent_actions) > 100:  # Too many actions
-            return {'status': 'anomaly', 'reason': 'Excessive activity detected'}
-        
-        blocked_count = len([log for log in recent_actions if log.get('status') == 'blocked'])
-        if blocked_count > 5:  # Too many blocked actions
-            return {'status': 'suspicious', 'reason': 'Multiple unauthorized attempts'}
+        # Baseline behavior validation over the sliding window
+        status, reason = self._behavior_alert(agent_name, self.events.rate(agent_name))
+        if status:
+            return {'status': status, 'reason': reason}
             
         return {'status': 'normal', 'reason': 'Behavior within expected parameters'}
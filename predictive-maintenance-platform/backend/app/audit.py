@@ -0,0 +1,313 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from app.config import settings
+
+def audit_record(event):
+    """agent_logs row for a dict (passed through) or an object with to_audit_record()."""
+    if isinstance(event, dict):
+        return event
+    return event.to_audit_record()
+
+class AuditBackend(ABC):
+    name = 'none'
+
+    @abstractmethod
+    def write(self, records):
+        ...
+
+    def close(self):
+        pass
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+def agent_log_row(record):
+    """An agent_logs row whose vehicle_id the table accepts.
+
+    vehicle_id is a UUID foreign key to vehicles; any other id (fleet ids
+    like 'V001') would fail the whole bulk insert, so it moves to
+    details['vehicle_ref'] instead.
+    """
+    vehicle_id = record.get('vehicle_id')
+    if vehicle_id is None or _is_uuid(vehicle_id):
+        return record
+    details = record.get('details') or {}
+    if not isinstance(details, dict):
+        details = {'value': details}
+    return {**record, 'vehicle_id': None, 'details': {**details, 'vehicle_ref': str(vehicle_id)}}
+
+class SupabaseAuditBackend(AuditBackend):
+    """Bulk inserts into a Supabase table in the agent_logs layout (agent_logs by default)."""
+    name = 'supabase'
+
+    def __init__(self, table='agent_logs'):
+        self.table = table
+
+    def write(self, records):
+        from app.database import get_supabase
+        get_supabase().table(self.table).insert([agent_log_row(record) for record in records]).execute()
+
+class JsonlAuditBackend(AuditBackend):
+    """Append-only JSON Lines segments, rotated once a segment reaches `max_bytes`.
+
+    Each process writes its own segments (pid in the name), so several
+    uvicorn or Celery workers can share one directory.
+    """
+    name = 'jsonl'
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._file = None
+        self._segment = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self):
+        self._segment += 1
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(self.directory, f"audit-{stamp}-{os.getpid()}-{self._segment:04d}.jsonl")
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, records):
+        if self._file is None or self._file.tell() >= self.max_bytes:
+            self.close()
+            self._open_segment()
+        self._file.write(''.join(json.dumps(record, default=str) + '\n' for record in records))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class NullAuditBackend(AuditBackend):
+    """Discards records; used when a sink is required but logging is turned off."""
+    name = 'none'
+
+    def write(self, records):
+        pass
+
+class SqliteAuditBackend(AuditBackend):
+    """agent_logs-shaped table in a local SQLite file (handy for tests)."""
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS agent_logs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL, agent_name TEXT, action_type TEXT, "
+            "vehicle_id TEXT, details TEXT, decision_confidence REAL)"
+        )
+        self._db.commit()
+
+    def write(self, records):
+        now = time.time()
+        self._db.executemany(
+            "INSERT INTO agent_logs (created_at, agent_name, action_type, vehicle_id, details, decision_confidence) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (now, r.get('agent_name'), r.get('action_type'), r.get('vehicle_id'), json.dumps(r.get('details'), default=str), r.get('decision_confidence'))
+                for r in records
+            ]
+        )
+        self._db.commit()
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM agent_logs").fetchone()[0]
+
+    def close(self):
+        self._db.commit()
+
+class AuditSink:
+    """Bounded, batched, asynchronous writer for audit records.
+
+    `emit` only appends to an in-memory queue and never blocks; when the
+    queue holds `max_queue` records new ones are dropped and counted. A
+    background thread writes batches of up to `max_batch` records every
+    `flush_interval` seconds (sooner when a full batch is waiting).
+    A batch whose write fails is kept and retried on the next flush, up to
+    `max_retries` attempts, and still counts towards `max_queue`.
+    `flush()` writes everything queued before returning (stopping at the
+    first failed write), and `close()` flushes and stops the thread; a later
+    `emit` starts a new one.
+    """
+    def __init__(self, backend, flush_interval=1.0, max_batch=500, max_queue=10000, max_retries=3):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._queue = deque()
+        # (batch, attempts) of the last failed write, retried before the queue
+        self._retry = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._stop = None
+        self.stats = {'emitted': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'retried': 0, 'batches': 0}
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name=f'audit-{self.backend.name}', daemon=True)
+            self._thread.start()
+
+    def _queued(self):
+        return len(self._queue) + (len(self._retry[0]) if self._retry else 0)
+
+    def emit(self, event):
+        with self._lock:
+            if self._queued() >= self.max_queue:
+                self.stats['dropped'] += 1
+                return False
+            self._ensure_thread()
+            self._queue.append(event)
+            self.stats['emitted'] += 1
+            if len(self._queue) >= self.max_batch:
+                self._wakeup.notify()
+        return True
+
+    def emit_many(self, events):
+        return sum(1 for event in events if self.emit(event))
+
+    def _take(self):
+        # Returns (batch, attempts so far)
+        if self._retry is not None:
+            retry, self._retry = self._retry, None
+            return retry
+        batch = []
+        while self._queue and len(batch) < self.max_batch:
+            batch.append(self._queue.popleft())
+        return batch, 0
+
+    def _write(self, batch, attempts):
+        """Write one batch; on failure keep it for a retry. Returns False if the write failed."""
+        if not batch:
+            return True
+        with self._write_lock:
+            try:
+                self.backend.write([audit_record(event) for event in batch])
+                error = None
+            except Exception as e:
+                error = e
+        with self._lock:
+            if error is None:
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+                return True
+            attempts += 1
+            if attempts < self.max_retries and self._retry is None:
+                self._retry = (batch, attempts)
+                self.stats['retried'] += len(batch)
+            else:
+                self.stats['failed'] += len(batch)
+        print(f"AuditSink Error ({self.backend.name}, attempt {attempts}/{self.max_retries}): {error}")
+        return False
+
+    def _run(self, stop):
+        backoff = False
+        while True:
+            with self._lock:
+                # After a failed write wait a full interval, so a down backend isn't hammered
+                if not stop.is_set() and (backoff or len(self._queue) < self.max_batch):
+                    self._wakeup.wait(self.flush_interval)
+                if stop.is_set():
+                    return
+                batch, attempts = self._take()
+            backoff = not self._write(batch, attempts)
+
+    def flush(self):
+        while True:
+            with self._lock:
+                batch, attempts = self._take()
+            if not batch:
+                return
+            if not self._write(batch, attempts):
+                return
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if self._stop is not None:
+                self._stop.set()
+            self._wakeup.notify_all()
+        if thread is not None:
+            thread.join(timeout=5)
+        # Final attempts for a failing backend, then give up on what's left
+        for _ in range(self.max_retries):
+            self.flush()
+            with self._lock:
+                if not self._queued():
+                    break
+        self.backend.close()
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, 'queued': self._queued(), 'backend': self.backend.name}
+
+def build_audit_backend(kind, path=None):
+    kind = (kind or 'none').lower()
+    if kind == 'supabase':
+        return SupabaseAuditBackend()
+    if kind == 'jsonl':
+        return JsonlAuditBackend(path or 'audit')
+    if kind == 'sqlite':
+        return SqliteAuditBackend(path or 'audit.db')
+    return None
+
+_default_sink = None
+_default_sink_lock = threading.Lock()
+
+def get_audit_sink():
+    """Process-wide sink for UEBA events (AUDIT_BACKEND), or None when auditing is off."""
+    global _default_sink
+    if _default_sink is None:
+        with _default_sink_lock:
+            if _default_sink is None:
+                backend = build_audit_backend(settings.AUDIT_BACKEND, settings.AUDIT_PATH or None)
+                if backend is None:
+                    return None
+                _default_sink = AuditSink(
+                    backend,
+                    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+                    max_batch=settings.AUDIT_MAX_BATCH,
+                    max_queue=settings.AUDIT_MAX_QUEUE,
+                    max_retries=settings.AUDIT_MAX_RETRIES
+                )
+                atexit.register(_default_sink.close)
+    return _default_sink
+
+def build_agent_log_sink():
+    """Sink for the worker's agent_logs rows, picked by AGENT_LOG_BACKEND.
+
+    Unlike get_audit_sink this always returns a sink ('none' discards), since
+    the worker emits unconditionally. The caller owns closing it.
+    """
+    kind = (settings.AGENT_LOG_BACKEND or 'none').lower()
+    path = settings.AGENT_LOG_PATH or None
+    if kind == 'jsonl':
+        backend = JsonlAuditBackend(path or 'agent_logs')
+    elif kind == 'sqlite':
+        backend = SqliteAuditBackend(path or 'agent_logs.db')
+    else:
+        backend = build_audit_backend(kind, path) or NullAuditBackend()
+    return AuditSink(
+        backend,
+        flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+        max_batch=settings.AUDIT_MAX_BATCH,
+        max_queue=settings.AUDIT_MAX_QUEUE,
+        max_retries=settings.AUDIT_MAX_RETRIES
+    )
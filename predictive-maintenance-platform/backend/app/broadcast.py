@@ -0,0 +1,194 @@
+from abc import ABC, abstractmethod
+import asyncio
+import atexit
+import json
+import queue
+import threading
+import time
+from app.config import settings
+
+class Broadcast(ABC):
+    """Carries websocket events between processes.
+
+    `publish` returns without waiting on the network and is safe to call from
+    any thread, including Celery workers and the event loop. Each API process calls `start(deliver)` on its event loop;
+    `deliver(topic, message_type, data)` then runs on that loop for every
+    published event, from this process or any other.
+    """
+    name = 'none'
+    # True when events cross process boundaries, so local subscriber checks are not enough
+    shared = False
+
+    @abstractmethod
+    def publish(self, topic, message_type, data):
+        ...
+
+    @abstractmethod
+    def start(self, deliver):
+        ...
+
+    def stop(self):
+        pass
+
+class InMemoryBroadcast(Broadcast):
+    """Single-process backend: hands events from any thread to the local loop."""
+    name = 'memory'
+
+    def __init__(self):
+        self._loop = None
+        self._deliver = None
+
+    def publish(self, topic, message_type, data):
+        loop, deliver = self._loop, self._deliver
+        if loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(deliver, topic, message_type, data)
+        return True
+
+    def start(self, deliver):
+        self._deliver = deliver
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        self._loop = None
+        self._deliver = None
+
+class RedisBroadcast(Broadcast):
+    """Redis pub/sub backend: every publish reaches every started API process.
+
+    A listener thread per process reads the channel and forwards events onto
+    the event loop. Publishes never touch the network on the caller's thread:
+    they are serialized and queued (at most `max_pending`, beyond that they
+    are dropped and counted) for a publisher thread, so a slow Redis can't
+    stall the event loop. Pass `client` to use an existing
+    redis.Redis-compatible connection (e.g. fakeredis in tests); otherwise one
+    is created from `url`.
+    """
+    name = 'redis'
+    shared = True
+
+    def __init__(self, url=None, channel='roadiq:events', client=None, max_pending=10000):
+        self.url = url or settings.REDIS_URL
+        self.channel = channel
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._outbox = queue.Queue(maxsize=max_pending)
+        self._publisher = None
+        self._publisher_lock = threading.Lock()
+        self.stats = {'published': 0, 'received': 0, 'errors': 0, 'dropped': 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import redis
+                    self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, topic, message_type, data):
+        """Queue an event for the publisher thread; False if the outbox is full."""
+        payload = json.dumps({'topic': topic, 'type': message_type, 'data': data}, default=str)
+        self._ensure_publisher()
+        try:
+            self._outbox.put_nowait(payload)
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+
+    def _ensure_publisher(self):
+        if self._publisher is not None:
+            return
+        with self._publisher_lock:
+            if self._publisher is None:
+                self._publisher = threading.Thread(target=self._publish_loop, name='broadcast-redis-publish', daemon=True)
+                self._publisher.start()
+                # Celery workers publish without ever calling stop(); send what's queued on exit
+                atexit.register(self.flush)
+
+    def _publish_loop(self):
+        while True:
+            payload = self._outbox.get()
+            try:
+                if payload is None:
+                    return
+                self.client.publish(self.channel, payload)
+                self.stats['published'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"RedisBroadcast Error (publish): {e}")
+            finally:
+                self._outbox.task_done()
+
+    def flush(self, timeout=2.0):
+        """Wait up to `timeout` seconds for queued publishes; True if all were sent."""
+        if self._publisher is None:
+            return True
+        outbox = self._outbox
+        deadline = time.monotonic() + timeout
+        with outbox.all_tasks_done:
+            while outbox.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                outbox.all_tasks_done.wait(remaining)
+        return True
+
+    def _listen(self, loop, deliver, pubsub):
+        while not self._stopping.is_set():
+            try:
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                event = json.loads(message['data'])
+                self.stats['received'] += 1
+                loop.call_soon_threadsafe(deliver, event['topic'], event['type'], event['data'])
+            except Exception as e:
+                if self._stopping.is_set() or loop.is_closed():
+                    break
+                self.stats['errors'] += 1
+                print(f"RedisBroadcast Error (listen): {e}")
+                self._stopping.wait(1.0)
+        pubsub.close()
+
+    def start(self, deliver):
+        loop = asyncio.get_running_loop()
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self.channel)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, args=(loop, deliver, pubsub), name='broadcast-redis', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._publisher_lock:
+            publisher, self._publisher = self._publisher, None
+        if publisher is not None:
+            atexit.unregister(self.flush)
+            # Sentinel after the queued events, so they are sent first
+            try:
+                self._outbox.put(None, timeout=2)
+            except queue.Full:
+                pass
+            publisher.join(timeout=2)
+
+_default_broadcast = None
+_default_broadcast_lock = threading.Lock()
+
+def get_broadcast():
+    """Process-wide backend picked by BROADCAST_BACKEND ('memory' or 'redis')."""
+    global _default_broadcast
+    if _default_broadcast is None:
+        with _default_broadcast_lock:
+            if _default_broadcast is None:
+                if settings.BROADCAST_BACKEND.lower() == 'redis':
+                    _default_broadcast = RedisBroadcast(settings.REDIS_URL)
+                else:
+                    _default_broadcast = InMemoryBroadcast()
+    return _default_broadcast
@@ -7,7 +7,68 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str
     REDIS_URL: str = "redis://redis:6379/0"
     
+    # Telemetry micro-batching (app/worker.py)
+    TELEMETRY_FLUSH_INTERVAL: float = 1.0  # seconds
+    TELEMETRY_MAX_BATCH: int = 500
+    
+    # In-process task queue used instead of Celery when USE_CELERY=false (app/task_queue.py)
+    TASK_WORKERS: int = 4
+    TASK_MAX_QUEUE: int = 1000  # beyond this the producer runs the task itself
+    TASK_MAX_RETRIES: int = 3
+    TASK_RETRY_DELAY: float = 1.0  # seconds, doubled per retry
+    TASK_SHUTDOWN_TIMEOUT: float = 10.0  # seconds to drain queued tasks and retries on shutdown
+    
+    # Bounded executor for synchronous agent work (app/executor.py)
+    AGENT_EXECUTOR_WORKERS: int = min(32, (os.cpu_count() or 1) + 4)
+    AGENT_EXECUTOR_QUEUE: int = 256
+    
+    # Background Gemini/video enrichment (app/agents/enrichment.py)
+    ENRICHMENT_WORKERS: int = 4
+    ENRICHMENT_TIMEOUT: float = 8.0  # seconds per provider call once started
+    ENRICHMENT_QUEUE_TIMEOUT: float = 30.0  # seconds a job may wait for a worker
+    
+    # LLM recommendation cache (app/agents/recommendation_cache.py)
+    RECOMMENDATION_CACHE_TTL: float = 3600  # seconds
+    RECOMMENDATION_CACHE_SIZE: int = 1024  # in-memory entries (LRU)
+    RECOMMENDATION_CACHE_DB: str = ""  # SQLite file to persist recommendations across restarts
+    RECOMMENDATION_CACHE_WAIT: float = 30.0  # seconds a coalesced miss waits for the first caller
+    
+    # Websocket fan-out (app/realtime.py)
+    WS_CLIENT_QUEUE: int = 100  # queued messages per client before dropping the oldest
+    WS_PUBLISH_INTERVAL: float = 1.0  # seconds between fleet/UEBA change checks
+    WS_MAX_SUBSCRIPTIONS: int = 200  # topics per client
+    BROADCAST_BACKEND: str = "memory"  # "redis" to fan out across uvicorn workers, pods and Celery (REDIS_URL)
+    
+    # Logged failure patterns per production batch (app/agents/failure_patterns.py)
+    FAILURE_PATTERNS_PER_BATCH: int = 500
+    FAILURE_PATTERNS_WINDOW_HOURS: float = 168
+    FAILURE_PATTERNS_MAX_BATCHES: int = 10000
+    
+    # Streaming batch failure-rate test (app/agents/batch_anomaly.py)
+    BATCH_ANOMALY_SHIFT: float = 2.0  # failure-rate multiple over the other batches to detect
+    BATCH_ANOMALY_THRESHOLD: float = 5.0  # log-likelihood ratio that raises an alert
+    BATCH_ANOMALY_MIN_BASELINE_BATCHES: int = 3  # other batches needed before any alert
+    
+    # Service booking inventory (app/agents/slot_inventory.py)
+    SCHEDULING_HORIZON_DAYS: int = 60  # days of slots kept bookable
+    
+    # UEBA security event log (app/agents/security_events.py)
+    UEBA_EVENT_CAPACITY: int = 10000  # events kept in the ring buffer
+    UEBA_WINDOW_SECONDS: int = 60  # sliding window for rate baselines
+    
+    # Audit sink for UEBA events (app/audit.py): "none", "supabase" (agent_logs), "jsonl" or "sqlite"
+    AUDIT_BACKEND: str = "none"
+    AUDIT_PATH: str = ""  # jsonl: segment directory (default ./audit); sqlite: database file (default ./audit.db)
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    AUDIT_MAX_BATCH: int = 500
+    AUDIT_MAX_QUEUE: int = 10000
+    AUDIT_MAX_RETRIES: int = 3  # write attempts per batch before it is dropped
+    # Worker agent_logs (app/worker.py): same backends as AUDIT_BACKEND
+    AGENT_LOG_BACKEND: str = "supabase"
+    AGENT_LOG_PATH: str = ""  # jsonl: segment directory (default ./agent_logs); sqlite: database file (default ./agent_logs.db)
+    
     class Config:
         env_file = ".env"
+        extra = "ignore"  # .env also carries keys read elsewhere (e.g. GOOGLE_API_KEY)
 
 settings = Settings()
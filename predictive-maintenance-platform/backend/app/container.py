@@ -0,0 +1,38 @@
+import threading
+
+class AgentContainer:
+    """Application-scoped agents shared by every router.
+
+    One MasterAgent (and so one DiagnosisAgent, voice worker and UEBA log) per
+    process, built on first use. The FastAPI lifespan warms it at startup and
+    calls `shutdown()` on exit.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._master_agent = None
+
+    @property
+    def master_agent(self):
+        if self._master_agent is None:
+            with self._lock:
+                if self._master_agent is None:
+                    from app.agents.master_agent import MasterAgent
+                    from app.audit import get_audit_sink
+                    master_agent = MasterAgent()
+                    master_agent.ueba_agent.audit_sink = get_audit_sink()
+                    self._master_agent = master_agent
+        return self._master_agent
+
+    def shutdown(self):
+        if self._master_agent is not None:
+            self._master_agent.enrichment_service.shutdown()
+            self._master_agent.voice_assistant.stop()
+            # Flush-on-shutdown: queued audit events are written before we return
+            if self._master_agent.ueba_agent.audit_sink is not None:
+                self._master_agent.ueba_agent.audit_sink.close()
+
+agents = AgentContainer()
+
+def get_master_agent():
+    """FastAPI dependency returning the shared MasterAgent."""
+    return agents.master_agent
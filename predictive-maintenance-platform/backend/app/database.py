@@ -1,4 +1,15 @@
-from supabase import create_client, Client
+import threading
 from app.config import settings
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+_client = None
+_client_lock = threading.Lock()
+
+def get_supabase():
+    """Shared Supabase client, created on first use rather than at import time."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+                _client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return _client
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import threading
+import time
+from app.config import settings
+
+class ExecutorBusy(Exception):
+    """Raised when the agent executor's queue is full; mapped to HTTP 503."""
+
+class AgentExecutor:
+    """Bounded thread pool for the synchronous agent layer (pandas, Supabase, HTTP).
+
+    At most `max_workers` calls run at once and at most `max_queue` more wait
+    for a worker; beyond that `run` fails fast with ExecutorBusy instead of
+    letting latency grow without bound.
+    """
+    def __init__(self, max_workers=8, max_queue=256):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = None
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+        self.stats = {'completed': 0, 'failed': 0, 'rejected': 0, 'max_queue_depth': 0, 'total_wait_ms': 0.0, 'total_run_ms': 0.0}
+
+    def _call(self, fn, enqueued_at):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self.stats['total_wait_ms'] += (started - enqueued_at) * 1000
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.stats['total_run_ms'] += (time.perf_counter() - started) * 1000
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._submitted >= self.max_workers + self.max_queue:
+                self.stats['rejected'] += 1
+                raise ExecutorBusy(f"Agent executor saturated ({self._submitted} calls in flight)")
+            self._submitted += 1
+            depth = self._submitted - self.max_workers
+            if depth > self.stats['max_queue_depth']:
+                self.stats['max_queue_depth'] = depth
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='agents')
+            pool = self._pool
+        # The slot is released when the pool call finishes, not when the awaiting
+        # request does: a cancelled request must not free a slot still in use
+        try:
+            future = pool.submit(self._call, functools.partial(fn, *args, **kwargs), time.perf_counter())
+        except RuntimeError:
+            # Pool shut down between reserving the slot and submitting
+            with self._lock:
+                self._submitted -= 1
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._submitted -= 1
+            if future.cancelled():
+                return
+            if future.exception() is None:
+                self.stats['completed'] += 1
+            else:
+                self.stats['failed'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            finished = self.stats['completed'] + self.stats['failed']
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queue_depth': max(0, self._submitted - self._running),
+                'completed': self.stats['completed'],
+                'failed': self.stats['failed'],
+                'rejected': self.stats['rejected'],
+                'max_queue_depth': self.stats['max_queue_depth'],
+                'avg_wait_ms': self.stats['total_wait_ms'] / finished if finished else 0.0,
+                'avg_run_ms': self.stats['total_run_ms'] / finished if finished else 0.0
+            }
+
+    def shutdown(self):
+        # A later run() starts a fresh pool, so the app can be restarted in-process
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+agent_executor = AgentExecutor(max_workers=settings.AGENT_EXECUTOR_WORKERS, max_queue=settings.AGENT_EXECUTOR_QUEUE)
+
+async def run_agent(fn, *args, **kwargs):
+    """Await a synchronous agent call on the shared bounded executor."""
+    return await agent_executor.run(fn, *args, **kwargs)
@@ -1,9 +1,46 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import agents, dashboard # vehicles,
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from app.routers import agents, dashboard, telemetry, vehicles
+from app.executor import agent_executor, ExecutorBusy
+from app.response_cache import response_cache
+from app.realtime import manager, StatePublisher
+from app.broadcast import get_broadcast
+from app.config import settings
+from app.container import agents as agent_container
 import asyncio
+import json
+import sys
 
-app = FastAPI(title="Agentic Maintenance Platform API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One shared MasterAgent for every router
+    master_agent = agent_container.master_agent
+    # Push finished AI enrichments (recommendation + video tutorial) to dashboards
+    master_agent.enrichment_service.listeners.append(manager.broadcast_event)
+    # Events from other API processes and Celery workers (BROADCAST_BACKEND=redis)
+    manager.attach(get_broadcast())
+    # Fleet, batch and UEBA deltas for websocket subscribers
+    publisher = StatePublisher(manager, master_agent, interval=settings.WS_PUBLISH_INTERVAL)
+    publisher.start()
+    yield
+    await publisher.stop()
+    master_agent.enrichment_service.listeners.remove(manager.broadcast_event)
+    manager.detach()
+    agent_container.shutdown()
+    agent_executor.shutdown()
+    # Hand off buffered telemetry now; the batcher's atexit hook covers process exit.
+    # Draining waits on tasks and retry timers, so it runs off the event loop, bounded.
+    worker = sys.modules.get('app.worker')
+    if worker is not None:
+        try:
+            await asyncio.wait_for(asyncio.to_thread(worker.drain_pipeline), settings.TASK_SHUTDOWN_TIMEOUT + 5)
+        except asyncio.TimeoutError:
+            print("Shutdown: telemetry pipeline did not drain in time")
+
+app = FastAPI(title="Agentic Maintenance Platform API", lifespan=lifespan)
 
 # CORS
 origins = ["*"]
@@ -15,40 +52,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Websocket Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+# Compress larger JSON responses (fleet listings, dashboard); brotli when brotli-asgi is installed
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1000, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-manager = ConnectionManager()
+# Backpressure: shed load instead of queueing without bound
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 # Routes
-# app.include_router(vehicles.router, prefix="/api/vehicles", tags=["vehicles"])
+app.include_router(vehicles.router, prefix="/api/vehicles", tags=["vehicles"])
 app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(telemetry.router, prefix="/api/telemetry", tags=["telemetry"])
 
 @app.get("/")
 def read_root():
     return {"status": "System Online", "agents": "active"}
 
+@app.get("/api/metrics/executor")
+def executor_metrics():
+    return agent_executor.get_stats()
+
+@app.get("/api/metrics/response-cache")
+def response_cache_metrics():
+    return response_cache.get_stats()
+
+@app.get("/api/metrics/websocket")
+def websocket_metrics():
+    return manager.get_stats()
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Clients send {"action": "subscribe", "topics": ["fleet", "ueba", "vehicle:V001", "batch:..."]}
+    # and then receive a snapshot per topic followed by compact deltas
+    client = await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo or process commands
-            await manager.broadcast({"message": f"Server received: {data}"})
+            try:
+                message = json.loads(data)
+            except ValueError:
+                message = None
+            manager.handle(client, message)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    finally:
+        manager.disconnect(client)
@@ -0,0 +1,356 @@
+from collections import OrderedDict, defaultdict
+from fastapi import WebSocket
+import asyncio
+from app.config import settings
+from app.executor import run_agent
+import re
+
+# Topics: 'fleet', 'ueba', 'alerts', 'vehicle:<vehicle_id>', 'batch:<batch_id>'
+VEHICLE_STATES_CHUNK = 1000
+TOPIC_PATTERN = re.compile(r'(fleet|ueba|alerts|(vehicle|batch):[A-Za-z0-9_.\-]{1,64})')
+
+def diff_state(old, new):
+    """Top-level keys whose values changed (removed keys map to None)."""
+    delta = {key: value for key, value in new.items() if old.get(key) != value}
+    for key in old.keys() - new.keys():
+        delta[key] = None
+    return delta
+
+def vehicle_state(risk, diagnosis=None):
+    """Compact per-vehicle state pushed on 'vehicle:<id>' topics."""
+    state = {'level': risk.get('level'), 'score': risk.get('score'), 'factors': risk.get('factors')}
+    if diagnosis:
+        state['prediction'] = {
+            'component': diagnosis.get('component'),
+            'probability': diagnosis.get('probability'),
+            'urgency': diagnosis.get('urgency')
+        }
+    return state
+
+class ClientConnection:
+    """One websocket with its own bounded send queue and sender task.
+
+    Messages are keyed by (topic, type). A delta for a topic that already has
+    one queued is merged into it, other messages replace the queued one, so a
+    slow client receives the latest state rather than a backlog. When the
+    queue holds `max_queue` distinct keys the oldest entry is dropped.
+    """
+    def __init__(self, websocket: WebSocket, max_queue=100, send_timeout=5.0):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.topics = set()
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+        self._task = None
+        self.closed = False
+
+    def enqueue(self, message):
+        if self.closed:
+            return
+        key = (message.get('topic'), message.get('type'))
+        queued = self._pending.get(key)
+        if queued is not None:
+            self.coalesced += 1
+            if message.get('type') == 'delta':
+                queued['data'].update(message['data'])
+            else:
+                self._pending[key] = message
+        else:
+            if len(self._pending) >= self.max_queue:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            # Own copy, since deltas may be merged in place later
+            self._pending[key] = {**message, 'data': dict(message['data'])} if isinstance(message.get('data'), dict) else message
+        self._ready.set()
+
+    async def _sender(self, on_error):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._pending:
+                    _, message = self._pending.popitem(last=False)
+                    await asyncio.wait_for(self.websocket.send_json(message), self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"PubSubManager: dropping client after send error: {e!r}")
+            on_error(self)
+
+    def start(self, on_error):
+        self._task = asyncio.get_running_loop().create_task(self._sender(on_error))
+
+    def stop(self):
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+
+class PubSubManager:
+    """Topic-based websocket fan-out.
+
+    `publish` never awaits a socket: it only enqueues into each subscriber's
+    queue, and every client drains its queue on its own task, so one slow
+    dashboard cannot hold up the others.
+    """
+    def __init__(self, max_queue=100, max_subscriptions=200):
+        self.max_queue = max_queue
+        self.max_subscriptions = max_subscriptions
+        self.clients = set()
+        self._subscribers = defaultdict(set)
+        # Last full state of stateful topics, sent as a snapshot on subscribe
+        self.states = {}
+        # Set by StatePublisher so a new subscriber gets its snapshot without waiting a tick
+        self.wakeup = None
+        # Cross-process backend (app/broadcast.py); None until attached by the app
+        self.broadcast = None
+        self.stats = {'published': 0, 'delivered': 0, 'disconnects': 0}
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        client = ClientConnection(websocket, max_queue=self.max_queue)
+        self.clients.add(client)
+        client.start(self.disconnect)
+        return client
+
+    def disconnect(self, client):
+        if client not in self.clients:
+            return
+        self.clients.discard(client)
+        self.unsubscribe(client, list(client.topics))
+        client.stop()
+        self.stats['disconnects'] += 1
+
+    def subscribe(self, client, topics):
+        """Subscribe to valid topics up to `max_subscriptions`; returns the rejected ones."""
+        rejected = []
+        for topic in topics:
+            if topic in client.topics:
+                continue
+            if not TOPIC_PATTERN.fullmatch(topic) or len(client.topics) >= self.max_subscriptions:
+                rejected.append(topic)
+                continue
+            client.topics.add(topic)
+            self._subscribers[topic].add(client)
+            state = self.states.get(topic)
+            if state is not None:
+                client.enqueue({'type': 'snapshot', 'topic': topic, 'data': state})
+            elif self.wakeup is not None and not topic.startswith('vehicle:'):
+                self.wakeup.set()
+        return rejected
+
+    def unsubscribe(self, client, topics):
+        for topic in topics:
+            client.topics.discard(topic)
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._subscribers[topic]
+                    # Per-vehicle and per-batch state is only kept while someone watches it
+                    if topic.startswith(('vehicle:', 'batch:')):
+                        self.states.pop(topic, None)
+
+    def has_subscribers(self, topic):
+        return bool(self._subscribers.get(topic))
+
+    def topics(self, prefix=''):
+        return [topic for topic in self._subscribers if topic.startswith(prefix)]
+
+    def publish(self, topic, message_type, data):
+        self.stats['published'] += 1
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        message = {'type': message_type, 'topic': topic, 'data': data}
+        for client in list(subscribers):
+            client.enqueue(message)
+        self.stats['delivered'] += len(subscribers)
+        return len(subscribers)
+
+    def publish_state(self, topic, state):
+        """Record a topic's full state and push only what changed to subscribers."""
+        previous = self.states.get(topic)
+        self.states[topic] = state
+        if previous is None:
+            return self.publish(topic, 'snapshot', state)
+        delta = diff_state(previous, state)
+        if delta:
+            return self.publish(topic, 'delta', delta)
+        return 0
+
+    def _apply_vehicle_state(self, vehicle_id, state):
+        topic = f"vehicle:{vehicle_id}"
+        if not self.has_subscribers(topic):
+            return 0
+        return self.publish_state(topic, {**self.states.get(topic, {}), **state})
+
+    def attach(self, broadcast):
+        """Route events through `broadcast` so other processes' subscribers get them too."""
+        try:
+            broadcast.start(self.deliver)
+        except Exception as e:
+            print(f"PubSubManager: {broadcast.name} broadcast unavailable, fanning out locally only: {e}")
+            return
+        self.broadcast = broadcast
+
+    def detach(self):
+        broadcast, self.broadcast = self.broadcast, None
+        if broadcast is not None:
+            broadcast.stop()
+
+    def deliver(self, topic, message_type, data):
+        """Entry point for events arriving from the broadcast backend."""
+        if message_type == 'vehicle_states':
+            for vehicle_id, state in data.items():
+                self._apply_vehicle_state(vehicle_id, state)
+        else:
+            self.publish(topic, message_type, data)
+
+    def emit(self, topic, message_type, data):
+        """Publish an event to every process when a shared backend is attached, else locally."""
+        if self.broadcast is not None and self.broadcast.shared:
+            self.broadcast.publish(topic, message_type, data)
+        else:
+            self.publish(topic, message_type, data)
+
+    def publish_vehicle(self, vehicle_id, state):
+        """Delta of a vehicle's risk/prediction state, if anyone is watching it."""
+        self.publish_vehicles({vehicle_id: state})
+
+    def publish_vehicles(self, states):
+        if self.broadcast is not None and self.broadcast.shared:
+            # Watchers may live in another process; chunk to keep messages small
+            items = list(states.items())
+            for start in range(0, len(items), VEHICLE_STATES_CHUNK):
+                self.broadcast.publish('vehicles', 'vehicle_states', dict(items[start:start + VEHICLE_STATES_CHUNK]))
+            return
+        if not self.topics('vehicle:'):
+            return
+        for vehicle_id, state in states.items():
+            self._apply_vehicle_state(vehicle_id, state)
+
+    async def broadcast_event(self, message: dict):
+        # Enrichment listener: route results to the vehicle's topic
+        data = message.get('data') or {}
+        self.emit(f"vehicle:{data.get('vehicle_id')}", message.get('type', 'event'), data)
+
+    def handle(self, client, message):
+        """Apply one control message from a client: subscribe, unsubscribe or ping."""
+        action = message.get('action') if isinstance(message, dict) else None
+        topics = message.get('topics') if isinstance(message, dict) else None
+        if action in ('subscribe', 'unsubscribe'):
+            if isinstance(topics, str):
+                topics = [topics]
+            if not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+                client.enqueue({'type': 'error', 'topic': None, 'data': {'detail': 'topics must be a list of strings'}})
+                return
+            if action == 'subscribe':
+                rejected = self.subscribe(client, topics)
+                if rejected:
+                    client.enqueue({'type': 'error', 'topic': None, 'data': {
+                        'detail': f"unknown topics or more than {self.max_subscriptions} subscriptions",
+                        'rejected': rejected[:20]
+                    }})
+            else:
+                self.unsubscribe(client, topics)
+            client.enqueue({'type': 'subscriptions', 'topic': None, 'data': {'topics': sorted(client.topics)}})
+        elif action == 'ping':
+            client.enqueue({'type': 'pong', 'topic': None, 'data': {}})
+        else:
+            client.enqueue({'type': 'error', 'topic': None, 'data': {'detail': "expected {'action': 'subscribe'|'unsubscribe'|'ping', 'topics': [...]}"}})
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'clients': len(self.clients),
+            'topics': len(self._subscribers),
+            'dropped': sum(client.dropped for client in self.clients),
+            'coalesced': sum(client.coalesced for client in self.clients)
+        }
+
+class StatePublisher:
+    """Polls the agents' cheap version tokens and publishes fleet, batch and UEBA deltas.
+
+    Work is only done when a token changed and someone is subscribed. These
+    reads go straight to the sub-agents, not through MasterAgent, so they do
+    not add UEBA events (which would make the 'ueba' topic change every tick).
+    Alerts raised by the batch anomaly detector are drained and emitted on
+    'alerts' and 'batch:<batch_id>' every tick.
+    """
+    def __init__(self, manager, master_agent, interval=1.0):
+        self.manager = manager
+        self.master_agent = master_agent
+        self.interval = interval
+        self._versions = {}
+        self._task = None
+
+    def _changed(self, name, version):
+        # Force a refresh for subscribed topics that have no state yet
+        changed = self._versions.get(name, object()) != version
+        self._versions[name] = version
+        return changed
+
+    def _fleet_state(self):
+        fleet = self.master_agent.data_agent.get_fleet_overview()
+        batches = self.master_agent.manufacturing_agent.aggregates.batch_summary()
+        return fleet, batches
+
+    async def tick(self):
+        manager = self.manager
+        batch_topics = manager.topics('batch:')
+        fleet_wanted = manager.has_subscribers('fleet') or batch_topics
+        missing = [t for t in ['fleet', *batch_topics] if t not in manager.states and manager.has_subscribers(t)]
+        if fleet_wanted and (self._changed('fleet', self.master_agent.dashboard_version()) or missing):
+            fleet, batches = await run_agent(self._fleet_state)
+            manager.publish_state('fleet', fleet)
+            for batch_id, stats in batches.items():
+                topic = f"batch:{batch_id}"
+                # Only watched batches: unwatched batch state would pile up in manager.states
+                if manager.has_subscribers(topic):
+                    manager.publish_state(topic, stats)
+            # Unknown batches get an empty snapshot, so they stop counting as missing
+            # instead of forcing a full refresh every tick
+            for topic in missing:
+                if topic not in manager.states:
+                    manager.publish_state(topic, {})
+
+        # Recall/quality alerts raised by the batch detector since the last tick
+        for alert in self.master_agent.drain_batch_alerts():
+            manager.emit('alerts', 'batch_alert', alert)
+            manager.emit(f"batch:{alert['batch_id']}", 'batch_alert', alert)
+
+        if manager.has_subscribers('ueba') and (self._changed('ueba', self.master_agent.security_version()) or 'ueba' not in manager.states):
+            manager.publish_state('ueba', await run_agent(self.master_agent.ueba_agent.get_alerts))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"StatePublisher Error: {e}")
+            try:
+                await asyncio.wait_for(self.manager.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.manager.wakeup.clear()
+
+    def start(self):
+        self.manager.wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.manager.wakeup = None
+
+manager = PubSubManager(max_queue=settings.WS_CLIENT_QUEUE, max_subscriptions=settings.WS_MAX_SUBSCRIPTIONS)
@@ -0,0 +1,67 @@
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+import hashlib
+import json
+import threading
+from app.executor import run_agent
+
+class ResponseCache:
+    """Caches rendered JSON payloads of polled endpoints by data version.
+
+    Each entry is keyed by a cheap version token supplied by the caller (file
+    signature, event counter, ...). While the token is unchanged the stored
+    bytes are served without touching the agents, and a request whose
+    If-None-Match carries the current ETag gets an empty 304.
+    """
+    cache_control = "no-cache"
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    @staticmethod
+    def _matches(request, etag):
+        header = request.headers.get('if-none-match')
+        if not header:
+            return False
+        for candidate in header.split(','):
+            candidate = candidate.strip()
+            if candidate == '*' or candidate.removeprefix('W/') == etag:
+                return True
+        return False
+
+    async def respond(self, request: Request, name, version, compute, *args):
+        """Serve `compute(*args)` for `name`, recomputing only when `version` changed."""
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            self.stats['hits'] += 1
+            etag, body = entry[1], entry[2]
+        else:
+            self.stats['misses'] += 1
+            payload = await run_agent(compute, *args)
+            # Same encoding as FastAPI's default JSONResponse
+            body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+            etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            with self._lock:
+                self._entries[name] = (version, etag, body)
+
+        headers = {'ETag': etag, 'Cache-Control': self.cache_control}
+        if self._matches(request, etag):
+            self.stats['not_modified'] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries)}
+
+response_cache = ResponseCache()
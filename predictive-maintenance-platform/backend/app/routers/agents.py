@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
 from app.agents.master_agent import MasterAgent
+from app.executor import run_agent
+from app.response_cache import response_cache
+from app.realtime import manager, vehicle_state
+from app.container import get_master_agent
 
 # Import other dependencies if needed, but for the agents, we rely on MasterAgent
 # If existing routes are needed, we should preserve them, but based on the previous tool output,
@@ -11,12 +15,25 @@ from app.agents.master_agent import MasterAgent
 # I will add back the table logs endpoint if relevant, but let's stick to the new plan.
 
 router = APIRouter()
-master_agent = MasterAgent()
+
+# Vehicles per bulk scheduling request; the whole plan runs under the inventory lock
+MAX_BULK_SCHEDULE = 5000
 
 class ScheduleRequest(BaseModel):
     vehicle_id: str
     urgency: str
 
+class BulkScheduleRequest(BaseModel):
+    vehicles: List[ScheduleRequest] = Field(..., max_length=MAX_BULK_SCHEDULE)
+    max_days: Optional[int] = None  # how far ahead to look; defaults to the scheduling horizon
+
+class BatchHealthRequest(BaseModel):
+    # Either ids from the fleet dataset, or raw rows to score directly.
+    # Leaving both empty scores the whole fleet.
+    vehicle_ids: Optional[List[str]] = None
+    readings: Optional[List[Dict[str, Any]]] = None
+    source: Optional[str] = "fleet"  # "fleet" or "telemetry" column layout for readings
+
 # Defined here or in master agent - data models
 class VoiceRequest(BaseModel):
     text: Optional[str] = ""
@@ -24,19 +41,76 @@ class VoiceRequest(BaseModel):
     emotion: Optional[str] = "professional"
 
 @router.get("/vehicle-health/{vehicle_id}")
-async def get_vehicle_health(vehicle_id: str):
-    return master_agent.analyze_vehicle(vehicle_id)
+async def get_vehicle_health(vehicle_id: str, enrich: str = "async", master_agent: MasterAgent = Depends(get_master_agent)):
+    # enrich=async (default): rule-based diagnosis now, AI recommendation and
+    # video tutorial via /vehicle-health/{id}/enrichment or the /ws websocket.
+    # enrich=sync: legacy behaviour, waits for Gemini and YouTube inline.
+    if enrich == "sync":
+        result = await run_agent(master_agent.analyze_vehicle, vehicle_id)
+        manager.publish_vehicle(vehicle_id, vehicle_state(result['risk_assessment'], result['diagnosis']))
+        return result
+    
+    result = await run_agent(master_agent.analyze_vehicle, vehicle_id, enrich=False)
+    manager.publish_vehicle(vehicle_id, vehicle_state(result['risk_assessment'], result['diagnosis']))
+    if result['diagnosis']:
+        enrichment = master_agent.request_enrichment(vehicle_id)
+        if enrichment['status'] == 'ready':
+            result['diagnosis']['recommendation'] = enrichment['recommendation']
+            result['diagnosis']['video_tutorial'] = enrichment['video_tutorial']
+        result['diagnosis']['enrichment'] = enrichment
+    return result
+
+@router.get("/vehicle-health/{vehicle_id}/enrichment")
+async def get_vehicle_enrichment(vehicle_id: str, master_agent: MasterAgent = Depends(get_master_agent)):
+    enrichment = master_agent.get_enrichment(vehicle_id)
+    if enrichment is None:
+        raise HTTPException(status_code=404, detail="No enrichment requested for this vehicle")
+    return enrichment
+
+@router.post("/vehicle-health/batch")
+async def get_vehicle_health_batch(request: BatchHealthRequest, master_agent: MasterAgent = Depends(get_master_agent)):
+    response = await run_agent(master_agent.score_vehicles_batch, request.vehicle_ids, request.readings, request.source)
+    # Fan out to websocket subscribers watching any of these vehicles
+    manager.publish_vehicles({result['vehicle_id']: vehicle_state(result) for result in response['results'] if result.get('vehicle_id') is not None})
+    return response
 
 @router.post("/schedule-service")
-async def schedule_service(request: ScheduleRequest):
-    return master_agent.schedule_service(request.model_dump())
+async def schedule_service(request: ScheduleRequest, master_agent: MasterAgent = Depends(get_master_agent)):
+    return await run_agent(master_agent.schedule_service, request.model_dump())
+
+@router.post("/schedule-service/bulk")
+async def schedule_service_bulk(request: BulkScheduleRequest, master_agent: MasterAgent = Depends(get_master_agent)):
+    if request.max_days is not None and not 1 <= request.max_days <= 365:
+        raise HTTPException(status_code=400, detail="max_days must be between 1 and 365")
+    # A repeated vehicle would get its own booking back and skew the plan stats
+    seen, duplicates = set(), []
+    for vehicle in request.vehicles:
+        if vehicle.vehicle_id in seen:
+            duplicates.append(vehicle.vehicle_id)
+        seen.add(vehicle.vehicle_id)
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate vehicle_ids: {', '.join(sorted(set(duplicates))[:20])}")
+    return await run_agent(master_agent.schedule_service_bulk, request.model_dump())
 
 @router.get("/ueba-alerts")
-async def get_ueba_alerts():
-    return master_agent.get_security_alerts()
+async def get_ueba_alerts(request: Request, master_agent: MasterAgent = Depends(get_master_agent)):
+    # Recomputed only when new security events were logged
+    return await response_cache.respond(request, 'ueba-alerts', master_agent.security_version(), master_agent.get_security_alerts)
+
+@router.get("/batch-alerts")
+async def get_batch_alerts(limit: int = 50, master_agent: MasterAgent = Depends(get_master_agent)):
+    return master_agent.get_batch_alerts(max(1, min(limit, 1000)))
+
+@router.get("/recommendation-cache/stats")
+async def get_recommendation_cache_stats(master_agent: MasterAgent = Depends(get_master_agent)):
+    return master_agent.get_recommendation_cache_stats()
+
+@router.get("/enrichment/stats")
+async def get_enrichment_stats(master_agent: MasterAgent = Depends(get_master_agent)):
+    return master_agent.get_enrichment_stats()
 
 @router.post("/voice/speak")
-async def voice_speak(request: VoiceRequest):
+async def voice_speak(request: VoiceRequest, master_agent: MasterAgent = Depends(get_master_agent)):
     va = master_agent.get_voice_assistant()
     
     if request.text:
@@ -71,7 +145,7 @@ async def voice_speak(request: VoiceRequest):
     return {"status": "error", "message": "Question type not found"}
 
 @router.get("/voice/questions")
-async def get_voice_questions():
+async def get_voice_questions(master_agent: MasterAgent = Depends(get_master_agent)):
     va = master_agent.get_voice_assistant()
     questions = {
         'vehicle_health': 'What\'s my vehicle health?',
@@ -86,7 +160,7 @@ async def get_voice_questions():
     }
 
 @router.get("/voice/status")
-async def voice_status():
+async def voice_status(master_agent: MasterAgent = Depends(get_master_agent)):
     va = master_agent.get_voice_assistant()
     return {
         'available': va.available,
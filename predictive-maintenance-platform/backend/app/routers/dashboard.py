@@ -1,9 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
 from app.agents.master_agent import MasterAgent
+from app.response_cache import response_cache
+from app.container import get_master_agent
 
 router = APIRouter()
-master_agent = MasterAgent()
 
 @router.get("/")
-async def get_dashboard():
-    return master_agent.get_dashboard_data()
+async def get_dashboard(request: Request, master_agent: MasterAgent = Depends(get_master_agent)):
+    # Recomputed only when the fleet data changes; polls with a matching ETag get 304
+    return await response_cache.respond(request, 'dashboard', master_agent.dashboard_version(), master_agent.get_dashboard_data)
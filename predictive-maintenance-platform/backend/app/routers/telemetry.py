@@ -0,0 +1,127 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.executor import run_agent, ExecutorBusy
+from app.telemetry_schema import COLUMNS, telemetry_row
+import json
+
+router = APIRouter()
+
+MAX_LINE_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+class IngestAborted(Exception):
+    """Stops an ingest midway; the response still reports the batches already accepted."""
+    def __init__(self, status_code, detail, headers=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+def _parse_line(line):
+    if len(line) > MAX_LINE_BYTES:
+        raise ValueError(f"line exceeds {MAX_LINE_BYTES} bytes")
+    reading = json.loads(line)
+    if not isinstance(reading, dict):
+        raise ValueError("reading must be a JSON object")
+    vehicle_id = reading.get('vehicle_id')
+    # bool is an int subclass but never a vehicle id
+    if isinstance(vehicle_id, bool) or not isinstance(vehicle_id, (str, int)) or vehicle_id == '':
+        raise ValueError("vehicle_id must be a non-empty string or an integer")
+    unknown = sorted(set(reading) - set(COLUMNS))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    # Typed the way the telemetry table stores it, so a bad value is rejected here
+    # rather than failing the worker's bulk insert for the whole window
+    row = telemetry_row(reading)
+    row['vehicle_id'] = vehicle_id
+    return vehicle_id, row
+
+@router.post("/ingest")
+async def ingest_telemetry(request: Request):
+    """Accept a streamed NDJSON body: one telemetry reading (JSON object) per line.
+
+    Lines with unknown keys or values the telemetry table can't store
+    (app/telemetry_schema.py) are counted in `rejected` and listed in
+    `errors` instead of reaching the worker.
+
+    The body is parsed chunk by chunk. Every TELEMETRY_MAX_BATCH readings are
+    pushed into the rolling telemetry windows and handed to the worker's
+    micro-batcher, so memory stays bounded regardless of how many readings a
+    single request carries.
+
+    Batches handed off before a failure stay accepted. If the request has to
+    stop early (an unterminated line over MAX_LINE_BYTES: 413; executor
+    saturated or pipeline closed: 503), the error response still carries the
+    per-batch results and `processed_lines`, so a client can resume after
+    that line instead of resending accepted readings.
+    """
+    # Imported here so the API only loads Celery/Supabase once telemetry arrives
+    from app.worker import enqueue_telemetry_many, BatcherClosed
+    
+    batch_size = settings.TELEMETRY_MAX_BATCH
+    batches = []
+    errors = []
+    pending = []
+    rejected_in_batch = 0
+    line_no = 0
+    # Every line up to here has been handed off (accepted or rejected)
+    processed_lines = 0
+    buffer = b""
+
+    async def hand_off():
+        nonlocal pending, rejected_in_batch, processed_lines
+        try:
+            accepted = await run_agent(enqueue_telemetry_many, pending) if pending else 0
+        except ExecutorBusy as e:
+            raise IngestAborted(503, str(e), {"Retry-After": "1"})
+        except BatcherClosed as e:
+            # The process is shutting down
+            raise IngestAborted(503, str(e), {"Retry-After": "1"})
+        batches.append({'batch': len(batches) + 1, 'accepted': accepted, 'rejected': rejected_in_batch})
+        pending = []
+        rejected_in_batch = 0
+        processed_lines = line_no
+
+    async def handle(line):
+        nonlocal line_no, rejected_in_batch
+        line_no += 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            pending.append(_parse_line(line))
+        except ValueError as e:
+            rejected_in_batch += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_no, 'error': str(e)})
+        if len(pending) + rejected_in_batch >= batch_size:
+            await hand_off()
+
+    def summary():
+        return {
+            'accepted': sum(b['accepted'] for b in batches),
+            'rejected': sum(b['rejected'] for b in batches),
+            'batches': batches,
+            'errors': errors
+        }
+
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                await handle(line)
+            if len(buffer) > MAX_LINE_BYTES:
+                # Keep the complete lines before it, then stop reading the body
+                if pending or rejected_in_batch:
+                    await hand_off()
+                raise IngestAborted(413, f"Line {line_no + 1} exceeds {MAX_LINE_BYTES} bytes")
+        if buffer:
+            await handle(buffer)
+        if pending or rejected_in_batch:
+            await hand_off()
+    except IngestAborted as e:
+        return JSONResponse(status_code=e.status_code, content={'detail': e.detail, 'processed_lines': processed_lines, **summary()}, headers=e.headers)
+
+    return summary()
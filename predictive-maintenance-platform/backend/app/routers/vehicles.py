@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from app.database import supabase
+from fastapi import APIRouter, HTTPException, Depends, Query
+from app.database import get_supabase
+from app.agents.master_agent import MasterAgent
+from app.agents.fleet_listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.executor import run_agent
+from app.container import get_master_agent
 from pydantic import BaseModel
 from typing import Optional, List
 
@@ -13,22 +17,44 @@ class VehicleCreate(BaseModel):
     owner_id: Optional[str] = None
 
 @router.get("/")
-def get_vehicles():
-    response = supabase.table("vehicles").select("*").execute()
-    return response.data
+async def get_vehicles(
+    fields: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    sort: str = "vehicle_id",
+    order: str = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    master_agent: MasterAgent = Depends(get_master_agent)
+):
+    # Fleet listing: ?fields=vehicle_id,failure_risk&risk_level=HIGH,MEDIUM&batch_id=...
+    # &sort=risk_level|failure_risk|batch_id|vehicle_id&order=desc, then follow next_cursor
+    try:
+        return await run_agent(
+            master_agent.list_vehicles,
+            columns=fields.split(",") if fields else None,
+            risk_levels=risk_level.split(",") if risk_level else None,
+            batch_id=batch_id,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{vehicle_id}")
 def get_vehicle_details(vehicle_id: str):
-    response = supabase.table("vehicles").select("*").eq("id", vehicle_id).execute()
+    response = get_supabase().table("vehicles").select("*").eq("id", vehicle_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
     # Get recent telemetry
-    telemetry = supabase.table("telemetry").select("*").eq("vehicle_id", vehicle_id).order("timestamp", desc=True).limit(20).execute()
+    telemetry = get_supabase().table("telemetry").select("*").eq("vehicle_id", vehicle_id).order("timestamp", desc=True).limit(20).execute()
     
     return {"vehicle": response.data[0], "history": telemetry.data}
 
 @router.post("/")
 def register_vehicle(vehicle: VehicleCreate):
-    response = supabase.table("vehicles").insert(vehicle.dict()).execute()
+    response = get_supabase().table("vehicles").insert(vehicle.dict()).execute()
     return response.data
@@ -0,0 +1,226 @@
+import queue
+import threading
+import time
+import uuid
+
+PENDING = 'PENDING'
+STARTED = 'STARTED'
+RETRY = 'RETRY'
+SUCCESS = 'SUCCESS'
+FAILURE = 'FAILURE'
+
+class TaskTimeout(Exception):
+    """Raised by TaskResult.get() when the task has not finished in time."""
+
+class TaskResult:
+    """Handle for one submitted task, shaped like Celery's AsyncResult."""
+    def __init__(self, task_name):
+        self.id = uuid.uuid4().hex
+        self.task_name = task_name
+        self.state = PENDING
+        self.retries = 0
+        self._result = None
+        self._done = threading.Event()
+
+    @property
+    def status(self):
+        return self.state
+
+    @property
+    def result(self):
+        return self._result
+
+    def ready(self):
+        return self._done.is_set()
+
+    def successful(self):
+        return self.state == SUCCESS
+
+    def failed(self):
+        return self.state == FAILURE
+
+    def get(self, timeout=None, propagate=True):
+        if not self._done.wait(timeout):
+            raise TaskTimeout(f"Task {self.task_name}[{self.id}] did not finish within {timeout}s")
+        if self.state == FAILURE and propagate:
+            raise self._result
+        return self._result
+
+    def _finish(self, state, result):
+        self.state = state
+        self._result = result
+        self._done.set()
+
+class LocalTask:
+    """A function registered with LocalTaskApp; call it directly or `.delay()` it."""
+    def __init__(self, app, func, autoretry_for, max_retries, retry_delay, retry_backoff):
+        self.app = app
+        self.func = func
+        self.name = f"{func.__module__}.{func.__name__}"
+        self.autoretry_for = tuple(autoretry_for)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retry_backoff = retry_backoff
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.apply_async(args, kwargs)
+
+    def apply_async(self, args=None, kwargs=None, countdown=None):
+        result = TaskResult(self.name)
+        with self.app._lock:
+            self.app.stats['submitted'] += 1
+        self.app._submit(self, tuple(args or ()), dict(kwargs or {}), result, countdown)
+        return result
+
+class LocalTaskApp:
+    """In-process task backend with the subset of the Celery API the worker uses.
+
+    `@app.task` functions get `.delay()` / `.apply_async()` returning a
+    TaskResult. Tasks run on `workers` threads fed by a queue of at most
+    `max_queue` entries; when the queue is full the caller runs the task
+    itself, which slows producers down instead of growing memory (and can't
+    deadlock when a task enqueues follow-ups). As in Celery, a task is only
+    retried for exceptions listed in its `autoretry_for`, up to `max_retries`
+    times, `retry_delay` apart (doubling each time with `retry_backoff`).
+    """
+    def __init__(self, workers=4, max_queue=1000, max_retries=3, retry_delay=1.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.tasks = {}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._timers = set()
+        self.stats = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'retried': 0, 'ran_inline': 0}
+
+    def task(self, func=None, *, autoretry_for=(), max_retries=None, default_retry_delay=None, retry_backoff=False):
+        """Register a task; usable as `@app.task` or `@app.task(autoretry_for=(Exception,))`."""
+        def register(fn):
+            task = LocalTask(
+                self,
+                fn,
+                autoretry_for,
+                self.max_retries if max_retries is None else max_retries,
+                self.retry_delay if default_retry_delay is None else default_retry_delay,
+                retry_backoff
+            )
+            self.tasks[task.name] = task
+            return task
+        return register(func) if func is not None else register
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'tasks-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _submit(self, task, args, kwargs, result, countdown=None):
+        if countdown:
+            timer = threading.Timer(countdown, self._enqueue, (task, args, kwargs, result))
+            timer.daemon = True
+            with self._lock:
+                self._timers.add(timer)
+            timer.start()
+            return
+        self._enqueue(task, args, kwargs, result)
+
+    def _enqueue(self, task, args, kwargs, result):
+        with self._lock:
+            self._timers = {timer for timer in self._timers if timer.is_alive()}
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((task, args, kwargs, result))
+        except queue.Full:
+            with self._lock:
+                self.stats['ran_inline'] += 1
+            self._run(task, args, kwargs, result)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, task, args, kwargs, result):
+        result.state = STARTED
+        try:
+            value = task.func(*args, **kwargs)
+        except Exception as e:
+            if isinstance(e, task.autoretry_for) and result.retries < task.max_retries:
+                result.retries += 1
+                result.state = RETRY
+                with self._lock:
+                    self.stats['retried'] += 1
+                print(f"Task {task.name} failed ({e}), retry {result.retries}/{task.max_retries}")
+                countdown = task.retry_delay * 2 ** (result.retries - 1) if task.retry_backoff else task.retry_delay
+                self._submit(task, args, kwargs, result, countdown=countdown)
+                return
+            with self._lock:
+                self.stats['failed'] += 1
+            print(f"Task {task.name} Error: {e}")
+            result._finish(FAILURE, e)
+            return
+        with self._lock:
+            self.stats['succeeded'] += 1
+        result._finish(SUCCESS, value)
+
+    def join(self, timeout=None):
+        """Wait until every queued task (and pending retry) has finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                timers = [timer for timer in self._timers if timer.is_alive()]
+            for timer in timers:
+                timer.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            with self._queue.all_tasks_done:
+                while self._queue.unfinished_tasks:
+                    if deadline is None:
+                        self._queue.all_tasks_done.wait()
+                    elif not self._queue.all_tasks_done.wait(max(0.0, deadline - time.monotonic())):
+                        return
+            with self._lock:
+                if not any(timer.is_alive() for timer in self._timers):
+                    return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop the workers, first waiting (up to `timeout` seconds) for queued tasks and retries.
+
+        Later submissions start fresh workers, so the app can be restarted in-process.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if wait:
+            self.join(timeout)
+        if deadline is None:
+            deadline = time.monotonic() + 5
+        with self._lock:
+            threads, self._threads = self._threads, []
+        # Workers still busy past the deadline are daemons; they exit on their sentinel later
+        for _ in threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, 'workers': self.workers, 'queued': self._queue.qsize(), 'scheduled': sum(1 for timer in self._timers if timer.is_alive())}
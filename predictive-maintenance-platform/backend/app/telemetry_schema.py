@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+import math
+
+# Columns of the Supabase `telemetry` table (database/schema.sql); id is generated
+NUMERIC_FIELDS = ('speed', 'engine_rpm', 'engine_temp', 'battery_voltage', 'tire_pressure', 'vibration_level')
+COLUMNS = ('vehicle_id',) + NUMERIC_FIELDS + ('timestamp',)
+
+def _number(name, value):
+    # bool is an int subclass but never a sensor value
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be finite")
+    return number
+
+def _timestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
+        except (OverflowError, OSError, ValueError):
+            raise ValueError("timestamp is out of range") from None
+    if isinstance(value, str):
+        try:
+            # fromisoformat only accepts a trailing Z from Python 3.11
+            datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        except ValueError:
+            raise ValueError("timestamp must be ISO 8601 or epoch seconds") from None
+        return value
+    raise ValueError("timestamp must be ISO 8601 or epoch seconds")
+
+def telemetry_row(reading):
+    """The telemetry columns of one reading, typed for the bulk insert.
+
+    Keys that are not columns are dropped; numeric fields become floats and
+    the timestamp an ISO 8601 string. Missing or null values are left out so
+    the table defaults apply. Raises ValueError for a value the table would
+    reject, so one bad reading can't fail a whole window's insert.
+    """
+    row = {}
+    vehicle_id = reading.get('vehicle_id')
+    if vehicle_id is not None:
+        row['vehicle_id'] = str(vehicle_id)
+    for name in NUMERIC_FIELDS:
+        value = reading.get(name)
+        if value is not None:
+            row[name] = _number(name, value)
+    timestamp = reading.get('timestamp')
+    if timestamp is not None:
+        row['timestamp'] = _timestamp(timestamp)
+    return row
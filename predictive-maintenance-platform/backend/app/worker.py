@@ -1,52 +1,273 @@
-from celery import Celery
 from app.config import settings
 import random
 import time
-from app.database import supabase
+from app.database import get_supabase
+from app.agents.risk_engine import telemetry_risk, score_telemetry, window_trend_masks, CRITICAL_RISK
+from app.agents.telemetry_window import get_telemetry_windows
+from app.broadcast import get_broadcast
+from app.audit import build_agent_log_sink
+from app.task_queue import LocalTaskApp
+from app.telemetry_schema import telemetry_row
+import httpx
+import threading
+import atexit
 import json
 import os
+import socket
 
 # Check if we should run in Lite mode (No Redis/Docker)
 USE_CELERY = os.getenv("USE_CELERY", "True").lower() == "true"
 
-class MockCelery:
-    def task(self, func):
-        def wrapper(*args, **kwargs):
-            # For hackathon demo without Docker: run synchronously
-            return func(*args, **kwargs)
-        wrapper.delay = wrapper # Mock the .delay() method
-        return wrapper
-
 if USE_CELERY:
+    from celery import Celery
     celery_app = Celery(
         "worker",
         broker=settings.REDIS_URL,
         backend=settings.REDIS_URL
     )
 else:
-    celery_app = MockCelery()
+    # Lite mode: same .delay() API on in-process worker threads, no Redis needed
+    celery_app = LocalTaskApp(
+        workers=settings.TASK_WORKERS,
+        max_queue=settings.TASK_MAX_QUEUE,
+        max_retries=settings.TASK_MAX_RETRIES,
+        retry_delay=settings.TASK_RETRY_DELAY
+    )
 
 
 # Mock ML Model (Stub)
 def predict_failure_risk(telemetry_data):
     # In a real model, this would use scikit-learn
-    # Return random risk for demo if rpm or temp is high
-    risk = 0.1
-    if telemetry_data.get('engine_temp', 90) > 100:
-        risk += 0.4
-    if telemetry_data.get('vibration_level', 0) > 0.5:
-        risk += 0.3
-    return min(risk, 0.99)
+    # Thresholds live in the risk engine so single and batch scoring agree
+    return telemetry_risk(telemetry_data)
+
+class BatcherClosed(RuntimeError):
+    """Raised by TelemetryBatcher.add_many once the batcher has been closed."""
+
+class TelemetryBatcher:
+    """Buffers telemetry readings and hands them off one window at a time.
+
+    A window is flushed when it reaches `max_batch` readings or when
+    `flush_interval` seconds have passed since the first buffered reading,
+    whichever comes first. `close()` (registered with atexit) flushes
+    whatever is left.
+    """
+    def __init__(self, flush_fn, flush_interval=1.0, max_batch=500):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffer = []
+        self._window_started = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = None
+        self.stats = {'readings': 0, 'windows': 0, 'errors': 0}
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='telemetry-batcher', daemon=True)
+            self._thread.start()
+
+    def add(self, vehicle_id, data):
+        self.add_many([(vehicle_id, data)])
+
+    def add_many(self, readings):
+        """Buffer (vehicle_id, data) pairs; returns the number accepted."""
+        full_windows = []
+        with self._lock:
+            if self._closed:
+                raise BatcherClosed("TelemetryBatcher is closed")
+            self._ensure_thread()
+            for reading in readings:
+                if not self._buffer:
+                    self._window_started = time.monotonic()
+                    self._wakeup.notify()
+                self._buffer.append(reading)
+                if len(self._buffer) >= self.max_batch:
+                    full_windows.append(self._swap())
+        # Full windows are flushed by the producer, which keeps memory bounded
+        for window in full_windows:
+            self._flush_window(window)
+        return len(readings)
+
+    def _swap(self):
+        window = self._buffer
+        self._buffer = []
+        self._window_started = None
+        return window
+
+    def _flush_window(self, window):
+        if not window:
+            return
+        try:
+            self.flush_fn(window)
+            self.stats['windows'] += 1
+            self.stats['readings'] += len(window)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"TelemetryBatcher Flush Error: {e}")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed and not self._buffer:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                remaining = self._window_started + self.flush_interval - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                window = self._swap()
+            self._flush_window(window)
+
+    def flush(self):
+        with self._lock:
+            window = self._swap()
+        self._flush_window(window)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+            window = self._swap()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._flush_window(window)
+
+def _window_owner():
+    # The process whose telemetry_windows already hold a window's readings
+    # (pid at call time: prefork children each have their own windows)
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _dispatch_window(window):
+    # One broker message (or one local task in lite mode) per window; the
+    # readings were pushed into this process's windows by enqueue_telemetry_many
+    ingest_telemetry_batch_task.delay([[vehicle_id, data] for vehicle_id, data in window], windowed_by=_window_owner())
+
+telemetry_windows = get_telemetry_windows()
+telemetry_batcher = TelemetryBatcher(
+    _dispatch_window,
+    flush_interval=settings.TELEMETRY_FLUSH_INTERVAL,
+    max_batch=settings.TELEMETRY_MAX_BATCH
+)
+
+# agent_logs rows are written in bulk off the task path (AGENT_LOG_BACKEND)
+agent_log_sink = build_agent_log_sink()
+
+def close_pipeline():
+    """Flush in pipeline order: buffered telemetry, then the tasks it queued, then their logs."""
+    telemetry_batcher.close()
+    if isinstance(celery_app, LocalTaskApp):
+        celery_app.shutdown(timeout=settings.TASK_SHUTDOWN_TIMEOUT)
+    agent_log_sink.close()
+
+def drain_pipeline():
+    """Like close_pipeline, but leaves everything usable (app restarts in-process)."""
+    telemetry_batcher.flush()
+    if isinstance(celery_app, LocalTaskApp):
+        # Lite mode: let the tasks the flush queued finish before their logs are flushed
+        celery_app.shutdown(timeout=settings.TASK_SHUTDOWN_TIMEOUT)
+    agent_log_sink.flush()
+
+atexit.register(close_pipeline)
+
+if USE_CELERY:
+    # Prefork children can exit without running atexit handlers
+    from celery.signals import worker_process_shutdown
+
+    @worker_process_shutdown.connect
+    def _flush_telemetry_on_shutdown(**kwargs):
+        telemetry_batcher.close()
+        agent_log_sink.close()
+
+def enqueue_telemetry_many(readings):
+    """Preferred entry point for producers: update rolling windows, then buffer for the next flush."""
+    telemetry_windows.push_many(readings)
+    return telemetry_batcher.add_many(readings)
+
+def enqueue_telemetry(vehicle_id, data):
+    return enqueue_telemetry_many([(vehicle_id, data)])
 
 @celery_app.task
 def ingest_telemetry_task(vehicle_id, data):
-    # 1. Store Telemetry
-    supabase.table('telemetry').insert(data).execute()
+    # Kept for existing callers; readings now go through the micro-batcher
+    enqueue_telemetry(vehicle_id, data)
     
-    # 2. Trigger Prediction Agent
-    analyze_failure_risk.delay(vehicle_id, data)
+    return f"Queued telemetry for {vehicle_id}"
+
+# Network failures are worth retrying; a row Supabase rejected (APIError) would fail again
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError)
+
+def telemetry_rows(readings):
+    """Insertable telemetry rows for [vehicle_id, data] readings, skipping invalid ones."""
+    rows = []
+    for vehicle_id, data in readings:
+        try:
+            rows.append(telemetry_row({**data, 'vehicle_id': vehicle_id}))
+        except ValueError as e:
+            print(f"Telemetry row for {vehicle_id} skipped: {e}")
+    return rows
+
+# Only the insert is retried: it is this task's single write, so a transient
+# Supabase error can't duplicate logs, alerts or predictions
+@celery_app.task(autoretry_for=TRANSIENT_ERRORS, max_retries=settings.TASK_MAX_RETRIES, retry_backoff=True)
+def store_telemetry_batch_task(rows):
+    """Bulk insert one window of telemetry rows (already built by telemetry_rows)."""
+    if rows:
+        get_supabase().table('telemetry').insert(rows).execute()
+    return len(rows)
+
+@celery_app.task
+def ingest_telemetry_batch_task(readings, windowed_by=None):
+    """Store and score one window of [vehicle_id, data] readings.
+
+    Not retried as a whole: scoring, agent_logs and alerts happen once, and
+    only the insert (store_telemetry_batch_task) retries on its own.
+    `windowed_by` names the process that already pushed the readings into
+    its rolling windows, so each reading is counted once per process.
+    """
+    if not readings:
+        return {"ingested": 0, "critical": 0}
+    rows = [data for _, data in readings]
+    vehicle_ids = [vehicle_id for vehicle_id, _ in readings]
+    
+    # 1. Store Telemetry (one bulk insert per window, retried independently).
+    # Only table columns with coerced types go in, so a bad reading can't fail the window.
+    store_telemetry_batch_task.delay(telemetry_rows(readings))
+    
+    # 2. Score the whole window in one vectorized pass, with rolling-window trends.
+    # Readings batched in this process (lite mode, or the legacy per-reading task
+    # on a Celery worker) are already windowed; others are fed in here.
+    if windowed_by != _window_owner():
+        telemetry_windows.push_many(readings)
+    import pandas as pd
+    scored = score_telemetry(pd.DataFrame.from_records(rows), window_trend_masks(telemetry_windows, vehicle_ids))
+    risks = scored['score'].tolist()
     
-    return f"Ingested telemetry for {vehicle_id}"
+    # 3. Log Agent Actions (batched by the audit sink)
+    agent_log_sink.emit_many([
+        {
+            "agent_name": "Failure Prediction Agent",
+            "action_type": "ANALYSIS",
+            "vehicle_id": vehicle_id,
+            "details": {"risk_score": risk, "input": data},
+            "decision_confidence": 0.95
+        }
+        for vehicle_id, data, risk in zip(vehicle_ids, rows, risks)
+    ])
+    
+    # 4. Escalate once per vehicle, using its worst reading in the window
+    critical = {}
+    for vehicle_id, risk in zip(vehicle_ids, risks):
+        if risk > CRITICAL_RISK and risk > critical.get(vehicle_id, 0.0):
+            critical[vehicle_id] = risk
+    for vehicle_id, risk in critical.items():
+        handle_critical_failure.delay(vehicle_id, risk)
+        get_supabase().table('vehicles').update({"health_score": (1.0 - risk) * 100}).eq("id", vehicle_id).execute()
+    
+    return {"ingested": len(rows), "critical": len(critical)}
 
 @celery_app.task
 def analyze_failure_risk(vehicle_id, data):
@@ -54,19 +275,19 @@ def analyze_failure_risk(vehicle_id, data):
     risk = predict_failure_risk(data)
     
     # Log Agent Action
-    supabase.table('agent_logs').insert({
+    agent_log_sink.emit({
         "agent_name": "Failure Prediction Agent",
         "action_type": "ANALYSIS",
         "vehicle_id": vehicle_id,
         "details": {"risk_score": risk, "input": data},
         "decision_confidence": 0.95
-    }).execute()
+    })
 
-    if risk > 0.7:
+    if risk > CRITICAL_RISK:
         # High likelihood of failure -> Trigger Master Agent to act
         handle_critical_failure.delay(vehicle_id, risk)
         # Update vehicle health
-        supabase.table('vehicles').update({"health_score": (1.0 - risk) * 100}).eq("id", vehicle_id).execute()
+        get_supabase().table('vehicles').update({"health_score": (1.0 - risk) * 100}).eq("id", vehicle_id).execute()
     
     return {"vehicle_id": vehicle_id, "risk": risk}
 
@@ -85,8 +306,13 @@ def handle_critical_failure(vehicle_id, risk_score):
     # Verify we aren't spamming (basic check)
     # ... logic skipped for hackathon speed
     
+    # Push to live dashboards in every API process (BROADCAST_BACKEND=redis across processes)
+    broadcast = get_broadcast()
+    broadcast.publish(f"vehicle:{vehicle_id}", 'alert', alert)
+    broadcast.publish('alerts', 'alert', alert)
+    
     # Store Prediction
-    supabase.table('predictions').insert({
+    get_supabase().table('predictions').insert({
         "vehicle_id": vehicle_id,
         "failure_probability": risk_score,
         "predicted_failure_type": "Engine Overheat Risk",
@@ -95,12 +321,12 @@ def handle_critical_failure(vehicle_id, risk_score):
     }).execute()
     
     # Log Action
-    supabase.table('agent_logs').insert({
+    agent_log_sink.emit({
         "agent_name": "Master Agent",
         "action_type": "ALERT_TRIGGER",
         "vehicle_id": vehicle_id,
         "details": alert,
         "decision_confidence": 1.0
-    }).execute()
+    })
     
     return "Critical alert processed"
@@ -0,0 +1,211 @@
+import sys
+import os
+import time
+import argparse
+
+# Appending current dir to path to find 'app'
+sys.path.append(os.getcwd())
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def bench_ueba(args):
+    from app.agents.ueba_agent import UEBAAgent
+    ueba = UEBAAgent()
+    calls = [
+        ('MasterAgent', 'analyze_vehicle', 'vehicle_V001'),
+        ('DataAgent', 'read_sensor_data', 'vehicle_V001'),
+        ('DiagnosisAgent', 'predict_failure', 'vehicle_V001'),
+        ('SchedulingAgent', 'book_service', 'vehicle_V001'),
+        ('CustomerAgent', 'engage_customer', 'vehicle_V001'),
+    ]
+    n = args.n
+
+    def monitor():
+        for agent_name, action, resource in calls:
+            ueba.monitor_agent_action(agent_name, action, resource)
+
+    per_action = timed(monitor, n // len(calls)) / len(calls)
+    alerts = timed(ueba.get_alerts, 100)
+
+    # Overhead of the @monitored hook around an agent method
+    from app.agents.ueba_agent import monitored, vehicle_resource
+    class Probe:
+        ueba = None
+        def plain(self, vehicle_id):
+            return vehicle_id
+        @monitored('read_sensor_data', vehicle_resource, agent_name='DataAgent')
+        def hooked(self, vehicle_id):
+            return vehicle_id
+    probe = Probe()
+    plain = timed(lambda: probe.plain('V001'), n)
+    probe.ueba = ueba
+    hooked = timed(lambda: probe.hooked('V001'), n)
+
+    print(f"\n--- UEBA ({n} actions) ---")
+    print(f"monitor_agent_action: {per_action * 1e6:.2f} us/action")
+    print(f"@monitored call overhead: {(hooked - plain) * 1e6:.2f} us/call")
+    print(f"get_alerts: {alerts * 1e3:.3f} ms")
+    print(f"events buffered: {len(ueba.events)}  total: {ueba.events.total_events}")
+
+def bench_schedule(args):
+    import random
+    from app.agents.scheduling_agent import SchedulingAgent
+    rng = random.Random(42)
+    urgencies = ['Critical', 'High', 'Medium', 'Low']
+    weights = [0.05, 0.15, 0.3, 0.5]
+    requests = [(f"V{i:06d}", rng.choices(urgencies, weights)[0]) for i in range(args.n)]
+
+    agent = SchedulingAgent()
+    started = time.perf_counter()
+    result = agent.schedule_bulk(requests, max_days=365)
+    elapsed = time.perf_counter() - started
+    stats = result['stats']
+
+    # Same vehicles booked one call at a time in arrival order (N /schedule-service calls)
+    single = SchedulingAgent()
+    started = time.perf_counter()
+    sequential = [single.inventory.book(vehicle_id, urgency, max_days=365) for vehicle_id, urgency in requests]
+    one_by_one = time.perf_counter() - started
+    critical_in_window = sum(1 for (_, urgency), booking in zip(requests, sequential) if urgency == 'Critical' and booking.get('within_window'))
+
+    print(f"\n--- Bulk scheduling ({args.n} vehicles) ---")
+    print(f"schedule_bulk: {elapsed * 1e3:.1f} ms (planner {stats['elapsed_ms']:.1f} ms)")
+    print(f"one-by-one loop: {one_by_one * 1e3:.1f} ms (Critical in window: {critical_in_window})")
+    print(f"confirmed: {stats['confirmed']}  unavailable: {stats['unavailable']}")
+    print(f"utilization: {stats['utilization']['utilization']:.1%} over {stats['utilization']['from']} .. {stats['utilization']['to']}")
+    for urgency in urgencies:
+        row = stats['by_urgency'].get(urgency)
+        if row:
+            print(f"  {urgency:8s} {row['confirmed']:6d} booked, {row['within_window']:6d} in window, mean wait {row['mean_wait_days']} days")
+
+def synthetic_fleet(n, seed=42):
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    components = np.array(['none', 'brake_system', 'engine', 'suspension', 'transmission', 'battery'])
+    return pd.DataFrame({
+        'vehicle_id': [f"V{i:07d}" for i in range(n)],
+        'engine_temp': rng.integers(70, 125, n),
+        'vibration': rng.random(n).round(2) * 2,
+        'battery_voltage': (10.5 + rng.random(n) * 2.2).round(1),
+        'failure_risk': rng.random(n).round(2),
+        'component_health': components[rng.integers(0, len(components), n)],
+        'batch_id': [f"BATCH_{2020 + i % 5}_{i % 12 + 1:02d}" for i in range(n)],
+    })
+
+# Runs in a fresh interpreter so load time and memory are not skewed by the parent
+MEMORY_PROBE = '''
+import sys, time
+started = time.perf_counter()
+if sys.argv[1] == 'csv':
+    import pandas as pd
+    df = pd.read_csv(sys.argv[2])
+else:
+    from app.agents.fleet_columns import read_columns
+    df = read_columns(sys.argv[2])
+loaded = time.perf_counter() - started
+checksum = float(df['failure_risk'].sum()) + float(df['engine_temp'].sum())
+fields = {}
+for line in open('/proc/self/smaps_rollup'):
+    parts = line.split()
+    if len(parts) == 3 and parts[2] == 'kB':
+        fields[parts[0].rstrip(':')] = int(parts[1])
+# Anonymous memory is per-process heap; the rest of RSS is file pages other workers can share
+print(loaded, fields.get('Rss', 0), fields.get('Anonymous', 0), checksum)
+'''
+
+def bench_columnar(args):
+    import shutil
+    import subprocess
+    import tempfile
+    from app.agents.fleet_columns import convert_csv
+    directory = tempfile.mkdtemp(prefix='fleet-bench-')
+    csv_path = os.path.join(directory, 'vehicle_data.csv')
+    columns_path = os.path.join(directory, 'vehicle_data.cols')
+    synthetic_fleet(args.n).to_csv(csv_path, index=False)
+    started = time.perf_counter()
+    convert_csv(csv_path, columns_path)
+    converted = time.perf_counter() - started
+
+    def probe(kind, path):
+        out = subprocess.run([sys.executable, '-c', MEMORY_PROBE, kind, path], capture_output=True, text=True, check=True, cwd=os.getcwd())
+        loaded, rss, anonymous, _ = out.stdout.split()
+        return float(loaded), int(rss) / 1024, int(anonymous) / 1024
+
+    print(f"\n--- Fleet load ({args.n} vehicles) ---")
+    print(f"CSV {os.path.getsize(csv_path) / 2**20:.1f} MiB, columnar {sum(os.path.getsize(os.path.join(columns_path, f)) for f in os.listdir(columns_path)) / 2**20:.1f} MiB, convert {converted:.2f} s")
+    for label, kind, path in (('pd.read_csv', 'csv', csv_path), ('read_columns (mmap)', 'columns', columns_path)):
+        loaded, rss, anonymous = probe(kind, path)
+        print(f"{label:20s} load {loaded * 1e3:8.1f} ms   RSS {rss:7.1f} MiB   heap {anonymous:7.1f} MiB   file-backed {rss - anonymous:7.1f} MiB")
+    shutil.rmtree(directory, ignore_errors=True)
+
+def bench_memory(args):
+    from app.agents.fleet_frame import compact_frame, frame_memory, FleetColumns, VehicleRow
+    df = synthetic_fleet(args.n)
+    compact = compact_frame(df)
+    before, after = frame_memory(df), frame_memory(compact)
+    print(f"\n--- Fleet frame memory ({args.n} vehicles) ---")
+    for name in df.columns:
+        print(f"{name:18s} {str(df[name].dtype):8s} {before['columns'][name] / 2**20:7.1f} MiB -> {str(compact[name].dtype):8s} {after['columns'][name] / 2**20:7.1f} MiB")
+    print(f"{'total':18s} {'':8s} {before['total'] / 2**20:7.1f} MiB -> {'':8s} {after['total'] / 2**20:7.1f} MiB")
+
+    # Single-vehicle lookup: Series row vs VehicleRow view
+    columns = FleetColumns(compact)
+    positions = list(range(0, args.n, max(1, args.n // 1000)))
+    series = timed(lambda: [df.iloc[pos]['failure_risk'] for pos in positions], 3) / len(positions)
+    view = timed(lambda: [VehicleRow(columns, pos)['failure_risk'] for pos in positions], 3) / len(positions)
+    print(f"row lookup: df.iloc {series * 1e6:.1f} us, VehicleRow {view * 1e6:.2f} us")
+
+def bench_anomaly(args):
+    import random
+    from app.agents.batch_anomaly import BatchAnomalyDetector
+    rng = random.Random(7)
+    batches = 100000
+    bad = {f"B{i:06d}" for i in rng.sample(range(batches), 20)}
+    detector = BatchAnomalyDetector(max_batches=batches)
+    # Diagnoses land on random batches; bad batches fail 5x as often as the fleet
+    stream = []
+    # (each diagnosis is a different vehicle)
+    for i in range(args.n):
+        batch_id = f"B{rng.randrange(batches):06d}"
+        stream.append((batch_id, i, rng.random() < (0.5 if batch_id in bad else 0.1)))
+    # Concentrated stream on the bad batches (a recall in progress)
+    for i in range(2000):
+        batch_id = sorted(bad)[i % len(bad)]
+        stream.append((batch_id, args.n + i, rng.random() < 0.5))
+
+    first_alert = {}
+    started = time.perf_counter()
+    for batch_id, vehicle_id, failed in stream:
+        alert = detector.observe(batch_id, vehicle_id, failed)
+        if alert is not None and batch_id not in first_alert:
+            first_alert[batch_id] = detector.status(batch_id)['observations']
+    elapsed = time.perf_counter() - started
+
+    hits = bad & set(first_alert)
+    false_alarms = set(first_alert) - bad
+    print(f"\n--- Batch anomaly detection ({len(stream)} diagnoses, {batches} batches) ---")
+    print(f"observe: {elapsed / len(stream) * 1e6:.2f} us/diagnosis")
+    print(f"bad batches flagged: {len(hits)}/{len(bad)}, false alarms: {len(false_alarms)}")
+    if hits:
+        print(f"diagnoses per bad batch before its alert: median {sorted(first_alert[b] for b in hits)[len(hits) // 2]}")
+    print(f"stats: {detector.get_stats()}")
+
+BENCHMARKS = {
+    'ueba': bench_ueba,
+    'schedule': bench_schedule,
+    'columnar': bench_columnar,
+    'memory': bench_memory,
+    'anomaly': bench_anomaly,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the agent layer")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="what to measure")
+    parser.add_argument("--n", type=int, default=200000, help="problem size (actions, vehicles, rows)")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+# Appending current dir to path to find 'app'
+sys.path.append(os.getcwd())
+
+# Offline enrichment providers unless the caller asks otherwise
+os.environ.setdefault("ENRICHMENT_PROVIDER", "fake")
+os.environ.setdefault("USE_CELERY", "false")
+
+import httpx
+from app.main import app
+from app.container import agents
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+async def run(args):
+    master_agent = agents.master_agent
+    vehicle_ids = list(master_agent.data_agent.fleet_store.frame()['vehicle_id'])
+    completed = []
+
+    async def on_enrichment(message):
+        completed.append(time.perf_counter())
+    master_agent.enrichment_service.listeners.append(on_enrichment)
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/api/agents/vehicle-health/{vehicle_ids[i % len(vehicle_ids)]}", params={'enrich': args.enrich})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        # Let in-flight enrichments finish so their timing is reported too
+        while master_agent.enrichment_service.get_stats()['in_flight']:
+            await asyncio.sleep(0.05)
+
+    print(f"\n--- /vehicle-health load test (enrich={args.enrich}, providers={os.environ['ENRICHMENT_PROVIDER']}) ---")
+    print(f"Requests: {args.requests}  Concurrency: {args.concurrency}")
+    print(f"Throughput: {args.requests / elapsed:.1f} req/s")
+    print(f"Latency p50: {percentile(latencies, 50):.1f} ms  p95: {percentile(latencies, 95):.1f} ms  p99: {percentile(latencies, 99):.1f} ms")
+    if completed:
+        print(f"Enrichments delivered: {len(completed)}, last one {(max(completed) - started) * 1000:.0f} ms after start")
+    print(f"Enrichment stats: {master_agent.get_enrichment_stats()}")
+    print(f"Recommendation cache: {master_agent.get_recommendation_cache_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the vehicle-health enrichment pipeline")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--enrich", choices=["async", "sync"], default="async")
+    asyncio.run(run(parser.parse_args()))
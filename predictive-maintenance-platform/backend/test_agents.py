@@ -27,5 +27,699 @@ def test_integration():
     
     print("\nTest Complete.")
 
+def test_batch_scoring_matches_single(tmp_path):
+    from app.agents.data_agent import DataAgent
+    from app.agents.fleet_store import FleetStore
+    
+    # Fleet plus a row with no failure_risk, which both paths must report the same way
+    csv_path = tmp_path / 'vehicle_data.csv'
+    with open(os.path.join('data', 'vehicle_data.csv')) as f:
+        csv_path.write_text(f.read().rstrip('\n') + '\nV_NAN,105,0.3,12.4,,engine,BATCH_2023_04\n')
+    da = DataAgent(fleet_store=FleetStore(str(csv_path)))
+    
+    print("\n--- Testing Batch Risk Scoring ---")
+    ids = list(da.fleet_store.frame()['vehicle_id']) + ['UNKNOWN_ID']
+    batch = da.score_fleet(ids)
+    for vehicle_id, result in zip(ids, batch):
+        single = da.analyze_risk(vehicle_id)
+        assert result['vehicle_id'] == vehicle_id
+        assert result['level'] == single['level']
+        assert result['factors'] == single['factors']
+        assert result['score'] == single['score']
+    assert batch[ids.index('V_NAN')]['score'] is None
+    print(f"Scored {len(batch)} vehicles in one pass")
+
+def test_compact_fleet_frame():
+    import pandas as pd
+    from app.agents.fleet_frame import compact_frame, frame_memory, FleetColumns, VehicleRow
+    
+    print("\n--- Testing Compact Fleet Frame ---")
+    base = pd.read_csv(os.path.join('data', 'vehicle_data.csv'))
+    df = pd.concat([base] * 20000, ignore_index=True)
+    df['vehicle_id'] = [f"V{i:06d}" for i in range(len(df))]
+    compact = compact_frame(df)
+    before, after = frame_memory(df)['total'], frame_memory(compact)['total']
+    assert str(compact['failure_risk'].dtype) == 'float32'
+    assert str(compact['batch_id'].dtype) == 'category'
+    assert after < 0.5 * before
+    
+    # Row views return the values as recorded in the CSV
+    columns = FleetColumns(compact)
+    for pos in range(len(base)):
+        assert VehicleRow(columns, pos).to_dict() == {**df.iloc[pos].to_dict(), 'engine_temp': float(df.iloc[pos]['engine_temp'])}
+    print(f"{len(df)} vehicles: {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB")
+
+def test_redis_broadcast_between_managers():
+    import asyncio
+    # requirements-dev.txt: a missing fakeredis fails the test instead of skipping it
+    import fakeredis
+    from app.broadcast import RedisBroadcast
+    from app.realtime import PubSubManager, ClientConnection
+    
+    class RecordingSocket:
+        def __init__(self):
+            self.sent = []
+        async def send_json(self, message):
+            self.sent.append(message)
+    
+    print("\n--- Testing Redis Broadcast ---")
+    server = fakeredis.FakeServer()
+    
+    async def run():
+        # Two API processes sharing one Redis; the dashboard is connected to the second
+        publisher, receiver = PubSubManager(), PubSubManager()
+        publisher.attach(RedisBroadcast(client=fakeredis.FakeRedis(server=server)))
+        receiver.attach(RedisBroadcast(client=fakeredis.FakeRedis(server=server)))
+        assert publisher.broadcast is not None and receiver.broadcast is not None
+        socket = RecordingSocket()
+        client = ClientConnection(socket)
+        receiver.clients.add(client)
+        client.start(receiver.disconnect)
+        receiver.subscribe(client, ['alerts', 'vehicle:V001'])
+        
+        publisher.emit('alerts', 'alert', {'vehicle_id': 'V001', 'severity': 'CRITICAL'})
+        publisher.publish_vehicles({'V001': {'level': 'HIGH'}, 'V002': {'level': 'LOW'}})
+        for _ in range(100):
+            if len(socket.sent) >= 2:
+                break
+            await asyncio.sleep(0.05)
+        publisher.detach()
+        receiver.detach()
+        receiver.disconnect(client)
+        return socket.sent
+    
+    sent = asyncio.run(run())
+    assert {'type': 'alert', 'topic': 'alerts', 'data': {'vehicle_id': 'V001', 'severity': 'CRITICAL'}} in sent
+    assert {'type': 'snapshot', 'topic': 'vehicle:V001', 'data': {'level': 'HIGH'}} in sent
+    # Nobody watches V002, so it is never pushed
+    assert not any(m['topic'] == 'vehicle:V002' for m in sent)
+    print(f"Delivered {len(sent)} events across managers")
+
+def test_local_task_queue():
+    import threading
+    import time
+    import pytest
+    from app.task_queue import LocalTaskApp, TaskTimeout, SUCCESS, FAILURE
+    
+    print("\n--- Testing LocalTaskApp ---")
+    app = LocalTaskApp(workers=1, max_queue=1, retry_delay=0.01)
+    done = []
+    release = threading.Event()
+    attempts = {'flaky': 0}
+    
+    @app.task
+    def add(a, b):
+        done.append(('add', a + b))
+        return a + b
+    
+    @app.task(autoretry_for=(ConnectionError,), max_retries=3, retry_backoff=True)
+    def flaky():
+        attempts['flaky'] += 1
+        if attempts['flaky'] < 3:
+            raise ConnectionError("transient")
+        done.append(('flaky', attempts['flaky']))
+        return 'stored'
+    
+    @app.task(autoretry_for=(ConnectionError,))
+    def broken():
+        raise ValueError("not retried")
+    
+    @app.task
+    def blocking():
+        release.wait(5)
+        done.append(('blocking', None))
+        return threading.current_thread().name
+    
+    # delay/get
+    assert add.delay(2, 3).get(timeout=5) == 5
+    
+    # Retries only for autoretry_for exceptions, with backoff
+    result = flaky.delay()
+    assert result.get(timeout=5) == 'stored'
+    assert result.retries == 2 and result.state == SUCCESS
+    failed = broken.delay()
+    with pytest.raises(ValueError):
+        failed.get(timeout=5)
+    assert failed.state == FAILURE and failed.retries == 0
+    
+    # Worker busy and queue full: the producer runs the task itself
+    busy = blocking.delay()
+    time.sleep(0.05)
+    queued = add.delay(1, 1)
+    caller = threading.current_thread().name
+    inline = app.tasks[blocking.name].apply_async()
+    release.set()
+    assert inline.get(timeout=5) == caller
+    assert busy.get(timeout=5) != caller and queued.get(timeout=5) == 2
+    assert app.get_stats()['ran_inline'] == 1
+    
+    # Shutdown drains queued tasks and pending retries before stopping the workers
+    attempts['flaky'] = 0
+    done.clear()
+    pending = [flaky.delay(), add.delay(4, 4)]
+    app.shutdown(timeout=5)
+    assert all(r.ready() for r in pending)
+    assert ('flaky', 3) in done and ('add', 8) in done
+    assert app.get_stats()['queued'] == 0 and app.get_stats()['scheduled'] == 0
+    assert app._threads == []
+    
+    # A bounded shutdown returns even when a task outlives the timeout
+    release.clear()
+    stuck = blocking.delay()
+    started = time.monotonic()
+    app.shutdown(timeout=0.1)
+    assert time.monotonic() - started < 2
+    with pytest.raises(TaskTimeout):
+        stuck.get(timeout=0)
+    release.set()
+    stuck.get(timeout=5)
+    
+    # Later submissions start fresh workers
+    assert add.delay(5, 5).get(timeout=5) == 10
+    app.shutdown(timeout=5)
+    print(f"LocalTaskApp stats: {app.get_stats()}")
+
+def test_telemetry_row_schema():
+    import pytest
+    from app.telemetry_schema import telemetry_row
+    
+    print("\n--- Testing Telemetry Row Schema ---")
+    # Unknown keys are dropped and numeric strings coerced before the bulk insert
+    row = telemetry_row({'vehicle_id': 7, 'engine_temp': '95.5', 'speed': 80, 'driver': 'x', 'timestamp': '2024-01-01T00:00:00Z'})
+    assert row == {'vehicle_id': '7', 'engine_temp': 95.5, 'speed': 80.0, 'timestamp': '2024-01-01T00:00:00Z'}
+    assert telemetry_row({'vehicle_id': 'V001', 'timestamp': 0})['timestamp'] == '1970-01-01T00:00:00+00:00'
+    for bad in ({'speed': 'fast'}, {'speed': True}, {'engine_rpm': float('inf')}, {'timestamp': 'yesterday'}, {'timestamp': [1]}):
+        with pytest.raises(ValueError):
+            telemetry_row({'vehicle_id': 'V001', **bad})
+    print("Telemetry rows keep only typed table columns")
+
+def test_ingest_line_validation():
+    import pytest
+    from app.routers.telemetry import _parse_line
+    
+    print("\n--- Testing NDJSON Line Validation ---")
+    vehicle_id, row = _parse_line(b'{"vehicle_id": "V001", "engine_temp": 104, "vibration_level": "0.6"}')
+    assert vehicle_id == 'V001' and row == {'vehicle_id': 'V001', 'engine_temp': 104.0, 'vibration_level': 0.6}
+    for line in (b'{"vehicle_id": "V001", "engine_tmp": 104}', b'{"vehicle_id": "V001", "speed": "fast"}',
+                 b'{"vehicle_id": "V001", "timestamp": "soon"}', b'{"engine_temp": 104}', b'[1]'):
+        with pytest.raises(ValueError):
+            _parse_line(line)
+    print("Lines are validated against the telemetry schema")
+
+def test_telemetry_windowed_once(monkeypatch):
+    import importlib
+    import pytest
+    from app.agents.telemetry_window import TelemetryWindowStore
+    from app.audit import AuditSink, NullAuditBackend
+    
+    print("\n--- Testing Telemetry Windowing ---")
+    monkeypatch.setenv('USE_CELERY', 'false')
+    worker = importlib.import_module('app.worker')
+    if worker.USE_CELERY:
+        pytest.skip("app.worker was already imported in Celery mode")
+    
+    class Table:
+        def insert(self, rows):
+            return self
+        def execute(self):
+            return self
+    class Supabase:
+        def table(self, name):
+            return Table()
+    windows = TelemetryWindowStore()
+    monkeypatch.setattr(worker, 'telemetry_windows', windows)
+    monkeypatch.setattr(worker, 'get_supabase', lambda: Supabase())
+    monkeypatch.setattr(worker, 'agent_log_sink', AuditSink(NullAuditBackend()))
+    readings = [('V001', {'vehicle_id': 'V001', 'engine_temp': 90.0 + i, 'timestamp': 1700000000 + i}) for i in range(3)]
+    
+    # Batched in this process: pushed by the producer, not again by the task
+    worker.enqueue_telemetry_many(readings)
+    worker.telemetry_batcher.flush()
+    worker.celery_app.join(5)
+    assert windows.features('V001')['samples'] == 3
+    
+    # Batched by another process (a Celery API process): windowed by the task
+    result = worker.ingest_telemetry_batch_task.delay([list(r) for r in readings[:2]], windowed_by='api-host:1')
+    assert result.get(timeout=5)['ingested'] == 2
+    assert windows.features('V001')['samples'] == 5
+    print("Each reading is windowed once")
+
+def test_recommendation_cache_eviction():
+    import time
+    from app.agents.recommendation_cache import RecommendationCache
+    
+    print("\n--- Testing Recommendation Cache Eviction ---")
+    # LRU: touching 'a' makes 'b' the least recently used entry
+    cache = RecommendationCache(ttl=60, max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C')
+    assert cache.get('b') is None and cache.get('a') == 'A' and cache.get('c') == 'C'
+    assert cache.get_stats()['evictions'] == 1
+    
+    # TTL: an expired entry is a miss and gets recomputed
+    cache = RecommendationCache(ttl=0.05, max_entries=2)
+    assert cache.get_or_compute('k', lambda: 'first') == 'first'
+    assert cache.get_or_compute('k', lambda: 'second') == 'first'
+    time.sleep(0.1)
+    assert cache.get('k') is None
+    assert cache.get_or_compute('k', lambda: 'second') == 'second'
+    print(f"Cache stats: {cache.get_stats()}")
+
+def test_recommendation_cache_coalescing():
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.agents.recommendation_cache import RecommendationCache
+    
+    print("\n--- Testing Recommendation Cache Coalescing ---")
+    cache = RecommendationCache(ttl=60, max_entries=16)
+    calls = []
+    release = threading.Event()
+    
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'Replace the coolant pump'
+    
+    n = 8
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(cache.get_or_compute, 'engine|0.80|High|x', compute) for _ in range(n)]
+        # Hold the provider call until every other miss has joined it
+        deadline = time.monotonic() + 5
+        while cache.get_stats()['coalesced'] < n - 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result(timeout=5) for f in futures]
+    assert len(calls) == 1
+    assert results == ['Replace the coolant pump'] * n
+    stats = cache.get_stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == n - 1 and stats['in_flight'] == 0
+    print(f"{n} concurrent misses -> {len(calls)} provider call")
+
+def test_fleet_aggregates_diff_matches_rebuild(tmp_path):
+    import pytest
+    from app.agents.fleet_store import FleetStore
+    from app.agents.fleet_aggregates import FleetAggregates
+    
+    print("\n--- Testing Incremental Fleet Aggregates ---")
+    header = 'vehicle_id,engine_temp,vibration,battery_voltage,failure_risk,component_health,batch_id\n'
+    components = ['brake_system', 'engine', 'battery', 'none']
+    rows = {f"V{i:03d}": [95, 0.5, 12.1, round(0.1 + 0.02 * i, 2), components[i % 4], f"BATCH_{i % 5}"] for i in range(40)}
+    csv_path = tmp_path / 'vehicle_data.csv'
+    
+    def write():
+        csv_path.write_text(header + ''.join(f"{vid},{','.join('' if v is None else str(v) for v in row)}\n" for vid, row in rows.items()))
+    
+    write()
+    store = FleetStore(str(csv_path))
+    incremental = FleetAggregates(store)
+    incremental.fleet_summary()
+    rebuilds = []
+    rebuild = incremental._rebuild
+    incremental._rebuild = lambda frame: (rebuilds.append(1), rebuild(frame))
+    changes = incremental.changes
+    
+    # A few vehicles change: under REBUILD_RATIO, so the diff path applies them
+    rows['V001'][3] = 0.95
+    rows['V002'][4] = 'engine'
+    rows['V003'][5] = 'BATCH_9'
+    rows['V004'][3] = None
+    rows['V005'][5] = None
+    del rows['V006']
+    rows['V999'] = [101, 0.9, 11.8, 0.75, 'battery', 'BATCH_0']
+    write()
+    # Move the mtime on: the rewrite may land within the filesystem's timestamp resolution
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    fleet = incremental.fleet_summary()
+    assert not rebuilds and incremental.changes > changes
+    
+    fresh = FleetAggregates(store)
+    expected = fresh.fleet_summary()
+    assert {k: v for k, v in fleet.items() if k != 'mean_failure_risk'} == {k: v for k, v in expected.items() if k != 'mean_failure_risk'}
+    assert fleet['mean_failure_risk'] == pytest.approx(expected['mean_failure_risk'])
+    batches, expected_batches = incremental.batch_summary(), fresh.batch_summary()
+    assert batches.keys() == expected_batches.keys()
+    for batch_id, batch in batches.items():
+        assert batch == pytest.approx(expected_batches[batch_id])
+        assert incremental.batch(batch_id)['components'] == fresh.batch(batch_id)['components']
+    print(f"Diff path matches a rebuild across {len(batches)} batches")
+
+def test_dashboard_etag_follows_state(tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.agents.data_agent import DataAgent
+    from app.agents.fleet_store import FleetStore
+    from app.agents.manufacturing_agent import ManufacturingAgent
+    from app.container import get_master_agent
+    from app.response_cache import response_cache
+    from app.routers import dashboard
+    
+    print("\n--- Testing Dashboard ETag ---")
+    csv_path = tmp_path / 'vehicle_data.csv'
+    with open(os.path.join('data', 'vehicle_data.csv')) as f:
+        original = f.read()
+    csv_path.write_text(original)
+    store = FleetStore(str(csv_path))
+    ma = MasterAgent()
+    ma.data_agent = DataAgent(fleet_store=store)
+    ma.manufacturing_agent = ManufacturingAgent(fleet_store=store)
+    app = FastAPI()
+    app.include_router(dashboard.router, prefix="/api/dashboard")
+    app.dependency_overrides[get_master_agent] = lambda: ma
+    response_cache.invalidate('dashboard')
+    client = TestClient(app)
+    
+    first = client.get('/api/dashboard/')
+    assert first.status_code == 200
+    etag = first.headers['etag']
+    assert client.get('/api/dashboard/', headers={'If-None-Match': etag}).status_code == 304
+    
+    # The fleet file changes: V001 drops out of the high-risk bucket
+    csv_path.write_text(original.replace('V001,105,1.2,11.2,0.85', 'V001,105,1.2,11.2,0.15'))
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = client.get('/api/dashboard/', headers={'If-None-Match': etag})
+    assert second.status_code == 200 and second.headers['etag'] != etag
+    assert second.json()['fleet_overview']['high_risk'] == first.json()['fleet_overview']['high_risk'] - 1
+    etag = second.headers['etag']
+    assert client.get('/api/dashboard/', headers={'If-None-Match': etag}).status_code == 304
+    
+    # An in-memory change with the file untouched also invalidates the cached payload
+    ma.data_agent.aggregates.upsert('V002', 'BATCH_2023_05', 0.95, 'engine')
+    third = client.get('/api/dashboard/', headers={'If-None-Match': etag})
+    assert third.status_code == 200 and third.headers['etag'] != etag
+    assert third.json()['fleet_overview']['high_risk'] == second.json()['fleet_overview']['high_risk'] + 1
+    
+    # Other state behind the batch views moves the version token too
+    version = ma.dashboard_version()
+    ma.manufacturing_agent.log_failure_pattern('V001', {'component': 'brake_system', 'probability': 0.85})
+    ma.scheduling_agent.book_service('V001', 'High')
+    assert ma.dashboard_version() != version
+    print("Dashboard ETag: 200 -> 304 -> 200 on state changes")
+
+def test_websocket_subscribe_snapshot_flow(tmp_path):
+    import asyncio
+    from app.agents.data_agent import DataAgent
+    from app.agents.fleet_store import FleetStore
+    from app.agents.manufacturing_agent import ManufacturingAgent
+    from app.realtime import PubSubManager, ClientConnection, StatePublisher
+    
+    class RecordingSocket:
+        def __init__(self):
+            self.sent = []
+        async def send_json(self, message):
+            self.sent.append(message)
+    
+    print("\n--- Testing Websocket Subscriptions ---")
+    csv_path = tmp_path / 'vehicle_data.csv'
+    with open(os.path.join('data', 'vehicle_data.csv')) as f:
+        csv_path.write_text(f.read())
+    store = FleetStore(str(csv_path))
+    ma = MasterAgent()
+    ma.data_agent = DataAgent(fleet_store=store)
+    ma.manufacturing_agent = ManufacturingAgent(fleet_store=store, aggregates=ma.data_agent.aggregates)
+    
+    async def run():
+        manager = PubSubManager(max_subscriptions=3)
+        publisher = StatePublisher(manager, ma)
+        
+        def connect():
+            socket = RecordingSocket()
+            client = ClientConnection(socket)
+            manager.clients.add(client)
+            client.start(manager.disconnect)
+            return client, socket
+        
+        async def drained(socket):
+            await asyncio.sleep(0.05)
+            sent, socket.sent = socket.sent, []
+            return sent
+        
+        client, socket = connect()
+        manager.handle(client, {'action': 'subscribe', 'topics': ['fleet', 'bad topic!', 'batch:BATCH_2023_04', 'batch:NOPE', 'vehicle:V001']})
+        await publisher.tick()
+        first = await drained(socket)
+        by_topic = {(m['type'], m['topic']): m['data'] for m in first}
+        # Invalid topics and those over the subscription cap are reported, not subscribed
+        assert by_topic[('error', None)]['rejected'] == ['bad topic!', 'vehicle:V001']
+        assert by_topic[('subscriptions', None)] == {'topics': ['batch:BATCH_2023_04', 'batch:NOPE', 'fleet']}
+        assert by_topic[('snapshot', 'fleet')] == ma.data_agent.get_fleet_overview()
+        assert by_topic[('snapshot', 'batch:BATCH_2023_04')]['count'] >= 1
+        # An unknown batch gets an empty snapshot once, then is left alone
+        assert by_topic[('snapshot', 'batch:NOPE')] == {}
+        
+        await publisher.tick()
+        assert await drained(socket) == []
+        
+        # A state change reaches subscribers as a delta of the changed keys only
+        before = ma.data_agent.get_fleet_overview()
+        ma.data_agent.aggregates.upsert('V002', 'BATCH_2023_05', 0.95, 'engine')
+        await publisher.tick()
+        deltas = [m for m in await drained(socket) if m['topic'] == 'fleet']
+        assert [m['type'] for m in deltas] == ['delta']
+        assert deltas[0]['data']['high_risk'] == before['high_risk'] + 1
+        assert 'total_vehicles' not in deltas[0]['data']
+        
+        # A late subscriber gets the current snapshot right away, without a tick
+        late, late_socket = connect()
+        manager.handle(late, {'action': 'subscribe', 'topics': ['fleet']})
+        assert {'type': 'snapshot', 'topic': 'fleet', 'data': ma.data_agent.get_fleet_overview()} in await drained(late_socket)
+        
+        # Batch state is dropped once nobody watches the topic
+        manager.handle(client, {'action': 'unsubscribe', 'topics': ['batch:BATCH_2023_04']})
+        assert 'batch:BATCH_2023_04' not in manager.states
+        manager.disconnect(client)
+        manager.disconnect(late)
+        assert manager.get_stats()['clients'] == 0
+    
+    asyncio.run(run())
+    print("Subscribe -> snapshot -> delta flow verified")
+
+def test_agent_log_rows_fit_the_table(monkeypatch):
+    import time
+    import uuid
+    import app.database
+    from app.agents.security_events import SecurityEvent
+    from app.audit import AuditSink, SupabaseAuditBackend
+    
+    print("\n--- Testing agent_logs Rows ---")
+    stored = []
+    
+    class AgentLogs:
+        # Like Postgres: one bad vehicle_id (a UUID foreign key) fails the whole insert
+        def insert(self, rows):
+            for row in rows:
+                if row['vehicle_id'] is not None:
+                    uuid.UUID(row['vehicle_id'])
+            self.rows = rows
+            return self
+        def execute(self):
+            stored.extend(self.rows)
+    class Supabase:
+        def table(self, name):
+            assert name == 'agent_logs'
+            return AgentLogs()
+    monkeypatch.setattr(app.database, 'get_supabase', lambda: Supabase())
+    
+    vehicle_uuid = str(uuid.uuid4())
+    now = time.time()
+    events = [SecurityEvent(now, 'DataAgent', 'read_sensor_data', resource, 'allowed', 'low')
+              for resource in ('vehicle_V001', 'vehicle_None', 'fleet_batch', 'dashboard')]
+    events.append({'agent_name': 'Failure Prediction Agent', 'action_type': 'ANALYSIS', 'vehicle_id': 'V001', 'details': {'risk_score': 0.4}, 'decision_confidence': 0.95})
+    events.append({'agent_name': 'Master', 'action_type': 'ALERT', 'vehicle_id': vehicle_uuid, 'details': {}, 'decision_confidence': 1.0})
+    sink = AuditSink(SupabaseAuditBackend(), max_retries=1)
+    sink.emit_many(events)
+    sink.close()
+    
+    stats = sink.get_stats()
+    assert stats['written'] == len(events) and stats['failed'] == 0
+    assert [row['vehicle_id'] for row in stored] == [None] * 5 + [vehicle_uuid]
+    assert [row['details']['resource'] for row in stored[:4]] == ['vehicle_V001', 'vehicle_None', 'fleet_batch', 'dashboard']
+    assert stored[4]['details'] == {'risk_score': 0.4, 'vehicle_ref': 'V001'}
+    print(f"{stats['written']} agent_logs rows written, none rejected")
+
+def test_slot_inventory_bookings():
+    from collections import Counter
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import date, timedelta
+    from app.agents.slot_inventory import SlotInventory, TIME_SLOTS
+    
+    print("\n--- Testing Slot Inventory ---")
+    centers = [{'id': 'A', 'name': 'Center A', 'capacity': 2}, {'id': 'B', 'name': 'Center B', 'capacity': 1}]
+    start = date(2026, 1, 5)
+    
+    # Concurrent bookings never exceed a slot's capacity; Critical searches tomorrow and the day after
+    inventory = SlotInventory(centers, today=start)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda i: inventory.book(f"V{i:03d}", 'Critical', max_days=2), range(50)))
+    confirmed = [r for r in results if r['status'] == 'Confirmed']
+    places = 2 * len(TIME_SLOTS) * sum(c['capacity'] for c in centers)
+    assert len(confirmed) == places
+    assert len({r['booking_id'] for r in confirmed}) == places
+    per_slot = Counter((r['appointment_date'], r['appointment_time'], r['service_center_id']) for r in confirmed)
+    capacity = {c['id']: c['capacity'] for c in centers}
+    assert all(count <= capacity[slot[2]] for slot, count in per_slot.items())
+    assert {r['reason'] for r in results if r['status'] == 'Unavailable'} == {'No capacity in the next 2 days'}
+    
+    # An urgency's own window is searched even past max_days, and the reason says so
+    full = SlotInventory([{'id': 'Z', 'name': 'Closed', 'capacity': 0}], today=start)
+    assert full.book('V900', 'Low', max_days=5)['reason'] == 'No capacity in the next 27 days'
+    
+    # Past bookings expire, so the vehicle can book again and the old id is gone
+    inventory = SlotInventory(centers, today=start)
+    first = inventory.book('V100', 'Critical')
+    assert first['appointment_date'] == str(start + timedelta(days=1))
+    assert inventory.book('V100', 'Critical')['booking_id'] == first['booking_id']
+    inventory._today = start + timedelta(days=3)
+    second = inventory.book('V100', 'Critical')
+    assert second['booking_id'] != first['booking_id']
+    assert second['appointment_date'] == str(start + timedelta(days=4))
+    assert not inventory.cancel(first['booking_id'])
+    
+    # Rising urgency moves the booking earlier and frees the old slot; falling urgency keeps it
+    inventory = SlotInventory(centers, today=start)
+    routine = inventory.book('V200', 'Low')
+    assert routine['appointment_date'] == str(start + timedelta(days=14))
+    urgent = inventory.book('V200', 'Critical')
+    assert urgent['booking_id'] != routine['booking_id']
+    assert urgent['appointment_date'] == str(start + timedelta(days=1))
+    assert not inventory.cancel(routine['booking_id'])
+    assert inventory.availability((start + timedelta(days=14)).toordinal(), 1)[0]['remaining'] == 3
+    assert inventory.book('V200', 'Low')['booking_id'] == urgent['booking_id']
+    print(f"{len(confirmed)} concurrent bookings confirmed for {places} places")
+
+def test_fleet_columns_generations(tmp_path):
+    import json
+    import pandas as pd
+    from app.agents.fleet_columns import write_columns, read_columns, manifest_path
+    
+    print("\n--- Testing Columnar Fleet Generations ---")
+    directory = str(tmp_path / 'fleet.cols')
+    first = pd.DataFrame({'vehicle_id': ['V1', 'V2'], 'engine_temp': [90.0, 95.0], 'component_health': ['Good', 'Fair']})
+    second = pd.DataFrame({'vehicle_id': ['V3', 'V4', 'V5'], 'engine_temp': [80.0, 85.0, 99.0], 'component_health': ['Poor', 'Good', 'Poor']})
+    third = second.iloc[:1]
+    
+    write_columns(first, directory)
+    before = read_columns(directory)
+    write_columns(second, directory)
+    # A reader that loaded generation 1 keeps consistent data after the switch
+    assert before['vehicle_id'].tolist() == ['V1', 'V2']
+    assert before['component_health'].tolist() == ['Good', 'Fair']
+    after = read_columns(directory)
+    assert after['vehicle_id'].tolist() == ['V3', 'V4', 'V5']
+    assert after['engine_temp'].tolist() == [80.0, 85.0, 99.0]
+    
+    # Each switch keeps only the previous generation's files
+    write_columns(third, directory)
+    generations = {name.split('.')[1] for name in os.listdir(directory) if name != 'manifest.json'}
+    assert generations == {'g2', 'g3'}
+    with open(manifest_path(directory), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['generation'] == 3 and manifest['rows'] == 1
+    assert read_columns(directory)['component_health'].tolist() == ['Poor']
+    
+    # A dictionary from another conversion is rejected instead of mis-decoding codes
+    column = next(c for c in manifest['columns'] if c['name'] == 'vehicle_id')
+    with open(os.path.join(directory, column['dictionary']), 'w', encoding='utf-8') as f:
+        json.dump(['V3', 'V4'], f)
+    try:
+        read_columns(directory)
+        assert False, "mismatched dictionary was accepted"
+    except ValueError as e:
+        assert 'dictionary' in str(e)
+    print(f"Generation {manifest['generation']} live, generations on disk: {sorted(generations)}")
+
+def test_failure_patterns_idempotent():
+    from app.agents.failure_patterns import FailurePatternStore
+    
+    print("\n--- Testing Failure Pattern Upserts ---")
+    store = FailurePatternStore(max_per_batch=2, window_seconds=100)
+    for _ in range(10):
+        logged = store.add('B1', 'V001', 'brake_system', 0.85, now=0)
+    assert logged == {'count': 1, 'avg_probability': 0.85, 'high_risk': 1, 'common_component': 'brake_system'}
+    assert len(store.history('B1')) == 1 and store.get_stats()['patterns'] == 1
+    
+    # A new diagnosis for the same vehicle and component replaces the old one
+    logged = store.add('B1', 'V001', 'brake_system', 0.3, now=10)
+    assert logged['count'] == 1 and logged['high_risk'] == 0 and logged['avg_probability'] == 0.3
+    logged = store.add('B1', 'V002', 'engine', 0.9, now=20)
+    assert logged['count'] == 2 and logged['high_risk'] == 1
+    
+    # Size and age bounds drop the least recently updated vehicle first
+    store.add('B1', 'V001', 'brake_system', 0.4, now=30)
+    logged = store.add('B1', 'V003', 'engine', 0.8, now=40)
+    assert [p['vehicle_id'] for p in store.history('B1')] == ['V001', 'V003']
+    assert logged['common_component'] == 'brake_system' and logged['count'] == 2
+    assert store.stats('B1', now=135)['count'] == 1
+    assert store.get_stats()['patterns'] == 1
+    print(f"Pattern store: {store.get_stats()}")
+
+def test_batch_anomaly_counts_vehicles_once(tmp_path):
+    from app.agents.batch_anomaly import BatchAnomalyDetector
+    from app.agents.fleet_store import FleetStore
+    from app.agents.manufacturing_agent import ManufacturingAgent
+    
+    print("\n--- Testing Batch Anomaly Detection ---")
+    # Re-diagnosing one vehicle is a single observation, however often it is viewed
+    detector = BatchAnomalyDetector(min_baseline_batches=0)
+    for _ in range(20):
+        assert detector.observe('B1', 'V001', True) is None
+    assert detector.status('B1')['observations'] == 1
+    # Only a changed outcome moves the counts
+    detector.observe('B1', 'V001', False)
+    assert detector.status('B1')['failure_rate'] == 0.0 and detector.get_stats()['observations'] == 1
+    
+    # A failing batch is not flagged until enough other batches form the baseline
+    detector = BatchAnomalyDetector(min_baseline_batches=3)
+    detector.observe('OK0', 'V100', False)
+    alerts = [detector.observe('BAD', f"V{i:03d}", True) for i in range(10)]
+    assert alerts == [None] * 10
+    for batch in ('OK1', 'OK2', 'OK3'):
+        for i in range(10):
+            detector.observe(batch, f"{batch}-{i}", False)
+    alert = detector.observe('BAD', 'V010', True)
+    assert alert['type'] == 'recall_alert' and alert['observations'] == 11
+    assert alert['baseline_batches'] == 4 and alert['baseline_rate'] == 1 / 33
+    
+    # The reported repro: viewing V001 ten times must not raise a recall
+    csv_path = tmp_path / 'vehicle_data.csv'
+    with open(os.path.join('data', 'vehicle_data.csv')) as f:
+        csv_path.write_text(f.read())
+    store = FleetStore(str(csv_path))
+    ma = MasterAgent()
+    ma.manufacturing_agent = ManufacturingAgent(fleet_store=store)
+    for _ in range(10):
+        ma.analyze_vehicle('V001')
+    batch_id = store.get_vehicle('V001')['batch_id']
+    detector = ma.manufacturing_agent.anomaly_detector
+    assert detector.status(batch_id)['observations'] == 1
+    assert detector.recent_alerts() == []
+    assert ma.manufacturing_agent.failure_patterns.stats(batch_id)['count'] == 1
+    print(f"Batch {batch_id} after 10 views: {detector.status(batch_id)}")
+
 if __name__ == "__main__":
     test_integration()
+    import tempfile, pathlib
+    test_batch_scoring_matches_single(pathlib.Path(tempfile.mkdtemp()))
+    test_compact_fleet_frame()
+    test_fleet_columns_generations(pathlib.Path(tempfile.mkdtemp()))
+    test_fleet_aggregates_diff_matches_rebuild(pathlib.Path(tempfile.mkdtemp()))
+    test_dashboard_etag_follows_state(pathlib.Path(tempfile.mkdtemp()))
+    test_websocket_subscribe_snapshot_flow(pathlib.Path(tempfile.mkdtemp()))
+    test_redis_broadcast_between_managers()
+    test_local_task_queue()
+    test_telemetry_row_schema()
+    test_ingest_line_validation()
+    test_recommendation_cache_eviction()
+    test_slot_inventory_bookings()
+    test_failure_patterns_idempotent()
+    test_batch_anomaly_counts_vehicles_once(pathlib.Path(tempfile.mkdtemp()))
+    test_recommendation_cache_coalescing()
+    import pytest
+    with pytest.MonkeyPatch.context() as mp:
+        test_telemetry_windowed_once(mp)
+    with pytest.MonkeyPatch.context() as mp:
+        test_agent_log_rows_fit_the_table(mp)